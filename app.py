@@ -1,48 +1,22 @@
-from flask import Flask
-from flask_bcrypt import Bcrypt
-from flask_cors import CORS
-from models import db, TokenBlocklist
-from config import Config
-from flask_migrate import Migrate
-from flask_jwt_extended import JWTManager, get_jwt, verify_jwt_in_request
+import logging
+import time
 from datetime import timedelta
-from routes.auth import auth_bp
-from routes.habits import habits_bp
-from routes.rewards import rewards_bp
-from routes.avatar import avatar_bp
-import os
-
-
-from dotenv import load_dotenv
-
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-dotenv_path = os.path.join(BASE_DIR, ".env")
-print("Loading from:", dotenv_path)
-
-load_dotenv(dotenv_path)
 
+from flask import Flask, Response
 
-app = Flask(__name__, static_folder='static')
-app.config.from_object(Config)
-
-# Access token short (minutes), Refresh token long (days)
-app.config.setdefault('JWT_ACCESS_TOKEN_EXPIRES', timedelta(minutes=15))
-app.config.setdefault('JWT_REFRESH_TOKEN_EXPIRES', timedelta(days=30))
+from config import Config
+from extensions import db, jwt, cors, init_migrate
+from services.blocklist import is_token_revoked
 
+logger = logging.getLogger(__name__)
 
-db.init_app(app)
-migrate = Migrate(app, db)
-bcrypt = Bcrypt(app)
-CORS(app)
 
-jwt = JWTManager(app)
 @jwt.token_in_blocklist_loader
 def check_if_token_in_blocklist(jwt_header, jwt_payload):
     jti = jwt_payload.get("jti")
     if jti is None:
         return True
-    exists = TokenBlocklist.query.filter_by(jti=jti).first()
-    return bool(exists)  # True => token is revoked
+    return is_token_revoked(jti, jwt_payload["exp"])  # True => token is revoked
 
 # Custom revoked token response
 @jwt.revoked_token_loader
@@ -50,22 +24,171 @@ def revoked_token_callback(jwt_header, jwt_payload):
     return {"msg": "Token has been revoked"}, 401
 
 
-
-app.register_blueprint(auth_bp)
-app.register_blueprint(habits_bp)
-app.register_blueprint(rewards_bp)
-app.register_blueprint(avatar_bp)
-
-@app.route('/')
-def home():
-    return "Welcome to Habit RPG Tracker! Flask backend is running successfully."
-
-with app.app_context():
-    try:
-        db.create_all()
-        print("Database tables created (Render compatible).")
-    except Exception as e:
-        print("Error creating tables:", e)
+def register_metrics_routes(app):
+    from services.catalog import catalog_cache
+    from services.leaderboard import leaderboards
+    from services.outbox import outbox_stats
+    from services.passwords import password_stats
+    from services.pool_metrics import pool_stats
+    from services.replicas import replica_stats
+    from services.request_metrics import prometheus_text, request_metrics
+
+    # Connection pool usage of the worker that serves the request
+    @app.route('/metrics/pool')
+    def pool_metrics():
+        return pool_stats(db.engine)
+
+    # Depth and lag of the deferred-work queue
+    @app.route('/metrics/outbox')
+    def outbox_metrics():
+        return outbox_stats()
+
+    # Password hashing pool size, queue depth and bcrypt timings
+    @app.route('/metrics/passwords')
+    def password_metrics():
+        return password_stats()
+
+    # Replica health and lag as seen by this worker
+    @app.route('/metrics/replicas')
+    def replica_metrics():
+        return replica_stats()
+
+    # Per-endpoint latency and SQL counts of this worker, slowest statement included
+    @app.route('/metrics/requests')
+    def request_stats():
+        return request_metrics.snapshot()
+
+    # Everything above in Prometheus text format
+    @app.route('/metrics')
+    def prometheus_metrics():
+        gauges = {
+            "habit_db_pool": pool_stats(db.engine),
+            "habit_outbox": outbox_stats(),
+            "habit_password": password_stats(),
+            "habit_catalog": catalog_cache.stats(),
+            "habit_replica": replica_stats(),
+            "habit_leaderboard": leaderboards.stats(),
+            "habit_startup": app.extensions["startup_report"],
+        }
+        return Response(prometheus_text(gauges), mimetype="text/plain; version=0.0.4")
+
+
+def start_workers(app):
+    # In-process background work; with gunicorn prefer one `flask reset-scheduler`,
+    # `flask outbox run` ... process each and disable these in the web workers
+    from services.leaderboard import LeaderboardRefresher
+    from services.outbox import OutboxWorker
+    from services.replicas import ReplicaMonitor
+    from services.reset_scheduler import ResetScheduler
+    from services.weekly_progress import ProgressAggregator
+
+    if app.config["RESET_SCHEDULER_ENABLED"]:
+        ResetScheduler(app).start()
+    if app.config["WEEKLY_PROGRESS_AGGREGATOR_ENABLED"]:
+        ProgressAggregator(app).start()
+    if app.config["OUTBOX_WORKER_ENABLED"]:
+        OutboxWorker(app).start()
+    if app.config["LEADERBOARD_REFRESH_ENABLED"]:
+        LeaderboardRefresher(app).start()
+    if app.config["REPLICA_BINDS"] and app.config["REPLICA_MAX_LAG"] > 0:
+        ReplicaMonitor(app).start()
+
+
+def create_app(config_object=Config):
+    # Builds the app without touching the database: tables come from
+    # `flask init-db`, caches and pools fill on first use.
+    started = time.perf_counter()
+    report = {}
+
+    def step(name, since):
+        now = time.perf_counter()
+        report[f"{name}_ms"] = round((now - since) * 1000, 2)
+        return now
+
+    from services.serialization import FastJSONProvider
+
+    app = Flask(__name__, static_folder='static')
+    app.config.from_object(config_object)
+    app.json = FastJSONProvider(app)  # orjson behind jsonify when installed
+
+    # Access token short (minutes), Refresh token long (days)
+    app.config.setdefault('JWT_ACCESS_TOKEN_EXPIRES', timedelta(minutes=15))
+    app.config.setdefault('JWT_REFRESH_TOKEN_EXPIRES', timedelta(days=30))
+
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=app.config["LOG_LEVEL"], format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    mark = step("config", started)
+
+    db.init_app(app)
+    init_migrate(app)
+    cors.init_app(app)
+    jwt.init_app(app)
+    mark = step("extensions", mark)
+
+    from routes.auth import auth_bp
+    from routes.habits import habits_bp
+    from routes.rewards import rewards_bp
+    from routes.avatar import avatar_bp
+    from routes.leaderboards import leaderboards_bp
+    from commands import register_commands
+
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(habits_bp)
+    app.register_blueprint(rewards_bp)
+    app.register_blueprint(avatar_bp)
+    app.register_blueprint(leaderboards_bp)
+    register_commands(app)
+    register_metrics_routes(app)
+
+    @app.route('/')
+    def home():
+        return "Welcome to Habit RPG Tracker! Flask backend is running successfully."
+    mark = step("blueprints", mark)
+
+    from services.avatar_assets import build_app_avatars
+    from services.blocklist import init_revocation_cache
+    from services.catalog import init_catalog_cache
+    from services.leaderboard import init_leaderboards
+    from services.passwords import init_password_hasher
+    from services.replicas import init_replicas
+    from services.request_metrics import init_request_metrics
+
+    init_revocation_cache(app)
+    init_password_hasher(app)
+    init_catalog_cache(app)
+    init_leaderboards(app)
+    init_request_metrics(app)
+    init_replicas(app)
+    mark = step("services", mark)
+
+    if app.config["DB_CREATE_ON_STARTUP"]:
+        from services.schema import upgrade_schema
+        with app.app_context():
+            upgrade_schema()
+        mark = step("schema", mark)
+
+    # Every worker builds into the same directory at once: files go through
+    # unique temp names and nothing is pruned. Slow to boot; prefer
+    # `flask avatars build` as a deploy step
+    if app.config["AVATAR_BUILD_ON_STARTUP"]:
+        build_app_avatars(app, prune=False)
+        mark = step("avatars", mark)
+
+    start_workers(app)
+    step("workers", mark)
+
+    report["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    app.extensions["startup_report"] = report
+    logger.info("App ready in %.1f ms (%s)", report["total_ms"],
+                ", ".join(f"{key[:-3]} {value} ms" for key, value in report.items() if key != "total_ms"))
+    return app
+
+
+# For `gunicorn app:app` and `flask --app app ...`. Password hashing processes
+# re-import the script run as __main__ (`python app.py`) as __mp_main__; they
+# only need bcrypt, not an app with background threads.
+if __name__ != "__mp_main__":
+    app = create_app()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,44 @@
+# Shared helpers for the benchmark scripts: boot app.py against a throwaway
+# SQLite database (unless DATABASE_URI is already set) and create users.
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+warnings.filterwarnings("ignore")
+
+
+def boot_app(**env):
+    if "DATABASE_URI" not in os.environ:
+        db_file = os.path.join(tempfile.mkdtemp(prefix="habit-bench-"), "bench.db")
+        os.environ["DATABASE_URI"] = f"sqlite:///{db_file}"
+    # Tables before the background workers' first tick
+    env.setdefault("DB_CREATE_ON_STARTUP", "true")
+    for key, value in env.items():
+        os.environ.setdefault(key, str(value))
+
+    import app as app_module
+    from models import db
+
+    app = app_module.app
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def login(client, username):
+    email = f"{username}@bench.local"
+    client.post("/auth/signup", json={"username": username, "email": email, "password": "bench"})
+    data = client.post("/auth/login", json={"email": email, "password": "bench"}).get_json()
+    return data["user_id"], {"Authorization": f"Bearer {data['access_token']}"}
+
+
+def rate(fn, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    elapsed = time.perf_counter() - started
+    return requests / elapsed
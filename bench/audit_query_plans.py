@@ -0,0 +1,136 @@
+# Query plan audit: drives every endpoint against a seeded database, captures
+# the SQL each one runs and EXPLAINs it, flagging full table scans. Exits 1
+# when a filtered query scans a whole table, so CI catches plan regressions.
+#   python bench/audit_query_plans.py [users] [habits_per_user]
+# Uses a throwaway SQLite file unless DATABASE_URI points elsewhere.
+import re
+import sys
+from datetime import date, timedelta
+
+from sqlalchemy import event, text
+
+from _common import boot_app, login
+
+
+def explain(connection, statement, parameters):
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        plan = [row[-1] for row in rows]
+        scans = [line for line in plan if re.match(r"SCAN \w+$", line)]
+    elif dialect == "postgresql":
+        plan = [row[0] for row in connection.exec_driver_sql("EXPLAIN " + statement, parameters)]
+        scans = [line for line in plan if "Seq Scan" in line]
+    elif dialect == "mysql":
+        result = connection.exec_driver_sql("EXPLAIN " + statement, parameters)
+        rows = [dict(zip(result.keys(), row)) for row in result]
+        plan = [f"{row['table']}: {row['type']} key={row['key']}" for row in rows]
+        scans = [line for line, row in zip(plan, rows) if row["type"] == "ALL"]
+    else:
+        raise SystemExit(f"EXPLAIN not supported for {dialect}")
+    return plan, scans
+
+
+def seed(app, users, habits_per_user):
+    from models import db, User, Habit, UserStreak, WeeklyProgress, AvatarList, Reward, TokenBlocklist
+
+    with app.app_context():
+        db.session.execute(db.insert(User), [
+            {"username": f"audit{i}", "email": f"audit{i}@bench.local", "xp": i % 500}
+            for i in range(users)
+        ])
+        user_ids = db.session.execute(db.select(User.user_id)).scalars().all()
+        db.session.execute(db.insert(Habit), [
+            {"user_id": uid, "name": f"Habit {j}", "habit_type": "good" if j % 2 else "bad",
+             "habit_nature": "mental" if j % 3 else "physical", "done_today": j % 4 == 0}
+            for uid in user_ids for j in range(habits_per_user)
+        ])
+        db.session.execute(db.insert(UserStreak), [{"user_id": uid} for uid in user_ids])
+        monday = date.today() - timedelta(days=date.today().weekday())
+        db.session.execute(db.insert(WeeklyProgress), [
+            {"user_id": uid, "week_start": monday - timedelta(weeks=w)} for uid in user_ids for w in range(4)
+        ])
+        db.session.execute(db.insert(TokenBlocklist), [{"jti": f"audit-{i:030d}"} for i in range(users)])
+        db.session.add_all(AvatarList(filename=f"avatar {i}.jpg") for i in range(40))
+        db.session.add_all(Reward(name=f"Reward {i}", cost=10 * i) for i in range(10))
+        db.session.commit()
+        if db.engine.dialect.name in ("sqlite", "postgresql"):
+            db.session.execute(text("ANALYZE"))
+            db.session.commit()
+
+
+def drive_endpoints(client, capture):
+    user_id, headers = login(client, "audit_driver")
+    habits = client.get("/habits/", headers=headers).get_json()
+
+    steps = [
+        ("POST /auth/login", lambda: client.post(
+            "/auth/login", json={"email": "audit_driver@bench.local", "password": "bench"})),
+        ("GET /auth/me", lambda: client.get("/auth/me", headers=headers)),
+        ("GET /auth/streaks", lambda: client.get("/auth/streaks", headers=headers)),
+        ("GET /habits/", lambda: client.get("/habits/", headers=headers)),
+        ("GET /habits/progress", lambda: client.get("/habits/progress?weeks=8", headers=headers)),
+        ("POST /habits/<id>/done", lambda: client.post(f"/habits/{habits[0]['id']}/done", headers=headers)),
+        ("POST /habits/done/batch", lambda: client.post(
+            "/habits/done/batch", json={"habits": [h["id"] for h in habits[1:4]]}, headers=headers)),
+        ("GET /rewards/", lambda: client.get("/rewards/")),
+        ("POST /rewards/buy", lambda: client.post(
+            "/rewards/buy", json={"user_id": user_id, "reward_id": 1}, headers=headers)),
+        ("GET /avatar/list", lambda: client.get("/avatar/list")),
+        ("POST /avatar/select", lambda: client.post("/avatar/select", json={"avatar_id": 1}, headers=headers)),
+        ("DELETE /habits/<id>", lambda: client.delete(f"/habits/{habits[-1]['id']}", headers=headers)),
+        ("POST /habits/daily_reset", lambda: client.post("/habits/daily_reset", json={"chunk_size": 500})),
+        ("POST /auth/logout", lambda: client.post("/auth/logout", headers=headers)),
+    ]
+    for label, call in steps:
+        capture["label"] = label
+        call()
+    capture["label"] = None
+
+
+def audit(app, users=2000, habits_per_user=8):
+    # (statements audited, [(endpoint, statement, plan)] for every filtered
+    # query that scans a whole table)
+    from models import db
+
+    seed(app, users, habits_per_user)
+
+    capture = {"label": None, "statements": []}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if capture["label"] and not executemany and verb in ("SELECT", "UPDATE", "DELETE"):
+            capture["statements"].append((capture["label"], statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        drive_endpoints(app.test_client(), capture)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    flagged = []
+    seen = set()
+    with engine.connect() as connection:
+        for label, statement, parameters in capture["statements"]:
+            if (label, statement) in seen:
+                continue
+            seen.add((label, statement))
+            plan, scans = explain(connection, statement, parameters)
+            # Unfiltered catalog reads (e.g. GET /rewards/) scan on purpose
+            if scans and re.search(r"\bWHERE\b", statement, re.IGNORECASE):
+                flagged.append((label, " ".join(statement.split()), plan))
+    return len(seen), flagged
+
+
+def main(users=2000, habits_per_user=8):
+    audited, flagged = audit(boot_app(), users, habits_per_user)
+    for label, statement, plan in flagged:
+        print(f"FULL SCAN  {label}\n  {statement}\n  plan: {plan}")
+    print(f"{audited} statements audited, {len(flagged)} full scans")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,67 @@
+# Leaderboard benchmark: rank / top-10 / update on the in-memory boards vs
+# the SQL they replace (ORDER BY xp LIMIT, COUNT(*) WHERE xp > ?), plus the
+# time of a full rebuild over N users.
+#   python bench/bench_leaderboard.py [users]
+import random
+import sys
+import timeit
+
+from _common import boot_app
+
+
+def main(users=100000):
+    app = boot_app(LEADERBOARD_REFRESH_ENABLED="false")
+    from models import db, User
+    from services.leaderboard import XP, leaderboards
+
+    random.seed(7)
+    with app.app_context():
+        db.session.execute(
+            db.insert(User),
+            [{"username": f"lb{i}", "email": f"lb{i}@bench.local", "xp": random.randint(0, 500_000)}
+             for i in range(users)],
+        )
+        db.session.commit()
+
+        leaderboards.rebuild()
+        print(f"rebuild of {users} users: {leaderboards.stats()['build_ms']:.1f} ms")
+        user_ids = db.session.execute(db.select(User.user_id)).scalars().all()
+        samples = random.sample(user_ids, 200)
+
+        def sql_rank():
+            for user_id in samples:
+                xp = db.session.execute(db.select(User.xp).where(User.user_id == user_id)).scalar()
+                db.session.execute(db.select(db.func.count()).where(User.xp > xp)).scalar()
+
+        def sql_top():
+            for _ in samples:
+                db.session.execute(db.select(User.user_id, User.xp).order_by(User.xp.desc()).limit(10)).all()
+
+        board = leaderboards._boards[XP]
+
+        def memory_rank():
+            for user_id in samples:
+                board.rank(user_id)
+
+        def memory_top():
+            for _ in samples:
+                board.page(0, 10)
+
+        def memory_update():
+            for user_id in samples:
+                board.set(user_id, random.randint(0, 500_000))
+
+        candidates = {
+            "SQL rank": sql_rank,
+            "SQL top 10": sql_top,
+            "memory rank": memory_rank,
+            "memory top 10": memory_top,
+            "memory update": memory_update,
+        }
+        for name, fn in candidates.items():
+            seconds = min(timeit.repeat(fn, number=1, repeat=3))
+            print(f"{name:>14}: {seconds / len(samples) * 1e6:10.1f} us/call")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,49 @@
+# Level computation micro-benchmark: the old O(sqrt(xp)) loop vs the
+# threshold-table lookup, plus the bulk recompute over N users.
+#   python bench/bench_levels.py [users]
+import random
+import sys
+import timeit
+
+from _common import boot_app
+
+
+def loop_level(xp):
+    level = 1
+    while xp >= 50 * (level ** 2):
+        level += 1
+    return level
+
+
+def main(users=20000):
+    app = boot_app()
+    from models import db, User
+    from services import progression
+
+    random.seed(7)
+    samples = [random.randint(0, 5_000_000) for _ in range(10000)]
+    candidates = {
+        "while loop": loop_level,
+        "level_for_xp": progression.level_for_xp,
+    }
+    for name, fn in candidates.items():
+        seconds = min(timeit.repeat(lambda: [fn(xp) for xp in samples], number=1, repeat=5))
+        print(f"{name:>12}: {seconds / len(samples) * 1e9:8.0f} ns/call")
+
+    with app.app_context():
+        db.session.execute(
+            db.insert(User),
+            [{"username": f"lvl{i}", "email": f"lvl{i}@bench.local", "xp": random.randint(0, 500_000)}
+             for i in range(users)],
+        )
+        db.session.commit()
+        seconds = timeit.timeit(progression.recompute_all_levels, number=1)
+        mismatched = sum(
+            1 for xp, level in db.session.execute(db.select(User.xp, User.level))
+            if loop_level(xp) != level
+        )
+    print(f"bulk recompute of {users} users: {seconds * 1000:.1f} ms ({mismatched} mismatches)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
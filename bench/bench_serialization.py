@@ -0,0 +1,62 @@
+# Serialization benchmark for list payloads of 10, 100 and 1000 habits:
+# hand-built dicts from ORM objects through Flask's stdlib JSON provider (the
+# old list_habits) vs the precompiled HABIT schema over result rows, with the
+# stdlib provider and with FastJSONProvider (orjson, when installed).
+#   python bench/bench_serialization.py [sizes...]
+import sys
+import timeit
+
+from _common import boot_app
+
+
+def main(*sizes):
+    sizes = sizes or (10, 100, 1000)
+    app = boot_app()
+    from flask.json.provider import DefaultJSONProvider
+    from models import db, User, Habit
+    from services import serialization
+    from services.habit_listing import DEFAULT_FIELDS
+
+    stdlib = DefaultJSONProvider(app)
+    fast = serialization.FastJSONProvider(app)
+    print(f"orjson: {'installed' if serialization.orjson else 'not installed (stdlib fallback)'}")
+
+    with app.app_context():
+        user = User(username="ser", email="ser@bench.local")
+        db.session.add(user)
+        db.session.flush()
+        db.session.execute(db.insert(Habit), [
+            {"user_id": user.user_id, "name": f"Habit {i}", "habit_type": "good", "habit_nature": "mental",
+             "xp_value": 10, "streak": i % 7}
+            for i in range(max(sizes))
+        ])
+        db.session.commit()
+
+        def hand_built(habits):
+            return [{"id": h.id, "user_id": h.user_id, "name": h.name, "habit_type": h.habit_type,
+                     "habit_nature": h.habit_nature, "xp_value": h.xp_value, "streak": h.streak,
+                     "last_done": str(h.last_done), "done_today": h.done_today} for h in habits]
+
+        convert = serialization.HABIT.serializer(DEFAULT_FIELDS)
+        print(f"{'items':>6} {'hand + stdlib':>16} {'schema + stdlib':>16} {'schema + fast':>16}  bytes")
+        for size in sizes:
+            habits = Habit.query.order_by(Habit.id).limit(size).all()
+            rows = db.session.execute(
+                db.select(*serialization.HABIT.columns(DEFAULT_FIELDS)).order_by(Habit.id).limit(size)
+            ).all()
+            with app.test_request_context():
+                candidates = {
+                    "hand + stdlib": lambda: stdlib.response(hand_built(habits)),
+                    "schema + stdlib": lambda: stdlib.response([convert(row) for row in rows]),
+                    "schema + fast": lambda: fast.response([convert(row) for row in rows]),
+                }
+                timings = []
+                for fn in candidates.values():
+                    number = max(10000 // size, 5)
+                    timings.append(min(timeit.repeat(fn, number=number, repeat=5)) / number)
+                body = fast.response([convert(row) for row in rows]).get_data()
+            print(f"{size:>6} " + " ".join(f"{seconds * 1e6:13.1f} us" for seconds in timings) + f"  {len(body)}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
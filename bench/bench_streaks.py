@@ -0,0 +1,89 @@
+# Streak evaluation benchmark: current streak, "missed yesterday" and 7/30-day
+# completion rates per habit, from the completion bitmap vs by reading the
+# habit's rows in habit_completions. Also times the backfill that builds the
+# bitmaps from that log.
+#   python bench/bench_streaks.py [habits] [days]
+import random
+import sys
+import timeit
+from datetime import date, timedelta
+
+from _common import boot_app
+
+
+def main(habits=2000, days=60):
+    app = boot_app()
+    from models import db, User, Habit, HabitCompletion
+    from services import streaks
+
+    random.seed(7)
+    today = date.today()
+    with app.app_context():
+        db.session.execute(db.insert(User), [
+            {"username": f"st{i}", "email": f"st{i}@bench.local"} for i in range(habits // 10 or 1)
+        ])
+        user_ids = db.session.execute(db.select(User.user_id)).scalars().all()
+        db.session.execute(db.insert(Habit), [
+            {"user_id": user_ids[i % len(user_ids)], "name": f"Habit {i}", "habit_type": "good",
+             "habit_nature": "mental", "xp_value": 10}
+            for i in range(habits)
+        ])
+        rows = db.session.execute(db.select(Habit.id, Habit.user_id)).all()
+        completions = [
+            {"habit_id": habit_id, "user_id": user_id, "habit_type": "good", "xp_delta": 10,
+             "completed_on": today - timedelta(days=offset), "aggregated": True}
+            for habit_id, user_id in rows
+            for offset in range(days) if random.random() < 0.7
+        ]
+        db.session.execute(db.insert(HabitCompletion), completions)
+        db.session.commit()
+        print(f"{habits} habits, {len(completions)} completion rows over {days} days")
+
+        summary = streaks.backfill_streaks(batch_size=1000, today=today)
+        print(f"backfill: {summary['elapsed_seconds'] * 1000:.1f} ms "
+              f"({summary['elapsed_seconds'] / habits * 1e6:.1f} us per habit)")
+
+        state = db.session.execute(
+            db.select(Habit.id, Habit.completion_bits, Habit.last_done, Habit.streak)
+        ).all()
+        sample = random.sample(state, min(200, len(state)))
+
+        def from_bitmap():
+            for _, bits, last_done, streak in state:
+                streaks.current_streak(last_done, streak, today)
+                streaks.missed_yesterday(last_done, today)
+                streaks.completion_rate(bits, last_done, today, 7)
+                streaks.completion_rate(bits, last_done, today, 30)
+
+        def from_rows():
+            for habit_id, *_ in sample:
+                done = db.session.execute(
+                    db.select(HabitCompletion.completed_on)
+                    .where(HabitCompletion.habit_id == habit_id)
+                    .order_by(HabitCompletion.completed_on.desc())
+                ).scalars().all()
+                done_set = set(done)
+                day, run = today if today in done_set else today - timedelta(days=1), 0
+                while day in done_set:
+                    run += 1
+                    day -= timedelta(days=1)
+                sum(1 for d in done if (today - d).days < 7) / 7
+                sum(1 for d in done if (today - d).days < 30) / 30
+
+        bitmap = min(timeit.repeat(from_bitmap, number=1, repeat=5)) / len(state)
+        scan = min(timeit.repeat(from_rows, number=1, repeat=3)) / len(sample)
+        print(f"  bitmap: {bitmap * 1e6:10.2f} us per habit")
+        print(f"    rows: {scan * 1e6:10.2f} us per habit ({scan / bitmap:.0f}x)")
+
+        mismatched = 0
+        for habit_id, bits, last_done, streak in sample:
+            done = set(db.session.execute(
+                db.select(HabitCompletion.completed_on).where(HabitCompletion.habit_id == habit_id)
+            ).scalars())
+            expected = sum(1 for d in done if (today - d).days < 30)
+            mismatched += streaks.days_done(bits, last_done, today, 30) != expected
+        print(f"30-day counts checked against the log: {mismatched} mismatches")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
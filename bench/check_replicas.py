@@ -0,0 +1,98 @@
+# Replica routing check with two SQLite files standing in for a primary and a
+# replica (copied with the sqlite3 backup API, i.e. "replication" on demand).
+# Marks the replica's rows so it is visible which database answered, then
+# checks that read-only views use the replica, that a client that just wrote
+# reads from the primary until its pin expires, and that a lagging replica is
+# skipped until it catches up.
+#   python bench/check_replicas.py
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from _common import boot_app, login
+
+PIN_SECONDS = 1
+directory = tempfile.mkdtemp(prefix="habit-replicas-")
+PRIMARY = os.path.join(directory, "primary.db")
+REPLICA = os.path.join(directory, "replica.db")
+
+
+def replicate():
+    source, target = sqlite3.connect(PRIMARY), sqlite3.connect(REPLICA)
+    with target:
+        source.backup(target)
+    source.close()
+    # Tag the copy so answers from the replica can be told apart
+    with target:
+        target.execute("UPDATE habits SET name = name || ' [replica]'")
+    target.close()
+
+
+def habit_names(client, headers):
+    return [habit["name"] for habit in client.get("/habits/", headers=headers).get_json()]
+
+
+def served_by(client, headers):
+    return "replica" if habit_names(client, headers)[0].endswith("[replica]") else "primary"
+
+
+def check(label, actual, expected):
+    print(f"{label:55} {actual:8} {'ok' if actual == expected else 'FAIL (expected ' + expected + ')'}")
+    return actual == expected
+
+
+def main():
+    os.environ["DATABASE_URI"] = f"sqlite:///{PRIMARY}"
+    app = boot_app(
+        DATABASE_REPLICA_URIS=f"sqlite:///{REPLICA}",
+        REPLICA_PIN_SECONDS=PIN_SECONDS, REPLICA_MAX_LAG=1, REPLICA_CHECK_INTERVAL=3600,
+        DB_CREATE_ON_STARTUP="true",
+        OUTBOX_WORKER_ENABLED="false", RESET_SCHEDULER_ENABLED="false",
+        WEEKLY_PROGRESS_AGGREGATOR_ENABLED="false",
+    )
+    from services.replicas import ReplicaMonitor
+    monitor = ReplicaMonitor(app)  # ticked by hand below
+
+    client = app.test_client()
+    _, headers = login(client, "replica-check")
+    client.get("/auth/me", headers=headers)  # builds the profile snapshot (a write) on the primary
+    time.sleep(PIN_SECONDS + 0.2)  # these requests wrote: start unpinned
+    client.delete_cookie("localhost", "db_primary_until")
+    monitor.tick()  # writes the first heartbeat on the primary
+    replicate()
+
+    results = []
+    monitor.tick()
+    results.append(check("GET /habits/ on an in-sync replica", served_by(client, headers), "replica"))
+    results.append(check("GET /auth/me (snapshot read from the replica)",
+                         str(client.get("/auth/me", headers=headers).status_code), "200"))
+    results.append(check("GET /habits/ after that", served_by(client, headers), "replica"))
+
+    habit_id = client.get("/habits/", headers=headers).get_json()[0]["id"]
+    client.post("/habits/done/batch", json={"habits": [habit_id]}, headers=headers)
+    results.append(check("GET /habits/ right after a write (pinned)", served_by(client, headers), "primary"))
+    other = app.test_client()  # same user, no cookie: pinned by user id in this worker
+    results.append(check("same user from a client without the cookie", served_by(other, headers), "primary"))
+
+    time.sleep(PIN_SECONDS + 0.2)
+    client.delete_cookie("localhost", "db_primary_until")
+    results.append(check("after the pin expired", served_by(client, headers), "replica"))
+
+    time.sleep(1.2)
+    monitor.tick()  # the primary's heartbeat moves on, the replica's copy does not
+    results.append(check("replica more than REPLICA_MAX_LAG behind", served_by(client, headers), "primary"))
+
+    replicate()
+    monitor.tick()
+    results.append(check("replica caught up", served_by(client, headers), "replica"))
+
+    print(client.get("/metrics/replicas").get_json())
+    if not all(results):
+        sys.exit("FAIL")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Cold start profile: imports app.py in a fresh interpreter (as a gunicorn
+# worker would), lists the slowest imports (python -X importtime) and fails
+# when booting opens a database connection or takes longer than the budget.
+# tests/test_startup.py runs the connection check in the test suite.
+#   python bench/check_startup.py [budget_ms]
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+connections = []
+event.listen(Pool, "connect", lambda *args: connections.append(1))
+import app
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({"boot_ms": elapsed, "connections": len(connections),
+                  "report": app.app.extensions["startup_report"]}))
+"""
+
+
+def main(budget_ms=1500):
+    env = {
+        **os.environ,
+        # SQLite creates the file on first connect, which would also show up below
+        "DATABASE_URI": os.environ.get(
+            "DATABASE_URI", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='habit-startup-'), 'check.db')}"
+        ),
+        "DB_CREATE_ON_STARTUP": "false",
+        "OUTBOX_WORKER_ENABLED": "false",
+        "RESET_SCHEDULER_ENABLED": "false",
+        "WEEKLY_PROGRESS_AGGREGATOR_ENABLED": "false",
+        "AVATAR_BUILD_ON_STARTUP": "false",
+        "LOG_LEVEL": "WARNING",
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60,
+    )
+    if result.returncode != 0:
+        sys.exit(f"FAIL: app.py did not import\n{result.stderr[-2000:]}")
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # "import time: self [us] | cumulative | imported package"
+    imports = []
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "cumulative" not in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            imports.append((int(cumulative), name.rstrip()))
+    print("slowest imports (cumulative):")
+    for cumulative, name in sorted(imports, reverse=True)[:10]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    print(f"boot: {stats['boot_ms']:.1f} ms (budget {budget_ms} ms), "
+          f"create_app: {stats['report']['total_ms']} ms, DB connections: {stats['connections']}")
+    if stats["connections"]:
+        sys.exit("FAIL: booting the app opened a database connection")
+    if stats["boot_ms"] > budget_ms:
+        sys.exit("FAIL: boot exceeded the budget")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
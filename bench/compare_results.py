@@ -0,0 +1,29 @@
+# Side-by-side comparison of two bench/load_test.py result files.
+#   python bench/compare_results.py before.json after.json
+import json
+import sys
+
+METRICS = ("throughput_rps", "latency_ms_p50", "latency_ms_p95", "latency_ms_p99", "queries_per_request")
+
+
+def main(before_path, after_path):
+    with open(before_path) as handle:
+        before = json.load(handle)
+    with open(after_path) as handle:
+        after = json.load(handle)
+
+    print(f"{before['revision']} -> {after['revision']}")
+    for scenario, result in after["results"].items():
+        old = before["results"].get(scenario)
+        if old is None:
+            continue
+        print(f"\n{scenario}")
+        for metric in METRICS:
+            change = (result[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            print(f"  {metric:22} {old[metric]:10.2f} {result[metric]:10.2f}  {change:+7.1f}%")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit(__doc__ or "usage: compare_results.py before.json after.json")
+    main(*sys.argv[1:])
@@ -0,0 +1,230 @@
+# Load test: serves app.py from a threaded werkzeug server, seeds N users with
+# M habits each and drives the real endpoints over HTTP at a fixed
+# concurrency. Reports throughput, p50/p95/p99 latency and SQL statements per
+# request, and writes the results as JSON for comparison across commits.
+#   python bench/load_test.py --users 200 --habits 10 --concurrency 16 --requests 1000
+#   python bench/compare_results.py bench/results/old.json bench/results/new.json
+# Uses a throwaway SQLite file unless DATABASE_URI points elsewhere (e.g. a
+# local Postgres). Background workers are off so they don't skew the numbers.
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import os
+import platform
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from _common import ROOT, boot_app
+
+SCENARIOS = ("login", "me", "habits", "done", "buy", "reset")
+PASSWORD = "bench-password"
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    return round(values[min(int(len(values) * p), len(values) - 1)] * 1000, 3)
+
+
+class QueryCounter:
+    # SQL statements executed by the app while a scenario runs
+
+    def __init__(self, engine):
+        self._lock = threading.Lock()
+        self.count = 0
+        from sqlalchemy import event
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+def seed(app, users, habits_per_user):
+    # Users, passwords and habits in bulk; every user shares one bcrypt hash
+    from models import db, User, Habit, Reward
+    from services.accounts import import_users
+    from services.passwords import password_hasher
+    from flask_jwt_extended import create_access_token
+
+    with app.app_context():
+        password_hash = password_hasher.hash(PASSWORD)
+        import_users(
+            ({"username": f"load{i}", "email": f"load{i}@bench.local", "password_hash": password_hash}
+             for i in range(users)),
+            batch_size=1000,
+        )
+        user_ids = db.session.execute(db.select(User.user_id).order_by(User.user_id)).scalars().all()
+        extra = habits_per_user - 6  # import_users already added the 6 defaults
+        if extra > 0:
+            db.session.execute(db.insert(Habit), [
+                {"user_id": uid, "name": f"Load habit {j}", "habit_type": "good" if j % 2 else "bad",
+                 "habit_nature": "mental" if j % 3 else "physical", "xp_value": 10}
+                for uid in user_ids for j in range(extra)
+            ])
+        db.session.execute(db.update(User).values(xp=1_000_000))
+        db.session.add_all(Reward(name=f"Load reward {i}", cost=10) for i in range(5))
+        db.session.commit()
+
+        habits = {}
+        for habit_id, user_id in db.session.execute(db.select(Habit.id, Habit.user_id).order_by(Habit.id)):
+            habits.setdefault(user_id, []).append(habit_id)
+        reward_ids = db.session.execute(db.select(Reward.id)).scalars().all()
+        tokens = {uid: create_access_token(identity=str(uid)) for uid in user_ids}
+        emails = dict(db.session.execute(db.select(User.user_id, User.email)).all())
+    return user_ids, habits, reward_ids, tokens, emails
+
+
+def build_requests(scenario, count, user_ids, habits, reward_ids, tokens, emails):
+    # -> list of (method, path, headers, body); users are used round-robin
+    users = itertools.cycle(user_ids)
+
+    def auth(uid):
+        return {"Authorization": f"Bearer {tokens[uid]}"}
+
+    if scenario == "login":
+        return [("POST", "/auth/login", {}, {"email": emails[uid], "password": PASSWORD})
+                for uid in itertools.islice(users, count)]
+    if scenario == "me":
+        return [("GET", "/auth/me", auth(uid), None) for uid in itertools.islice(users, count)]
+    if scenario == "habits":
+        return [("GET", "/habits/", auth(uid), None) for uid in itertools.islice(users, count)]
+    if scenario == "done":
+        # each habit at most once, spread across users
+        pending = [habit_id for group in itertools.zip_longest(*habits.values()) for habit_id in group if habit_id]
+        return [("POST", f"/habits/{habit_id}/done", {}, None) for habit_id in pending[:count]]
+    if scenario == "buy":
+        return [("POST", "/rewards/buy", {**auth(uid), "Idempotency-Key": f"load-{n}"},
+                 {"reward_id": reward_ids[n % len(reward_ids)]})
+                for n, uid in enumerate(itertools.islice(users, count))]
+    if scenario == "reset":
+        return [("POST", "/habits/daily_reset", {}, None)] * count
+    raise ValueError(scenario)
+
+
+def send(port, method, path, headers, body):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    payload = None
+    if body is not None:
+        payload = json.dumps(body)
+        headers = {**headers, "Content-Type": "application/json"}
+    started = time.perf_counter()
+    try:
+        connection.request(method, path, payload, headers)
+        response = connection.getresponse()
+        response.read()
+        status = response.status
+    except OSError:
+        status = 0
+    finally:
+        connection.close()
+    return status, time.perf_counter() - started
+
+
+def run_scenario(port, counter, requests, concurrency):
+    queries_before = counter.count
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda request: send(port, *request), requests))
+    elapsed = time.perf_counter() - started
+    queries = counter.count - queries_before
+
+    latencies = sorted(seconds for _, seconds in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": len(results),
+        "errors": sum(count for status, count in statuses.items() if not status.startswith("2")),
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms_p50": percentile(latencies, 0.50),
+        "latency_ms_p95": percentile(latencies, 0.95),
+        "latency_ms_p99": percentile(latencies, 0.99),
+        "latency_ms_max": percentile(latencies, 1.0),
+        "queries_per_request": round(queries / len(results), 2) if results else 0.0,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Habit RPG API.")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--habits", type=int, default=10, help="habits per user, including the 6 defaults")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--reset-requests", type=int, default=3, help="requests for the reset scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--output", help="JSON file (default bench/results/<time>-<revision>.json)")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    app = boot_app(
+        OUTBOX_WORKER_ENABLED="false", RESET_SCHEDULER_ENABLED="false",
+        WEEKLY_PROGRESS_AGGREGATOR_ENABLED="false",
+    )
+    from werkzeug.serving import make_server
+    from models import db
+
+    user_ids, habits, reward_ids, tokens, emails = seed(app, args.users, args.habits)
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+        dialect = db.engine.dialect.name
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no per-request access log
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    results = {}
+    try:
+        for scenario in scenarios:
+            count = args.reset_requests if scenario == "reset" else args.requests
+            requests = build_requests(scenario, count, user_ids, habits, reward_ids, tokens, emails)
+            # reset mutates every row: one request at a time
+            concurrency = 1 if scenario == "reset" else args.concurrency
+            results[scenario] = run_scenario(server.server_port, counter, requests, concurrency)
+            r = results[scenario]
+            print(f"{scenario:8} {r['requests']:6} req  {r['throughput_rps']:8.1f} req/s  "
+                  f"p50 {r['latency_ms_p50']:8.2f}  p95 {r['latency_ms_p95']:8.2f}  p99 {r['latency_ms_p99']:8.2f} ms  "
+                  f"{r['queries_per_request']:6.2f} q/req  errors {r['errors']}")
+    finally:
+        server.shutdown()
+
+    revision = git_revision()
+    report = {
+        "revision": revision,
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": platform.python_version(),
+        "database": dialect,
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        ROOT, "bench", "results", f"{datetime.utcnow():%Y%m%d-%H%M%S}-{revision}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
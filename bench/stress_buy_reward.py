@@ -0,0 +1,65 @@
+# Concurrency load for POST /rewards/buy: fires parallel purchases from one
+# user, some retried with the same Idempotency-Key, and verifies that the XP
+# balance, the purchases and the ledger agree and never go negative. The same
+# check runs at test size in tests/test_purchases.py.
+#   python bench/stress_buy_reward.py [purchases] [threads]
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import boot_app, login
+
+START_XP = 1000
+COST = 30
+
+
+def main(purchases=60, threads=8):
+    app = boot_app()
+    from models import db, Reward, User, UserReward, XpLedger
+
+    client = app.test_client()
+    user_id, headers = login(client, "stress_buy")
+
+    with app.app_context():
+        reward = Reward(name="Stress reward", cost=COST)
+        db.session.add(reward)
+        db.session.get(User, user_id).xp = START_XP
+        db.session.commit()
+        reward_id = reward.id
+
+    # each key sent twice, interleaved: at most one charge per key
+    keys = [f"stress-{i}" for i in range(purchases)] * 2
+
+    def buy(key):
+        response = app.test_client().post(
+            "/rewards/buy", json={"reward_id": reward_id},
+            headers={**headers, "Idempotency-Key": key},
+        )
+        return response.status_code, (response.get_json() or {}).get("replayed", False)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(buy, keys))
+
+    with app.app_context():
+        final_xp = db.session.get(User, user_id).xp
+        bought = UserReward.query.filter_by(user_id=user_id).count()
+        ledger = XpLedger.query.filter_by(user_id=user_id).all()
+
+    charged = [status for status, replayed in results if status == 200 and not replayed]
+    replays = sum(1 for status, replayed in results if replayed)
+    expected_buys = min(purchases, START_XP // COST)
+    print(f"requests: {len(results)}  charged: {len(charged)}  replayed: {replays}  "
+          f"400: {sum(1 for status, _ in results if status == 400)}  "
+          f"other: {sum(1 for status, _ in results if status not in (200, 400))}")
+    print(f"xp: {final_xp} (expected {START_XP - COST * expected_buys})  purchases: {bought}  "
+          f"ledger rows: {len(ledger)}  ledger total: {sum(entry.delta for entry in ledger)}")
+
+    if (final_xp != START_XP - COST * expected_buys or bought != expected_buys
+            or len(charged) != expected_buys or len(ledger) != expected_buys
+            or sum(entry.delta for entry in ledger) != -COST * expected_buys
+            or min(entry.balance_after for entry in ledger) < 0):
+        sys.exit("FAIL: balance, purchases and ledger disagree")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,52 @@
+# Concurrency load for POST /habits/<id>/done: fires completions (including
+# duplicates of the same habit) from parallel threads and verifies that the
+# user's XP equals exactly one completion per habit. The same check runs at
+# test size in tests/test_completion.py; this script is for larger loads or
+# another DATABASE_URI.
+#   python bench/stress_mark_done.py [habits] [threads]
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import boot_app, login
+
+
+def main(habits=40, threads=8):
+    app = boot_app()
+    from models import db, Habit, User
+
+    client = app.test_client()
+    user_id, _ = login(client, "stress_done")
+
+    with app.app_context():
+        db.session.add_all(
+            Habit(user_id=user_id, name=f"Stress {i}", habit_type="good",
+                  habit_nature="mental" if i % 2 else "physical", xp_value=10)
+            for i in range(habits)
+        )
+        db.session.commit()
+        habit_ids = [h.id for h in Habit.query.filter_by(user_id=user_id, habit_type="good").all()]
+        start_xp = db.session.get(User, user_id).xp
+
+    # every habit three times, interleaved
+    work = habit_ids * 3
+
+    def complete(habit_id):
+        return app.test_client().post(f"/habits/{habit_id}/done").status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(complete, work))
+
+    with app.app_context():
+        final_xp = db.session.get(User, user_id).xp
+
+    expected = start_xp + 10 * len(habit_ids)
+    print(f"requests: {len(work)}  200: {statuses.count(200)}  400: {statuses.count(400)}  "
+          f"other: {len(statuses) - statuses.count(200) - statuses.count(400)}")
+    print(f"xp: {final_xp} (expected {expected})")
+    if final_xp != expected or statuses.count(200) != len(habit_ids):
+        sys.exit("FAIL: lost or double-counted completions")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
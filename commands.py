@@ -0,0 +1,133 @@
+import click
+
+from services.avatar_assets import build_app_avatars
+from services.accounts import import_users, read_user_rows
+from services.blocklist import blocklist_stats, compact_blocklist
+from services.outbox import OutboxWorker, outbox_stats
+from services.progression import recompute_all_levels
+from services.reset_scheduler import ResetScheduler
+from services.schema import upgrade_schema
+from services.streaks import backfill_streaks
+from services.weekly_progress import ProgressAggregator, aggregate_completions
+
+
+def register_commands(app):
+
+    @app.cli.command("init-db")
+    def init_db():
+        """Apply the database migrations, like `flask db upgrade` (once per deploy, before the workers start)."""
+        upgrade_schema()
+
+    @app.cli.command("reset-scheduler")
+    @click.option("--once", is_flag=True, help="Run a single tick and exit.")
+    def reset_scheduler(once):
+        """Run the rolling daily reset worker."""
+        scheduler = ResetScheduler(app)
+        if once:
+            for bucket, summary in scheduler.tick().items():
+                click.echo(f"{bucket}: {summary}")
+        else:
+            scheduler.run_forever()
+
+    @app.cli.group()
+    def blocklist():
+        """Token blocklist maintenance."""
+
+    @blocklist.command("compact")
+    @click.option("--batch-size", default=1000, show_default=True, help="Rows deleted per transaction.")
+    def blocklist_compact(batch_size):
+        """Delete blocklist entries whose tokens have expired."""
+        for key, value in compact_blocklist(batch_size).items():
+            click.echo(f"{key}: {value}")
+
+    @blocklist.command("stats")
+    def blocklist_show_stats():
+        """Show blocklist size and lookup latency."""
+        for key, value in blocklist_stats().items():
+            click.echo(f"{key}: {value}")
+
+    @app.cli.group()
+    def levels():
+        """Level curve maintenance."""
+
+    @levels.command("recompute")
+    def levels_recompute():
+        """Recompute every user's level and rank from XP (after a curve change)."""
+        for key, value in recompute_all_levels().items():
+            click.echo(f"{key}: {value}")
+
+    @app.cli.group()
+    def streaks():
+        """Streak maintenance."""
+
+    @streaks.command("backfill")
+    @click.option("--batch-size", default=1000, show_default=True, help="Habits or users per transaction.")
+    def streaks_backfill(batch_size):
+        """Rebuild completion bitmaps and streaks from habit_completions."""
+        for key, value in backfill_streaks(batch_size).items():
+            click.echo(f"{key}: {value}")
+
+    @app.cli.group()
+    def progress():
+        """Weekly progress aggregation."""
+
+    @progress.command("aggregate")
+    @click.option("--batch-size", default=1000, show_default=True, help="Events per transaction.")
+    @click.option("--loop", is_flag=True, help="Keep running every WEEKLY_PROGRESS_INTERVAL seconds.")
+    def progress_aggregate(batch_size, loop):
+        """Fold new habit completions into weekly_progress."""
+        if loop:
+            ProgressAggregator(app).run_forever()
+            return
+        for key, value in aggregate_completions(batch_size).items():
+            click.echo(f"{key}: {value}")
+
+    @app.cli.group()
+    def outbox():
+        """Deferred work queue."""
+
+    @outbox.command("run")
+    @click.option("--once", is_flag=True, help="Process what is pending and exit.")
+    def outbox_run(once):
+        """Process outbox jobs."""
+        worker = OutboxWorker(app)
+        if once:
+            click.echo(worker.tick())
+        else:
+            worker.run_forever()
+
+    @outbox.command("stats")
+    def outbox_show_stats():
+        """Show queue depth and lag."""
+        for key, value in outbox_stats().items():
+            click.echo(f"{key}: {value}")
+
+    @app.cli.group()
+    def users():
+        """User administration."""
+
+    @users.command("import")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Defaults to the file extension.")
+    @click.option("--batch-size", default=1000, show_default=True, help="Users per transaction.")
+    def users_import(path, fmt, batch_size):
+        """Bulk-create users (with default habits) from a CSV or JSON Lines file."""
+        fmt = fmt or ("csv" if path.endswith(".csv") else "jsonl")
+        with open(path, encoding="utf-8", newline="") as stream:
+            summary = import_users(read_user_rows(stream, fmt), batch_size)
+        for key, value in summary.items():
+            click.echo(f"{key}: {value}")
+
+    @app.cli.group()
+    def avatars():
+        """Avatar image assets."""
+
+    @avatars.command("build")
+    @click.option("--no-prune", is_flag=True, help="Keep files neither the new nor the replaced manifest references.")
+    def avatars_build(no_prune):
+        """Write resized, content-hashed avatar files and their manifest."""
+        summary = build_app_avatars(app, prune=not no_prune)
+        for key, value in summary.items():
+            click.echo(f"{key}: {value}")
+        if not summary["resized"]:
+            click.echo("Pillow is not installed: originals were copied without resizing.")
@@ -1,9 +1,184 @@
 import os
 from dotenv import load_dotenv
-load_dotenv()
+from services.pool_metrics import InstrumentedQueuePool
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# The one place .env is read; it must happen before the class body below
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+
+def _env_flag(name, default="false"):
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def _engine_options(uri):
+    # Pool settings per worker process. SQLite keeps SQLAlchemy's own pool choice.
+    if not uri or uri.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),  # seconds, below server idle timeouts
+        "pool_pre_ping": _env_flag("DB_POOL_PRE_PING", "true"),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),  # seconds to wait for a free connection
+    }
+
 
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URI")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwt-secret-string")
+
+    # Read replicas (comma-separated URIs), used as binds replica_0, replica_1, ...
+    # for views marked @read_only. A client that wrote reads from the primary for
+    # REPLICA_PIN_SECONDS. Replicas more than REPLICA_MAX_LAG seconds behind (checked
+    # every REPLICA_CHECK_INTERVAL) are skipped; REPLICA_MAX_LAG=0 turns the check off.
+    SQLALCHEMY_BINDS = {
+        f"replica_{i}": uri.strip()
+        for i, uri in enumerate(uri for uri in os.getenv("DATABASE_REPLICA_URIS", "").split(",") if uri.strip())
+    }
+    REPLICA_BINDS = list(SQLALCHEMY_BINDS)
+    REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 5))
+    REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", 5))
+    REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", 2))
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+    # Tables are managed with `flask db upgrade` (migrations/). Set this for hosts
+    # without a release step; every worker then runs the upgrade at boot.
+    DB_CREATE_ON_STARTUP = _env_flag("DB_CREATE_ON_STARTUP")
+
+    # Level curve: reaching level L + 1 takes LEVEL_XP_BASE * L ** LEVEL_XP_EXPONENT XP.
+    # Changing it needs `flask levels recompute` to update stored levels.
+    LEVEL_XP_BASE = int(os.getenv("LEVEL_XP_BASE", 50))
+    LEVEL_XP_EXPONENT = float(os.getenv("LEVEL_XP_EXPONENT", 2))
+    LEVEL_MAX = int(os.getenv("LEVEL_MAX", 10000))
+    LEVEL_NAMES = [
+        name.strip() for name in os.getenv("LEVEL_NAMES", ",".join([
+            "Dormant Beginner",
+            "Reluctant Starter",
+            "Awakening Novice",
+            "Weary Wanderer",
+            "Determined Wanderer",
+            "Focused Adept",
+            "Steady Attendant",
+            "Resolute Attendant",
+            "Disciplined Attendant",
+            "Skilled Operative",
+            "Advanced Operative",
+            "Master Operative",
+        ])).split(",")
+    ]
+
+    # Rows per UPDATE statement in /habits/daily_reset
+    DAILY_RESET_CHUNK_SIZE = int(os.getenv("DAILY_RESET_CHUNK_SIZE", 1000))
+
+    # Completion events are folded into weekly_progress by `flask progress aggregate`
+    # or, when enabled, by a background thread every WEEKLY_PROGRESS_INTERVAL seconds
+    WEEKLY_PROGRESS_AGGREGATOR_ENABLED = _env_flag("WEEKLY_PROGRESS_AGGREGATOR_ENABLED")
+    WEEKLY_PROGRESS_INTERVAL = int(os.getenv("WEEKLY_PROGRESS_INTERVAL", 30))
+    WEEKLY_PROGRESS_BATCH_SIZE = int(os.getenv("WEEKLY_PROGRESS_BATCH_SIZE", 1000))
+    WEEKLY_PROGRESS_MAX_WEEKS = int(os.getenv("WEEKLY_PROGRESS_MAX_WEEKS", 52))
+
+    # Outbox worker applying deferred side effects of completions (user streak
+    # rows, streak leaderboard). Off by default so gunicorn workers don't each
+    # poll the queue: run `flask outbox run`, or enable it in one process.
+    OUTBOX_WORKER_ENABLED = _env_flag("OUTBOX_WORKER_ENABLED")
+    OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 5))
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5))
+
+    # bcrypt work factor for new hashes; existing hashes with another cost are
+    # re-hashed on the user's next successful login
+    BCRYPT_LOG_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))
+    # Hashing runs in a pool of PASSWORD_POOL_WORKERS processes (0 = in the
+    # request thread). Up to PASSWORD_POOL_QUEUE more calls may wait for a
+    # worker; beyond that a caller waits PASSWORD_POOL_WAIT seconds for a slot
+    # and then gets a 503.
+    PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", 2))
+    PASSWORD_POOL_QUEUE = int(os.getenv("PASSWORD_POOL_QUEUE", 8))
+    PASSWORD_POOL_WAIT = float(os.getenv("PASSWORD_POOL_WAIT", 0.5))
+    PASSWORD_POOL_TIMEOUT = float(os.getenv("PASSWORD_POOL_TIMEOUT", 10))
+
+    # /rewards/ and /avatar/list are served from memory. Commits in this process
+    # refresh them at once; changes made by other workers show up within
+    # CATALOG_CACHE_TTL seconds. CATALOG_MAX_AGE is what clients may cache.
+    CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", 60))
+    CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", 60))
+
+    # `flask avatars build` writes resized, content-hashed copies of
+    # static/avatars here (served from /avatar/assets/ as immutable)
+    AVATAR_ASSET_DIR = os.getenv(
+        "AVATAR_ASSET_DIR", os.path.join(BASE_DIR, "static", "avatar-assets")
+    )
+    AVATAR_VARIANTS = {
+        "thumb": int(os.getenv("AVATAR_THUMB_SIZE", 128)),
+        "full": int(os.getenv("AVATAR_FULL_SIZE", 512)),
+    }
+    AVATAR_IMAGE_FORMAT = os.getenv("AVATAR_IMAGE_FORMAT", "WEBP")
+    AVATAR_IMAGE_QUALITY = int(os.getenv("AVATAR_IMAGE_QUALITY", 80))
+    AVATAR_BUILD_ON_STARTUP = _env_flag("AVATAR_BUILD_ON_STARTUP")
+
+    # Request instrumentation: X-DB-* timing headers (always on in debug mode)
+    # and a sampling profiler. PROFILE_SAMPLE_RATE of requests are sampled every
+    # PROFILE_INTERVAL_MS; those slower than PROFILE_SLOW_MS are written to
+    # PROFILE_DIR as collapsed stacks.
+    SQL_DEBUG_HEADERS = _env_flag("SQL_DEBUG_HEADERS")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    PROFILE_SLOW_MS = int(os.getenv("PROFILE_SLOW_MS", 500))
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+
+    # Habits every new user starts with: (name, habit_type, habit_nature)
+    DEFAULT_HABITS = [
+        ("Running", "good", "physical"),
+        ("Meditation", "good", "mental"),
+        ("Drinking Water", "good", "physical"),
+        ("Bad Sleep", "bad", "physical"),
+        ("Eating Junk Food", "bad", "physical"),
+        ("Doomscrolling", "bad", "mental"),
+    ]
+
+    # POST /auth/import is disabled unless this key is set (sent as X-Import-Key)
+    IMPORT_API_KEY = os.getenv("IMPORT_API_KEY")
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+
+    # GET /habits/ page size (?limit=) default and upper bound
+    HABITS_PAGE_SIZE = int(os.getenv("HABITS_PAGE_SIZE", 100))
+    HABITS_PAGE_MAX = int(os.getenv("HABITS_PAGE_MAX", 500))
+
+    # In-memory XP and streak leaderboards. Each worker builds its copy on the
+    # first leaderboard read; a read that finds it older than
+    # LEADERBOARD_REFRESH_INTERVAL seconds starts a background rebuild (reading
+    # LEADERBOARD_BATCH_SIZE rows at a time) to pick up changes made by the
+    # others. LEADERBOARD_REFRESH_ENABLED (off by default) also rebuilds that
+    # process's copy on that schedule without reads; its first rebuild comes
+    # one interval after startup.
+    LEADERBOARD_REFRESH_ENABLED = _env_flag("LEADERBOARD_REFRESH_ENABLED")
+    LEADERBOARD_REFRESH_INTERVAL = int(os.getenv("LEADERBOARD_REFRESH_INTERVAL", 300))
+    LEADERBOARD_BATCH_SIZE = int(os.getenv("LEADERBOARD_BATCH_SIZE", 5000))
+    LEADERBOARD_PAGE_SIZE = int(os.getenv("LEADERBOARD_PAGE_SIZE", 10))
+    LEADERBOARD_PAGE_MAX = int(os.getenv("LEADERBOARD_PAGE_MAX", 100))
+    LEADERBOARD_AROUND_MAX = int(os.getenv("LEADERBOARD_AROUND_MAX", 25))
+
+    # Max habits accepted by POST /habits/done/batch
+    HABITS_BATCH_MAX = int(os.getenv("HABITS_BATCH_MAX", 100))
+
+    # Rolling daily reset: "timezone" buckets users by local midnight, "shard"
+    # also splits each zone in RESET_SCHEDULER_SHARDS (at most 1440) buckets of
+    # their stored reset slot
+    RESET_SCHEDULER_ENABLED = _env_flag("RESET_SCHEDULER_ENABLED")
+    RESET_SCHEDULER_MODE = os.getenv("RESET_SCHEDULER_MODE", "timezone")
+    RESET_SCHEDULER_SHARDS = int(os.getenv("RESET_SCHEDULER_SHARDS", 24))
+    RESET_SCHEDULER_INTERVAL = int(os.getenv("RESET_SCHEDULER_INTERVAL", 60))  # seconds between ticks
+
+    # Revocation cache in front of token_blocklist (size 0 disables it).
+    # NEGATIVE_TTL bounds how long a logout handled by another worker can go
+    # unseen; the optional Bloom filter is reloaded every BLOOM_REFRESH seconds,
+    # capped at NEGATIVE_TTL so it keeps that bound (NEGATIVE_TTL=0 disables it).
+    TOKEN_BLOCKLIST_CACHE_SIZE = int(os.getenv("TOKEN_BLOCKLIST_CACHE_SIZE", 10000))
+    TOKEN_BLOCKLIST_NEGATIVE_TTL = int(os.getenv("TOKEN_BLOCKLIST_NEGATIVE_TTL", 30))
+    TOKEN_BLOCKLIST_BLOOM = _env_flag("TOKEN_BLOCKLIST_BLOOM")
+    TOKEN_BLOCKLIST_BLOOM_REFRESH = int(os.getenv("TOKEN_BLOCKLIST_BLOOM_REFRESH", 60))
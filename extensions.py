@@ -0,0 +1,24 @@
+# Flask extensions, created unbound and attached to an app in create_app()
+import os
+
+from flask_cors import CORS
+from flask_jwt_extended import JWTManager
+
+from models import db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+jwt = JWTManager()
+cors = CORS(expose_headers=["X-Next-Cursor"])  # GET /habits/ paging, readable by browser clients
+
+
+def init_migrate(app):
+    # Alembic is a large import that only `flask db ...` needs, so web workers skip it.
+    # The flask command sets FLASK_RUN_FROM_CLI before it loads the app.
+    if os.environ.get("FLASK_RUN_FROM_CLI") != "true":
+        return None
+    from flask_migrate import Migrate
+    return Migrate(app, db, directory=MIGRATIONS_DIR)
+
+
+__all__ = ["db", "jwt", "cors", "init_migrate", "MIGRATIONS_DIR"]
@@ -0,0 +1,131 @@
+"""initial schema
+
+The tables db.create_all() made before migrations were tracked. An existing
+database already has them: `flask db stamp 3f2a9c1d7e10`, then upgrade.
+
+Revision ID: 3f2a9c1d7e10
+Revises:
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7e10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('avatar_list',
+    sa.Column('avatar_id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=200), nullable=False),
+    sa.PrimaryKeyConstraint('avatar_id')
+    )
+    op.create_table('rewards',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('cost', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('token_blocklist',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=36), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_token_blocklist_jti'), 'token_blocklist', ['jti'], unique=False)
+    op.create_table('users',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=50), nullable=False),
+    sa.Column('email', sa.String(length=100), nullable=False),
+    sa.Column('avatar', sa.String(length=100), nullable=True),
+    sa.Column('xp', sa.Integer(), nullable=True),
+    sa.Column('level', sa.Integer(), nullable=True),
+    sa.Column('level_name', sa.String(length=50), nullable=True),
+    sa.Column('mana', sa.Integer(), nullable=True),
+    sa.Column('max_mana', sa.Integer(), nullable=True),
+    sa.Column('health', sa.Integer(), nullable=True),
+    sa.Column('max_health', sa.Integer(), nullable=True),
+    sa.Column('days_alive', sa.Integer(), nullable=True),
+    sa.Column('last_alive', sa.Date(), nullable=True),
+    sa.PrimaryKeyConstraint('user_id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_table('habits',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('habit_type', sa.String(length=10), nullable=False),
+    sa.Column('habit_nature', sa.String(length=20), nullable=False),
+    sa.Column('xp_value', sa.Integer(), nullable=True),
+    sa.Column('cover_photo', sa.String(length=100), nullable=True),
+    sa.Column('streak', sa.Integer(), nullable=True),
+    sa.Column('last_done', sa.Date(), nullable=True),
+    sa.Column('longest_streak', sa.Integer(), nullable=True),
+    sa.Column('done_today', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('passwords',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('user_avatars',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('avatar_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['avatar_id'], ['avatar_list.avatar_id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('user_rewards',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('reward_id', sa.Integer(), nullable=False),
+    sa.Column('purchased_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['reward_id'], ['rewards.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('user_streaks',
+    sa.Column('streak_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('current_streak', sa.Integer(), nullable=True),
+    sa.Column('longest_streak', sa.Integer(), nullable=True),
+    sa.Column('last_completed', sa.Date(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('streak_id')
+    )
+    op.create_table('weekly_progress',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('week_start', sa.Date(), nullable=False),
+    sa.Column('habits_completed', sa.Integer(), nullable=True),
+    sa.Column('good_habits', sa.Integer(), nullable=True),
+    sa.Column('bad_habits', sa.Integer(), nullable=True),
+    sa.Column('xp_gained', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('weekly_progress')
+    op.drop_table('user_streaks')
+    op.drop_table('user_rewards')
+    op.drop_table('user_avatars')
+    op.drop_table('passwords')
+    op.drop_table('habits')
+    op.drop_table('users')
+    op.drop_index(op.f('ix_token_blocklist_jti'), table_name='token_blocklist')
+    op.drop_table('token_blocklist')
+    op.drop_table('rewards')
+    op.drop_table('avatar_list')
@@ -0,0 +1,131 @@
+"""completion log, xp ledger, outbox, reset and snapshot tables; lookup indexes
+
+Revision ID: 8b41d6e2a5c3
+Revises: 3f2a9c1d7e10
+Create Date: 2026-10-18 09:21:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b41d6e2a5c3'
+down_revision = '3f2a9c1d7e10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('habit_completions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('habit_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('habit_type', sa.String(length=10), nullable=False),
+    sa.Column('xp_delta', sa.Integer(), nullable=False),
+    sa.Column('completed_on', sa.Date(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('aggregated', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_habit_completions_aggregated_id', 'habit_completions', ['aggregated', 'id'], unique=False)
+    op.create_index('ix_habit_completions_habit_id_completed_on', 'habit_completions', ['habit_id', 'completed_on'], unique=False)
+    op.create_index(op.f('ix_habit_completions_user_id'), 'habit_completions', ['user_id'], unique=False)
+    op.create_table('xp_ledger',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('delta', sa.Integer(), nullable=False),
+    sa.Column('balance_after', sa.Integer(), nullable=False),
+    sa.Column('reason', sa.String(length=32), nullable=False),
+    sa.Column('ref_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_xp_ledger_user_id_id', 'xp_ledger', ['user_id', 'id'], unique=False)
+    op.create_table('replica_heartbeat',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('beat_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('reset_watermarks',
+    sa.Column('bucket', sa.String(length=64), nullable=False),
+    sa.Column('reset_date', sa.Date(), nullable=False),
+    sa.Column('last_user_id', sa.Integer(), nullable=False),
+    sa.Column('last_slot', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Boolean(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket')
+    )
+    op.create_table('user_profiles',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('me_json', sa.Text(), nullable=False),
+    sa.Column('me_etag', sa.String(length=40), nullable=False),
+    sa.Column('streaks_json', sa.Text(), nullable=False),
+    sa.Column('streaks_etag', sa.String(length=40), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('outbox_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('dedupe_key', sa.String(length=100), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('dedupe_key')
+    )
+    op.create_index('ix_outbox_jobs_status_id', 'outbox_jobs', ['status', 'id'], unique=False)
+
+    # Streak bitmaps (filled by `flask streaks backfill`), purchase prices and
+    # retry keys, token expiry for blocklist compaction. The DEFAULT gives
+    # existing rows the models' initial value without rewriting them.
+    op.add_column('habits', sa.Column('completion_bits', sa.BigInteger(), server_default='0', nullable=True))
+    op.add_column('user_streaks', sa.Column('completion_bits', sa.BigInteger(), server_default='0', nullable=True))
+    op.add_column('user_rewards', sa.Column('cost', sa.Integer(), nullable=True))
+    op.add_column('user_rewards', sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+    op.add_column('token_blocklist', sa.Column('expires_at', sa.DateTime(), nullable=True))
+
+    op.create_index('ix_habits_user_id_done_today', 'habits', ['user_id', 'done_today'], unique=False)
+    op.create_index('ix_habits_user_id_name', 'habits', ['user_id', 'name'], unique=False)
+    op.create_index(op.f('ix_passwords_user_id'), 'passwords', ['user_id'], unique=False)
+    op.create_index(op.f('ix_user_rewards_user_id'), 'user_rewards', ['user_id'], unique=False)
+    op.create_index('uq_user_rewards_user_id_idempotency_key', 'user_rewards', ['user_id', 'idempotency_key'], unique=True)
+    op.create_index(op.f('ix_token_blocklist_expires_at'), 'token_blocklist', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_token_blocklist_expires_at'), table_name='token_blocklist')
+    op.drop_index('uq_user_rewards_user_id_idempotency_key', table_name='user_rewards')
+    op.drop_index(op.f('ix_user_rewards_user_id'), table_name='user_rewards')
+    op.drop_index(op.f('ix_passwords_user_id'), table_name='passwords')
+    op.drop_index('ix_habits_user_id_name', table_name='habits')
+    op.drop_index('ix_habits_user_id_done_today', table_name='habits')
+
+    with op.batch_alter_table('token_blocklist') as batch_op:
+        batch_op.drop_column('expires_at')
+    with op.batch_alter_table('user_rewards') as batch_op:
+        batch_op.drop_column('idempotency_key')
+        batch_op.drop_column('cost')
+    with op.batch_alter_table('user_streaks') as batch_op:
+        batch_op.drop_column('completion_bits')
+    with op.batch_alter_table('habits') as batch_op:
+        batch_op.drop_column('completion_bits')
+
+    op.drop_index('ix_outbox_jobs_status_id', table_name='outbox_jobs')
+    op.drop_table('outbox_jobs')
+    op.drop_table('user_profiles')
+    op.drop_table('reset_watermarks')
+    op.drop_table('replica_heartbeat')
+    op.drop_index('ix_xp_ledger_user_id_id', table_name='xp_ledger')
+    op.drop_table('xp_ledger')
+    op.drop_index(op.f('ix_habit_completions_user_id'), table_name='habit_completions')
+    op.drop_index('ix_habit_completions_habit_id_completed_on', table_name='habit_completions')
+    op.drop_index('ix_habit_completions_aggregated_id', table_name='habit_completions')
+    op.drop_table('habit_completions')
@@ -0,0 +1,59 @@
+"""one streak row, avatar and weekly progress row per user
+
+Duplicate rows are merged first, or the unique indexes can't be created: the
+oldest row per key is kept and weekly_progress counts are summed into it.
+Only the duplicated keys are read.
+
+Revision ID: c7e05a3b9d14
+Revises: 8b41d6e2a5c3
+Create Date: 2026-10-18 09:22:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e05a3b9d14'
+down_revision = '8b41d6e2a5c3'
+branch_labels = None
+depends_on = None
+
+
+# (table, primary key, key columns, counters summed into the kept row, unique index)
+ONE_ROW_PER_KEY = (
+    ('user_streaks', 'streak_id', ('user_id',), (), 'uq_user_streaks_user_id'),
+    ('user_avatars', 'id', ('user_id',), (), 'uq_user_avatars_user_id'),
+    ('weekly_progress', 'id', ('user_id', 'week_start'),
+     ('habits_completed', 'good_habits', 'bad_habits', 'xp_gained'), 'uq_weekly_progress_user_id_week_start'),
+)
+
+
+def _merge_duplicates(connection, name, pk_name, key_names, counter_names):
+    table = sa.table(name, *(sa.column(column) for column in (pk_name, *key_names, *counter_names)))
+    pk, key = table.c[pk_name], [table.c[column] for column in key_names]
+    counters = [table.c[column] for column in counter_names]
+    groups = connection.execute(
+        sa.select(sa.func.min(pk), *key, *(sa.func.sum(sa.func.coalesce(column, 0)) for column in counters))
+        .group_by(*key)
+        .having(sa.func.count() > 1)
+    ).all()
+    for keep, *values in groups:
+        key_values, totals = values[:len(key)], values[len(key):]
+        if counters:
+            connection.execute(sa.update(table).where(pk == keep).values(dict(zip(counter_names, totals))))
+        connection.execute(
+            sa.delete(table).where(pk != keep, *(column == value for column, value in zip(key, key_values)))
+        )
+
+
+def upgrade():
+    connection = op.get_bind()
+    for name, pk_name, key_names, counter_names, index in ONE_ROW_PER_KEY:
+        _merge_duplicates(connection, name, pk_name, key_names, counter_names)
+        op.create_index(index, name, list(key_names), unique=True)
+
+
+def downgrade():
+    for name, _, _, _, index in ONE_ROW_PER_KEY:
+        op.drop_index(index, table_name=name)
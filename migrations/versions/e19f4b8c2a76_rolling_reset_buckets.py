@@ -0,0 +1,49 @@
+"""users.timezone and users.reset_slot for the rolling daily reset
+
+Existing users get the UTC zone from the column DEFAULT and the reset slot
+user_id % 1440, filled in batches of user ids (new users' slots come from a
+hash of the username, see models._reset_slot).
+
+Revision ID: e19f4b8c2a76
+Revises: c7e05a3b9d14
+Create Date: 2026-10-18 09:23:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e19f4b8c2a76'
+down_revision = 'c7e05a3b9d14'
+branch_labels = None
+depends_on = None
+
+RESET_SLOTS = 1440
+BATCH_SIZE = 10000
+
+
+def upgrade():
+    op.add_column('users', sa.Column('timezone', sa.String(length=50), server_default='UTC', nullable=False))
+    op.add_column('users', sa.Column('reset_slot', sa.SmallInteger(), nullable=True))
+
+    connection = op.get_bind()
+    users = sa.table('users', sa.column('user_id'), sa.column('reset_slot'))
+    top = connection.execute(sa.select(sa.func.max(users.c.user_id))).scalar() or 0
+    for last_id in range(0, top, BATCH_SIZE):
+        connection.execute(
+            sa.update(users)
+            .where(users.c.user_id > last_id, users.c.user_id <= last_id + BATCH_SIZE, users.c.reset_slot.is_(None))
+            .values(reset_slot=users.c.user_id % RESET_SLOTS)
+        )
+
+    op.create_index('ix_users_timezone_user_id', 'users', ['timezone', 'user_id'], unique=False)
+    op.create_index('ix_users_timezone_reset_slot_user_id', 'users', ['timezone', 'reset_slot', 'user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_timezone_reset_slot_user_id', table_name='users')
+    op.drop_index('ix_users_timezone_user_id', table_name='users')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('reset_slot')
+        batch_op.drop_column('timezone')
@@ -1,11 +1,27 @@
+import zlib
 from flask_sqlalchemy import SQLAlchemy
 from datetime import date, datetime
+from services.db_routing import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})  # read replicas, see services/db_routing.py
+
+RESET_SLOTS = 1440  # shard-mode reset slots (one per minute of the day), see services/reset_scheduler.py
+
+
+def _reset_slot(context):
+    # Derived from the username, which (unlike user_id) is known before the INSERT
+    username = context.get_current_parameters()["username"]
+    return zlib.crc32(username.encode("utf-8")) % RESET_SLOTS
 
-db = SQLAlchemy()
 
 # ---------------------- USER TABLE ----------------------
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # one bucket of the rolling daily reset, paged by user_id
+        db.Index("ix_users_timezone_user_id", "timezone", "user_id"),
+        db.Index("ix_users_timezone_reset_slot_user_id", "timezone", "reset_slot", "user_id"),
+    )
     user_id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
@@ -23,6 +39,9 @@ class User(db.Model):
 
     days_alive = db.Column(db.Integer, default=0)
     last_alive = db.Column(db.Date, default=date.today())
+    # IANA zone name, decides when the rolling daily reset reaches this user
+    timezone = db.Column(db.String(50), default="UTC", server_default="UTC", nullable=False)
+    reset_slot = db.Column(db.SmallInteger, default=_reset_slot)  # shard-mode reset bucket
     # Relationship with password
     password = db.relationship("Password", backref="user", uselist=False)
 
@@ -31,13 +50,17 @@ class User(db.Model):
 class Password(db.Model):
     __tablename__ = 'passwords'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
 
 
 # ---------------------- HABIT TABLE ----------------------
 class Habit(db.Model):
     __tablename__ = 'habits'
+    __table_args__ = (
+        db.Index("ix_habits_user_id_done_today", "user_id", "done_today"),
+        db.Index("ix_habits_user_id_name", "user_id", "name"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
     name = db.Column(db.String(100), nullable=False)
@@ -49,6 +72,7 @@ class Habit(db.Model):
     last_done = db.Column(db.Date)
     longest_streak = db.Column(db.Integer, default=0)
     done_today = db.Column(db.Boolean, default=False)
+    completion_bits = db.Column(db.BigInteger, default=0)  # last 63 days ending at last_done, see services/streaks.py
 
 
 # ---------------------- REWARD TABLES ----------------------
@@ -61,10 +85,16 @@ class Reward(db.Model):
 
 class UserReward(db.Model):
     __tablename__ = 'user_rewards'
+    __table_args__ = (
+        # a retried purchase with the same Idempotency-Key can't charge twice
+        db.Index("uq_user_rewards_user_id_idempotency_key", "user_id", "idempotency_key", unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False, index=True)
     reward_id = db.Column(db.Integer, db.ForeignKey("rewards.id"), nullable=False)
     purchased_at = db.Column(db.DateTime)
+    cost = db.Column(db.Integer)  # XP charged, the reward's price can change later
+    idempotency_key = db.Column(db.String(64))
 
 
 # ---------------------- TOKEN BLOCKLIST TABLE ----------------------
@@ -73,10 +103,14 @@ class TokenBlocklist(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     jti = db.Column(db.String(36), nullable=False, index=True)  # JWT ID
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, index=True)  # token exp (UTC); row can be dropped after it
 
 #----------------------- USER STREAK TABLE ----------------------
 class UserStreak(db.Model):
     __tablename__ = "user_streaks"
+    __table_args__ = (
+        db.Index("uq_user_streaks_user_id", "user_id", unique=True),  # one per user
+    )
 
     streak_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
@@ -85,6 +119,7 @@ class UserStreak(db.Model):
     longest_streak = db.Column(db.Integer, default=0)
 
     last_completed = db.Column(db.Date, default=None)
+    completion_bits = db.Column(db.BigInteger, default=0)  # days with a completion, ending at last_completed
 
     user = db.relationship("User", backref="streak_data", uselist=False)
 
@@ -101,6 +136,9 @@ class AvatarList(db.Model):
 #----------------------- USER AVATAR TABLE ----------------------
 class UserAvatar(db.Model):
     __tablename__ = "user_avatars"
+    __table_args__ = (
+        db.Index("uq_user_avatars_user_id", "user_id", unique=True),  # one per user
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
@@ -110,6 +148,9 @@ class UserAvatar(db.Model):
 #----------------------- WEEKLY PROGRESS TABLE ----------------------
 class WeeklyProgress(db.Model):
     __tablename__ = "weekly_progress"
+    __table_args__ = (
+        db.Index("uq_weekly_progress_user_id_week_start", "user_id", "week_start", unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
@@ -119,3 +160,92 @@ class WeeklyProgress(db.Model):
     good_habits = db.Column(db.Integer, default=0)
     bad_habits = db.Column(db.Integer, default=0)
     xp_gained = db.Column(db.Integer, default=0)
+
+
+#----------------------- HABIT COMPLETION EVENTS TABLE ----------------------
+class HabitCompletion(db.Model):
+    __tablename__ = "habit_completions"
+    __table_args__ = (
+        db.Index("ix_habit_completions_aggregated_id", "aggregated", "id"),
+        db.Index("ix_habit_completions_habit_id_completed_on", "habit_id", "completed_on"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    habit_id = db.Column(db.Integer, nullable=False)  # no FK: history outlives deleted habits
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False, index=True)
+    habit_type = db.Column(db.String(10), nullable=False)
+    xp_delta = db.Column(db.Integer, nullable=False)
+    completed_on = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    aggregated = db.Column(db.Boolean, default=False, nullable=False)  # folded into weekly_progress
+
+
+#----------------------- XP LEDGER TABLE ----------------------
+# XP spending only. XP earned (and lost to bad habits) is logged per completion
+# in habit_completions.xp_delta, so a balance reconciles as the sum of both.
+class XpLedger(db.Model):
+    __tablename__ = "xp_ledger"
+    __table_args__ = (
+        db.Index("ix_xp_ledger_user_id_id", "user_id", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
+    delta = db.Column(db.Integer, nullable=False)
+    balance_after = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(32), nullable=False)  # e.g. "reward_purchase"
+    ref_id = db.Column(db.Integer)  # user_rewards.id for purchases
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+#----------------------- REPLICA HEARTBEAT TABLE ----------------------
+class ReplicaHeartbeat(db.Model):
+    __tablename__ = "replica_heartbeat"
+
+    # Single row, bumped on the primary; its replicated copy's age is the replica's lag
+    id = db.Column(db.Integer, primary_key=True)
+    beat_at = db.Column(db.DateTime, nullable=False)
+
+
+#----------------------- RESET WATERMARK TABLE ----------------------
+class ResetWatermark(db.Model):
+    __tablename__ = "reset_watermarks"
+
+    # "tz:<zone>" or "shard:<n>:<zone>"
+    bucket = db.Column(db.String(64), primary_key=True)
+    reset_date = db.Column(db.Date, nullable=False)  # bucket-local day being reset
+    last_user_id = db.Column(db.Integer, default=0, nullable=False)
+    last_slot = db.Column(db.Integer, default=0, nullable=False)  # shard buckets: slot being reset
+    completed = db.Column(db.Boolean, default=False, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+#----------------------- USER PROFILE SNAPSHOT TABLE ----------------------
+class UserProfile(db.Model):
+    __tablename__ = "user_profiles"
+
+    # Pre-serialized /auth/me and /auth/streaks bodies, kept current by the writers
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), primary_key=True)
+    me_json = db.Column(db.Text, nullable=False)
+    me_etag = db.Column(db.String(40), nullable=False)
+    streaks_json = db.Column(db.Text, nullable=False)
+    streaks_etag = db.Column(db.String(40), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+#----------------------- OUTBOX JOBS TABLE ----------------------
+class OutboxJob(db.Model):
+    __tablename__ = "outbox_jobs"
+    __table_args__ = (
+        db.Index("ix_outbox_jobs_status_id", "status", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    dedupe_key = db.Column(db.String(100), nullable=False, unique=True)  # e.g. "completion:42"
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    status = db.Column(db.String(10), default="pending", nullable=False)  # pending / done / failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = db.Column(db.DateTime)
@@ -1,6 +1,11 @@
-from flask import Blueprint, request, jsonify
-from models import db, User, Password, Habit, TokenBlocklist, UserStreak
-from flask_bcrypt import Bcrypt
+from flask import Blueprint, request, jsonify, current_app
+from models import db, User, Password
+from services.db_routing import read_only
+from services.reset_scheduler import is_valid_timezone
+from services.blocklist import revoke_token
+from services.passwords import PasswordPoolBusy, password_hasher
+from services.profile import invalidate_profile, load_profile, snapshot_response
+from services.accounts import create_user, hash_password, import_users, read_user_rows
 from sqlalchemy.exc import IntegrityError
 from flask_jwt_extended import (
     create_access_token,
@@ -11,69 +16,43 @@ from flask_jwt_extended import (
 )
 
 from datetime import date
+import csv
+import hmac
+import io
 
 auth_bp = Blueprint('auth', __name__, url_prefix="/auth")
-bcrypt = Bcrypt()
+
+# Password hashing pool is saturated: shed the request instead of queueing it
+@auth_bp.errorhandler(PasswordPoolBusy)
+def password_pool_busy(error):
+    db.session.rollback()
+    return jsonify({"error": "Too many sign-in attempts right now, try again shortly"}), 503, {"Retry-After": "1"}
 
 @auth_bp.route("/", methods=["GET"])
 def auth_home():
     return jsonify({"message": "Auth blueprint working!"})
 
 
-def load_default_habits(user_id):
-    defaults = [
-        ("Running", "good", "physical"),
-        ("Meditation", "good", "mental"),
-        ("Drinking Water", "good", "physical"),
-        ("Bad Sleep", "bad", "physical"),
-        ("Eating Junk Food", "bad", "physical"),
-        ("Doomscrolling", "bad", "mental"),
-    ]
-
-    for name, t, n in defaults:
-        exists = Habit.query.filter_by(user_id=user_id, name=name).first()
-        if not exists:
-            db.session.add(Habit(
-                user_id=user_id,
-                name=name,
-                habit_type=t,
-                habit_nature=n,
-                xp_value=10
-            ))
-
-    db.session.commit()
-
-
 @auth_bp.route("/signup", methods=["POST"])
 def signup():
     data = request.get_json()
     if not data:
         return jsonify({"error": "Request must be JSON"}), 400
-    print("signup hit:", data)
     username = data.get("username")
     email = data.get("email")
     password = data.get("password")
+    timezone = data.get("timezone", "UTC")
 
     if not all([username, email, password]):
         return jsonify({"error": "Missing fields"}), 400
 
+    if not is_valid_timezone(timezone):
+        return jsonify({"error": "Unknown timezone"}), 400
+
     try:
-        print("Creating user...")
-        user = User(username=username, email=email)
-        db.session.add(user)
-        db.session.flush()  # to get user.id before commit
-        print("Created user with id:", user.user_id)
-
-        print("Creating password...")
-        hash_pw = bcrypt.generate_password_hash(password).decode("utf-8")
-        print("creating password entry...")
-        pw_entry = Password(user_id=user.user_id, password_hash=hash_pw)
-        db.session.add(pw_entry)
-        print("Committing...")
+        # user, password and default habits in one transaction
+        user = create_user(username, email, hash_password(password), timezone)
         db.session.commit()
-        print("Commit successful")
-
-        load_default_habits(user.user_id)
 
         return jsonify({"message": "Signup successful", "user_id": user.user_id}), 201
 
@@ -82,6 +61,24 @@ def signup():
         return jsonify({"error": "User already exists"}), 400
 
 
+# Bulk import: CSV (text/csv) or JSON Lines body, streamed in batches.
+# Columns: username, email, password_hash or password, timezone (optional)
+@auth_bp.route("/import", methods=["POST"])
+def import_users_endpoint():
+    api_key = current_app.config["IMPORT_API_KEY"]
+    if not api_key or not hmac.compare_digest(request.headers.get("X-Import-Key", ""), api_key):
+        return jsonify({"error": "Forbidden"}), 403
+
+    fmt = "csv" if request.mimetype == "text/csv" else "jsonl"
+    stream = io.TextIOWrapper(request.stream, encoding="utf-8")
+    try:
+        summary = import_users(read_user_rows(stream, fmt), current_app.config["IMPORT_BATCH_SIZE"])
+    except (ValueError, csv.Error) as exc:
+        db.session.rollback()
+        return jsonify({"error": f"Could not parse import: {exc}"}), 400
+    return jsonify({"message": "Import finished", **summary}), 200
+
+
 @auth_bp.route("/login", methods=["POST"])
 def login():
     data = request.get_json()
@@ -95,9 +92,15 @@ def login():
         return jsonify({"error": "Invalid credentials"}), 401
 
     pw_entry = Password.query.filter_by(user_id=user.user_id).first()
-    if not pw_entry or not bcrypt.check_password_hash(pw_entry.password_hash, password):
+    if not pw_entry or not password_hasher.check(pw_entry.password_hash, password):
         return jsonify({"error": "Invalid credentials"}), 401
-    
+
+    # BCRYPT_LOG_ROUNDS changed since this hash was made: upgrade it while we have the password
+    if password_hasher.needs_rehash(pw_entry.password_hash):
+        try:
+            pw_entry.password_hash = password_hasher.hash(password)
+        except PasswordPoolBusy:
+            pass  # try again on a later login
 
     today = date.today()
     if user.last_alive != today:
@@ -130,74 +133,55 @@ def refresh():
 @auth_bp.route("/logout", methods=["POST"])
 @jwt_required()  # any valid token required (access or refresh)
 def logout():
-    jti = get_jwt().get("jti")
+    token = get_jwt()
+    jti = token.get("jti")
     if not jti:
         return jsonify({"msg": "No token jti found"}), 400
-    # add JTI to blocklist
-    db.session.add(TokenBlocklist(jti=jti))
-    db.session.commit()
+    # add JTI to blocklist (and this worker's revocation cache)
+    revoke_token(jti, token["exp"])
     return jsonify({"message": "Logged out successfully"}), 200    #Tokens revoked 
 
 # Example protected route that demonstrates persistent-check
 @auth_bp.route("/me", methods=["GET"])
+@read_only
 @jwt_required()
 def me():
-    identity = get_jwt_identity()
-    user = User.query.get(int(identity))
-    if not user:
+    profile = load_profile(int(get_jwt_identity()))
+    if not profile:
         return jsonify({"error": "User not found"}), 404
-    
-    streak = UserStreak.query.filter_by(user_id=user.user_id).first()
-    
-    if streak:
-        current_streak = streak.current_streak
-        longest_streak = streak.longest_streak
-    else:
-        current_streak = 0
-        longest_streak = 0
+    return snapshot_response(profile.me_json, profile.me_etag)
 
 
-    return jsonify({
-        "user_id": user.user_id,
-        "username": user.username,
-        "email": user.email,
-        "xp": user.xp,
-        "level": user.level,
-        "level_name": user.level_name,
-        "mana": user.mana,
-        "health": user.health,
-        "current_streak": current_streak,
-        "longest_streak": longest_streak
-    })
+# Set the IANA timezone used by the rolling daily reset
+@auth_bp.route("/timezone", methods=["PUT"])
+@jwt_required()
+def set_timezone():
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "Request must be JSON"}), 400
+
+    timezone = data.get("timezone")
+    if not timezone or not is_valid_timezone(timezone):
+        return jsonify({"error": "Unknown timezone"}), 400
+
+    user = User.query.get(int(get_jwt_identity()))
+    if not user:
+        return jsonify({"error": "User not found"}), 404
 
+    user.timezone = timezone
+    invalidate_profile(user.user_id)  # streaks in the snapshot are evaluated on the local day
+    db.session.commit()
+    return jsonify({"message": "Timezone updated", "timezone": timezone}), 200
 
 
 @auth_bp.route("/streaks", methods=["GET"])
+@read_only
 @jwt_required()
 def streaks():
-    user_id = int(get_jwt_identity())
-
-    # Get user streak
-    user_streak = UserStreak.query.filter_by(user_id=user_id).first()
-
-    # Get all habits of this user
-    habits = Habit.query.filter_by(user_id=user_id).all()
-
-    return jsonify({
-        "user_streak": {
-            "current_streak": user_streak.current_streak if user_streak else 0,
-            "longest_streak": user_streak.longest_streak if user_streak else 0
-        },
-        "habit_streaks": [
-            {
-                "habit_id": h.id,
-                "name": h.name,
-                "habit_streak": h.streak,
-                "habit_longest_streak": h.longest_streak
-            }
-            for h in habits
-        ]
-    }), 200
+    profile = load_profile(int(get_jwt_identity()))
+    if not profile:
+        return jsonify({"error": "User not found"}), 404
+    return snapshot_response(profile.streaks_json, profile.streaks_etag)
 
 
 @auth_bp.route("/test-post", methods=["POST"])
@@ -1,22 +1,30 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app, send_from_directory, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, AvatarList, UserAvatar
+from services.db_routing import read_only
+from services.avatar_assets import MANIFEST_NAME
+from services.catalog import catalog_cache
+from services.profile import snapshot_response
 
 avatar_bp = Blueprint("avatar", __name__, url_prefix="/avatar")
 
 
 # Access list of available avatars
 @avatar_bp.route("/list", methods=["GET"])
+@read_only
 def list_avatars():
-    avatars = AvatarList.query.all()
-    return jsonify([
-        {
-            "avatar_id": a.avatar_id,
-            "filename": a.filename,
-            "url": f"/static/avatars/{a.filename}"
-        }
-        for a in avatars
-    ]), 200
+    body, etag = catalog_cache.get("avatars")
+    return snapshot_response(body, etag, f"public, max-age={current_app.config['CATALOG_MAX_AGE']}")
+
+
+# Built avatar files: names change with their content, so they never need revalidation
+@avatar_bp.route("/assets/<path:name>", methods=["GET"])
+def avatar_asset(name):
+    if name == MANIFEST_NAME:
+        abort(404)
+    response = send_from_directory(current_app.config["AVATAR_ASSET_DIR"], name, max_age=31536000)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
 
 
 # User selects an avatar
@@ -53,7 +61,6 @@ def select_avatar():
 @avatar_bp.route("/seed", methods=["POST"])
 def seed_avatars():
     import os
-    from flask import current_app
 
     folder_path = os.path.join(current_app.root_path, "static", "avatars")
 
@@ -1,21 +1,67 @@
-from flask import Blueprint, request, jsonify
-from models import db, User, Habit, UserStreak, WeeklyProgress
-from datetime import date, timedelta
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from models import db, User, Habit
+from services.db_routing import read_only
+from services.daily_reset import DailyResetInterrupted, run_daily_reset
+from services.leaderboard import habit_board, record_score
+from services.habit_listing import export_habits, habit_page, parse_listing_args
+from services.completion import complete_habit, complete_habits_batch
+from services.profile import invalidate_profile
+from services.streaks import user_zone, zone_date
+from services.weekly_progress import weekly_progress
+from datetime import date, datetime
 from flask import request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 habits_bp = Blueprint('habits', __name__, url_prefix="/habits")
 
 @habits_bp.route("/", methods=["GET"])
+@read_only
 @jwt_required()
 def list_habits():
+    # ?limit=&cursor= pages by id (next cursor in X-Next-Cursor),
+    # ?fields=id,name,... picks fields, ?type= ?nature= ?done=true|false|all filter
     user_id = int(get_jwt_identity())
-    habits = Habit.query.filter_by(user_id=user_id, done_today = False).all()
-    return jsonify([
-        {"id": h.id, "user_id": h.user_id, "name": h.name, "habit_type": h.habit_type, "habit_nature": h.habit_nature,
-         "xp_value": h.xp_value, "streak": h.streak, "last_done": str(h.last_done), "done_today": h.done_today}
-        for h in habits
-    ])
+    fields, filters, error = parse_listing_args(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    limit = request.args.get("limit", current_app.config["HABITS_PAGE_SIZE"], type=int)
+    if not 1 <= limit <= current_app.config["HABITS_PAGE_MAX"]:
+        return jsonify({"error": f"limit must be between 1 and {current_app.config['HABITS_PAGE_MAX']}"}), 400
+    cursor = request.args.get("cursor")
+    if cursor is not None:
+        # ASCII digits only: str.isdigit() also accepts e.g. "²", which int() rejects
+        if not (cursor.isascii() and cursor.isdecimal()):
+            return jsonify({"error": "Invalid cursor"}), 400
+        cursor = int(cursor)
+
+    items, next_cursor = habit_page(user_id, fields, filters, cursor, limit)
+    response = jsonify(items)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+# Every matching habit as one streamed JSON array (same parameters, no paging)
+@habits_bp.route("/export", methods=["GET"])
+@read_only
+@jwt_required()
+def export():
+    user_id = int(get_jwt_identity())
+    fields, filters, error = parse_listing_args(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+    return Response(stream_with_context(export_habits(user_id, fields, filters)), mimetype="application/json")
+
+# Weekly stats from pre-aggregated weekly_progress rows, newest week first
+@habits_bp.route("/progress", methods=["GET"])
+@read_only
+@jwt_required()
+def progress():
+    user_id = int(get_jwt_identity())
+    weeks = request.args.get("weeks", 4, type=int)
+    if not 1 <= weeks <= current_app.config["WEEKLY_PROGRESS_MAX_WEEKS"]:
+        return jsonify({"error": f"weeks must be between 1 and {current_app.config['WEEKLY_PROGRESS_MAX_WEEKS']}"}), 400
+    return jsonify(weekly_progress(user_id, weeks)), 200
 
 @habits_bp.route("/", methods=["POST"])
 def create_habit():
@@ -32,157 +78,88 @@ def create_habit():
     
     habit = Habit(user_id=user_id, name=name, habit_type=habit_type, habit_nature=habit_nature,xp_value=xp_value, cover_photo=cover_photo)
     db.session.add(habit)
+    invalidate_profile(user_id)  # habit list in /auth/streaks changed
     db.session.commit()
     return jsonify({"message": "Habit created", "habit_id": habit.id, "user_id": habit.user_id}), 201
 
 
-def calculate_level(xp):
-    level = 1
-    while xp >= 50 * (level ** 2):
-        level += 1
-    return level
-
-
-def update_streak(user_id):
-    user = User.query.get(user_id)
-    streak = UserStreak.query.filter_by(user_id=user_id).first()
-
-    if streak is None:
-        streak = UserStreak(user_id=user_id, current_streak=0, longest_streak=0, last_completed=None)
-        db.session.add(streak)
-        db.session.commit()
-
-    today = date.today()
-
-    #if streak.last_completed == today:
-        #return streak
-    
-    #if streak.last_completed == today - timedelta(days=1):
-    streak.current_streak += 1
-    #else:
-        #streak.current_streak = 1
-
-    streak.last_completed = today
-    streak.longest_streak = max(streak.longest_streak, streak.current_streak)
-    
-    db.session.commit()
-
-    return streak
-
-
-#def update_user_streak(user_id):
-    user = User.query.get(user_id)
-    return update_streak(user)
-
 @habits_bp.route("/<int:habit_id>/done", methods=["POST"])
 def mark_done(habit_id):
-    habit = Habit.query.get(habit_id)
-    if not habit:
-        return jsonify({"error": "Habit not found"}), 404
-
-    user = User.query.get(habit.user_id)
-    today = date.today()
-
-    if habit.done_today:
-        return jsonify({"message": "Habit already done today"}), 400
-
-    # XP logic
-    if habit.habit_type == "good":
-        user.xp += habit.xp_value
-    elif habit.habit_type == "bad":
-        user.xp -= habit.xp_value
-        user.xp = max(user.xp, 0)  # prevent negative XP
-
-
-    # mana / health system
-    if habit.habit_nature=="mental":
-        user.mana -= 10 if habit.habit_type == "good" else 15
-        user.mana = max(user.mana, 0)
-    else:
-        user.health -= 10 if habit.habit_type == "good" else 15
-        user.health = max(user.health, 0)
-
-    # streak update
-    #if habit.last_done == today - timedelta(days=1):
-    habit.streak += 1
-    #else:
-        #habit.streak = 1
-    habit.last_done = today
-    habit.done_today = True
-
-    # longest streak update
-    habit.longest_streak = max(habit.longest_streak, habit.streak)
-
-    # uodating weekly progress
-    #update_weekly_progress(user.user_id, habit)
+    body, status = complete_habit(habit_id)
+    return jsonify(body), status
 
-    # level update
-    user.level = calculate_level(user.xp)
-    
-    level_names = [
-        "Dormant Beginner",
-        "Reluctant Starter",
-        "Awakening Novice",
-        "Weary Wanderer",
-        "Determined Wanderer",
-        "Focused Adept",
-        "Steady Attendant",
-        "Resolute Attendant",
-        "Disciplined Attendant",
-        "Skilled Operative",
-        "Advanced Operative",
-        "Master Operative"
-    ]
-
-    user.level_name = level_names[min(user.level-1,11)]
-    streak = update_streak(user.user_id)
-    
-    db.session.commit()
-    return jsonify({"message": "Habit completed",
-                    "xp": user.xp,
-                    "level": user.level,
-                    "rank": user.level_name,
-                    "mana": user.mana,
-                    "health": user.health,
-                    "habit_streak": habit.streak,
-                    "habit_longest_streak": habit.longest_streak,
-                    "user_streak": streak.current_streak,
-                    "user_longest_streak": streak.longest_streak
-                    }), 200
 
+def _parse_done_on(value, zone):
+    # Accepts "2025-12-10" or an ISO timestamp ("2025-12-10T08:30:00Z"); a
+    # timestamp with an offset counts on its date in the user's zone
+    if value is None:
+        return None
+    if len(value) == 10:
+        return date.fromisoformat(value)
+    done_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if done_at.tzinfo is not None:
+        done_at = done_at.astimezone(zone)
+    return done_at.date()
 
 
+# Sync several check-ins at once: {"habits": [3, {"habit_id": 4, "done_at": "..."}]}
+@habits_bp.route("/done/batch", methods=["POST"])
+@jwt_required()
+def mark_done_batch():
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    entries = data.get("habits")
+
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "habits must be a non-empty list"}), 400
+    if len(entries) > current_app.config["HABITS_BATCH_MAX"]:
+        return jsonify({"error": f"At most {current_app.config['HABITS_BATCH_MAX']} habits per batch"}), 400
+
+    # Dates are the user's: done_at timestamps and "today" in their timezone
+    zone_name = db.session.query(User.timezone).filter_by(user_id=user_id).scalar()
+    zone, today = user_zone(zone_name), zone_date(zone_name)
+    items = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            entry = {"habit_id": entry}
+        try:
+            habit_id = int(entry["habit_id"])
+            done_on = _parse_done_on(entry.get("done_at"), zone)
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "Invalid habit entry", "entry": entry}), 400
+        if done_on is not None and done_on > today:
+            return jsonify({"error": "done_at is in the future", "entry": entry}), 400
+        items.append((habit_id, done_on))
+
+    body, status = complete_habits_batch(user_id, items, today)
+    return jsonify(body), status
+
+
+# A chunk failed: the earlier chunks are committed, report where to resume
+@habits_bp.errorhandler(DailyResetInterrupted)
+def daily_reset_interrupted(error):
+    return jsonify({"error": "Daily reset interrupted, retry with these parameters", **error.resume}), 500
 
 
 @habits_bp.route("/daily_reset", methods=["POST"])
 def daily_reset():
-    today = date.today()
+    # Optional body: {"chunk_size": 500, "after_user_id": 0, "after_habit_id": 0}
+    # after_* come from the summary of an interrupted run to resume it.
+    data = request.get_json(silent=True) or {}
+    chunk_size = data.get("chunk_size", current_app.config["DAILY_RESET_CHUNK_SIZE"])
 
-    users = User.query.all()
-    habits = Habit.query.all()
+    try:
+        chunk_size = int(chunk_size)
+        after_user_id = int(data.get("after_user_id", 0))
+        after_habit_id = int(data.get("after_habit_id", 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "chunk_size, after_user_id and after_habit_id must be integers"}), 400
 
-    for user in users:
-        # Daily energy refill (based on level)
-        user.max_mana = 100 + (user.level - 1) * 10
-        user.max_health = 100 + (user.level - 1) * 10
+    if chunk_size < 1:
+        return jsonify({"error": "chunk_size must be positive"}), 400
 
-        user.mana = user.max_mana
-        user.health = user.max_health
-
-        # Count active days
-        #if user.last_login != today:
-           # user.active_days += 1
-        #user.last_login = today
-
-    for habit in habits:
-        habit.done_today = False
-        #if habit.last_done != today - timedelta(days=1):
-           # habit.streak = 0
-        #else:
-          #  habit.streak += 1
-
-    db.session.commit()
-    return jsonify({"message": "Daily reset complete"})
+    summary = run_daily_reset(chunk_size, after_user_id, after_habit_id)
+    return jsonify({"message": "Daily reset complete", **summary})
 
 
 
@@ -201,6 +178,8 @@ def delete_habit(habit_id):
         return jsonify({"error": "You are not allowed to delete this habit"}), 403
 
     db.session.delete(habit)
+    invalidate_profile(user_id)  # habit list in /auth/streaks changed
+    record_score(habit_board(habit.name), habit.id, None)
     db.session.commit()
 
     return jsonify({"message": "Habit deleted successfully"}), 200
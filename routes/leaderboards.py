@@ -0,0 +1,61 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from services.db_routing import read_only
+from services.leaderboard import XP, STREAKS, board_around, board_page, habit_board
+
+leaderboards_bp = Blueprint('leaderboards', __name__, url_prefix="/leaderboards")
+
+BOARDS = {"xp": XP, "streaks": STREAKS}
+
+
+def _page(name):
+    limit = request.args.get("limit", current_app.config["LEADERBOARD_PAGE_SIZE"], type=int)
+    offset = request.args.get("offset", 0, type=int)
+    if not 1 <= limit <= current_app.config["LEADERBOARD_PAGE_MAX"]:
+        return jsonify({"error": f"limit must be between 1 and {current_app.config['LEADERBOARD_PAGE_MAX']}"}), 400
+    if offset < 0:
+        return jsonify({"error": "offset must not be negative"}), 400
+    return jsonify(board_page(name, offset, limit)), 200
+
+
+def _around(name):
+    k = request.args.get("k", 5, type=int)
+    if not 0 <= k <= current_app.config["LEADERBOARD_AROUND_MAX"]:
+        return jsonify({"error": f"k must be between 0 and {current_app.config['LEADERBOARD_AROUND_MAX']}"}), 400
+    body = board_around(name, int(get_jwt_identity()), k)
+    if body is None:
+        return jsonify({"error": "Not on this leaderboard"}), 404
+    return jsonify(body), 200
+
+
+# Top users by XP or longest streak: ?limit=&offset=
+@leaderboards_bp.route("/<board>", methods=["GET"])
+@read_only
+def top(board):
+    if board not in BOARDS:
+        return jsonify({"error": f"board must be one of: {', '.join(BOARDS)}"}), 404
+    return _page(BOARDS[board])
+
+
+# The logged-in user's rank with k neighbours on each side: ?k=
+@leaderboards_bp.route("/<board>/me", methods=["GET"])
+@read_only
+@jwt_required()
+def around_me(board):
+    if board not in BOARDS:
+        return jsonify({"error": f"board must be one of: {', '.join(BOARDS)}"}), 404
+    return _around(BOARDS[board])
+
+
+# Longest streaks on one habit (by name, e.g. /leaderboards/habits/running)
+@leaderboards_bp.route("/habits/<path:name>", methods=["GET"])
+@read_only
+def habit_top(name):
+    return _page(habit_board(name))
+
+
+@leaderboards_bp.route("/habits/<path:name>/me", methods=["GET"])
+@read_only
+@jwt_required()
+def habit_around_me(name):
+    return _around(habit_board(name))
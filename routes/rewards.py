@@ -1,34 +1,36 @@
-from flask import Blueprint, request, jsonify
-from models import db, User, Reward, UserReward
-from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, Reward
+from services.db_routing import read_only
+from services.catalog import catalog_cache
+from services.profile import snapshot_response
+from services.purchases import purchase_reward
 
 rewards_bp = Blueprint('rewards', __name__, url_prefix="/rewards")
 
 @rewards_bp.route("/", methods=["GET"])
+@read_only
 def list_rewards():
-    rewards = Reward.query.all()
-    return jsonify([{"id": r.id, "name": r.name, "cost": r.cost} for r in rewards])
+    body, etag = catalog_cache.get("rewards")
+    return snapshot_response(body, etag, f"public, max-age={current_app.config['CATALOG_MAX_AGE']}")
 
+# Buy a reward for the logged-in user. Send an Idempotency-Key header to make
+# retries safe: a repeated key returns the first purchase instead of charging again.
 @rewards_bp.route("/buy", methods=["POST"])
+@jwt_required()
 def buy_reward():
-    data = request.get_json()
-    user_id = data.get("user_id")
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
     reward_id = data.get("reward_id")
+    idempotency_key = request.headers.get("Idempotency-Key")
 
-    user = User.query.get(user_id)
-    reward = Reward.query.get(reward_id)
+    if not isinstance(reward_id, int):
+        return jsonify({"error": "reward_id is required"}), 400
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= 64:
+        return jsonify({"error": "Idempotency-Key must be 1-64 characters"}), 400
 
-    if not user or not reward:
-        return jsonify({"error": "Invalid user or reward"}), 404
-
-    if user.xp < reward.cost:
-        return jsonify({"error": "Not enough XP"}), 400
-
-    user.xp -= reward.cost
-    db.session.add(UserReward(user_id=user_id, reward_id=reward_id, purchased_at=datetime.utcnow()))
-    db.session.commit()
-
-    return jsonify({"message": "Reward purchased successfully", "remaining_xp": user.xp})
+    body, status = purchase_reward(user_id, reward_id, idempotency_key)
+    return jsonify(body), status
 
 
 @rewards_bp.route("/seed", methods=["POST"])
@@ -0,0 +1,130 @@
+import csv
+import json
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from config import Config
+from models import db, User, Password, Habit
+from services.passwords import password_hasher
+from services.reset_scheduler import is_valid_timezone
+
+# (name, habit_type, habit_nature) seeded for every new user, read once at import
+DEFAULT_HABITS = tuple(tuple(habit) for habit in Config.DEFAULT_HABITS)
+
+
+def default_habit_rows(user_id):
+    return [
+        {"user_id": user_id, "name": name, "habit_type": habit_type,
+         "habit_nature": habit_nature, "xp_value": 10}
+        for name, habit_type, habit_nature in DEFAULT_HABITS
+    ]
+
+
+def hash_password(password):
+    return password_hasher.hash(password)
+
+
+def create_user(username, email, password_hash, timezone="UTC"):
+    # User, password and default habits in the caller's transaction:
+    # one INSERT each, the habits as a single multi-row INSERT
+    user = User(username=username, email=email, timezone=timezone)
+    db.session.add(user)
+    db.session.flush()  # to get user.user_id
+    db.session.add(Password(user_id=user.user_id, password_hash=password_hash))
+    db.session.execute(insert(Habit), default_habit_rows(user.user_id))
+    return user
+
+
+def read_user_rows(stream, fmt):
+    # Streams dicts from a CSV (header row) or JSON Lines text stream
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _existing(column, values):
+    if not values:
+        return set()
+    return set(db.session.execute(select(column).where(column.in_(values))).scalars())
+
+
+def _import_batch(rows):
+    # rows: dicts with username, email, password_hash, timezone
+    usernames = _existing(User.username, [row["username"] for row in rows])
+    emails = _existing(User.email, [row["email"] for row in rows])
+    fresh = [row for row in rows if row["username"] not in usernames and row["email"] not in emails]
+    if not fresh:
+        return 0
+
+    db.session.execute(insert(User), [
+        {"username": row["username"], "email": row["email"], "timezone": row["timezone"]}
+        for row in fresh
+    ])
+    ids = dict(db.session.execute(
+        select(User.email, User.user_id).where(User.email.in_([row["email"] for row in fresh]))
+    ).all())
+
+    db.session.execute(insert(Password), [
+        {"user_id": ids[row["email"]], "password_hash": row["password_hash"]} for row in fresh
+    ])
+    db.session.execute(insert(Habit), [
+        habit for row in fresh for habit in default_habit_rows(ids[row["email"]])
+    ])
+    db.session.commit()
+    return len(fresh)
+
+
+def import_users(rows, batch_size=1000):
+    # Bulk import: a handful of statements and one commit per batch. Rows may
+    # carry a ready bcrypt "password_hash" (fast) or a plain "password".
+    summary = {"imported": 0, "skipped": 0, "invalid": 0, "batches": 0}
+    seen = set()  # names in the current batch
+    batch = []
+
+    def flush():
+        plain = [row for row in batch if "password" in row]
+        for row, hashed in zip(plain, password_hasher.hash_many(row.pop("password") for row in plain)):
+            row["password_hash"] = hashed
+        try:
+            imported = _import_batch(batch)
+        except IntegrityError:
+            # A concurrent signup took one of the names; retry once with a fresh check
+            db.session.rollback()
+            imported = _import_batch(batch)
+        summary["imported"] += imported
+        summary["skipped"] += len(batch) - imported
+        summary["batches"] += 1
+        batch.clear()
+        seen.clear()  # earlier batches are committed, the database check covers them
+
+    for row in rows:
+        username = (row.get("username") or "").strip()
+        email = (row.get("email") or "").strip()
+        timezone = row.get("timezone") or "UTC"
+        password_hash = row.get("password_hash")
+        password = None if password_hash else row.get("password")
+        if (not username or not email or not (password or (password_hash or "").startswith("$2"))
+                or not is_valid_timezone(timezone)):
+            summary["invalid"] += 1
+            continue
+        if username in seen or email in seen:
+            summary["skipped"] += 1
+            continue
+        seen.update((username, email))
+
+        entry = {"username": username, "email": email, "timezone": timezone}
+        if password:
+            entry["password"] = password  # hashed for the whole batch at flush time
+        else:
+            entry["password_hash"] = password_hash
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return summary
@@ -0,0 +1,175 @@
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+from urllib.parse import quote
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif")
+MANIFEST_NAME = "manifest.json"
+TMP_SUFFIX = ".tmp"
+ASSET_URL_PREFIX = "/avatar/assets/"
+
+
+def _slug(filename):
+    # "avatar 1.jpg" -> "avatar-1": URL-safe without quoting
+    stem = os.path.splitext(filename)[0].lower()
+    return re.sub(r"[^a-z0-9]+", "-", stem).strip("-") or "avatar"
+
+
+def _pillow():
+    # Imported on use: only the build needs it, and it is slow to import.
+    # Pillow is optional; without it originals are published unresized.
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def _resized(Image, path, size, image_format, quality):
+    with Image.open(path) as image:
+        keep_alpha = image.mode in ("RGBA", "LA", "P") and image_format.upper() not in ("JPEG", "JPG")
+        image = image.convert("RGBA" if keep_alpha else "RGB")
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, image_format, quality=quality, method=6)
+        return buffer.getvalue()
+
+
+def _write_atomic(out_dir, name, data):
+    # Unique temp name: workers building at the same time never share one
+    with tempfile.NamedTemporaryFile(dir=out_dir, prefix=f".{name}.", suffix=TMP_SUFFIX, delete=False) as handle:
+        handle.write(data)
+    os.replace(handle.name, os.path.join(out_dir, name))
+
+
+def _write_asset(out_dir, name, data):
+    # Names carry a content hash, so an existing file is already correct
+    if not os.path.exists(os.path.join(out_dir, name)):
+        _write_atomic(out_dir, name, data)
+
+
+def _manifest_names(manifest):
+    return {name for entry in manifest.values() for name in entry.values()}
+
+
+def _read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as handle:
+            return json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def build_avatar_assets(source_dir, out_dir, variants, image_format="WEBP", quality=80, prune=False):
+    # Writes <slug>-<variant>.<hash>.<ext> for every source image and a manifest
+    # {filename: {variant: asset name}}. Returns a summary dict.
+    os.makedirs(out_dir, exist_ok=True)
+    Image = _pillow()
+    resize = Image is not None
+    extension = "." + image_format.lower()
+    manifest = {}
+    source_bytes = output_bytes = 0
+
+    for filename in sorted(os.listdir(source_dir)):
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        path = os.path.join(source_dir, filename)
+        source_bytes += os.path.getsize(path)
+        entry = {}
+        if resize:
+            for variant, size in variants.items():
+                data = _resized(Image, path, size, image_format, quality)
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                entry[variant] = f"{_slug(filename)}-{variant}.{digest}{extension}"
+                _write_asset(out_dir, entry[variant], data)
+                output_bytes += len(data)
+        else:
+            with open(path, "rb") as handle:
+                data = handle.read()
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            name = f"{_slug(filename)}.{digest}{os.path.splitext(filename)[1].lower()}"
+            _write_asset(out_dir, name, data)
+            entry = {variant: name for variant in variants}
+            output_bytes += len(data)
+        manifest[filename] = entry
+
+    previous = _read_manifest(out_dir)
+    _write_atomic(out_dir, MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+
+    pruned = 0
+    if prune:
+        # Only after the swap, and never the generation just replaced: clients
+        # may hold its URLs from a cached /avatar/list. Temp files can belong
+        # to a build still running elsewhere.
+        keep = _manifest_names(manifest) | _manifest_names(previous) | {MANIFEST_NAME}
+        for name in os.listdir(out_dir):
+            if name not in keep and not name.endswith(TMP_SUFFIX):
+                try:
+                    os.remove(os.path.join(out_dir, name))
+                except FileNotFoundError:
+                    continue  # pruned concurrently
+                pruned += 1
+
+    return {
+        "images": len(manifest),
+        "resized": resize,
+        "source_bytes": source_bytes,
+        "output_bytes": output_bytes,
+        "pruned": pruned,
+    }
+
+
+def build_app_avatars(app, prune=False):
+    # `flask avatars build` and AVATAR_BUILD_ON_STARTUP (which never prunes:
+    # every worker builds into the same directory)
+    config = app.config
+    return build_avatar_assets(
+        os.path.join(app.root_path, "static", "avatars"),
+        config["AVATAR_ASSET_DIR"],
+        config["AVATAR_VARIANTS"],
+        config["AVATAR_IMAGE_FORMAT"],
+        config["AVATAR_IMAGE_QUALITY"],
+        prune=prune,
+    )
+
+
+class AvatarManifest:
+    # manifest.json of the asset directory, re-read when the file changes
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._path = None
+        self._mtime = None
+        self._entries = {}
+
+    def entries(self, out_dir):
+        path = os.path.join(out_dir, MANIFEST_NAME)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if path != self._path or mtime != self._mtime:
+                with open(path) as handle:
+                    self._entries = json.load(handle)
+                self._path, self._mtime = path, mtime
+            return self._entries
+
+
+avatar_manifest = AvatarManifest()
+
+
+def avatar_urls(out_dir, filename):
+    # {variant: url}; falls back to the original file until `flask avatars build` has run
+    entry = avatar_manifest.entries(out_dir).get(filename)
+    if not entry:
+        return None
+    return {variant: ASSET_URL_PREFIX + name for variant, name in entry.items()}
+
+
+def original_url(filename):
+    return "/static/avatars/" + quote(filename)
@@ -0,0 +1,46 @@
+import logging
+import threading
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicWorker:
+    # Runs run_once() every app.config[interval_setting] seconds, in a daemon
+    # thread (start) or in the foreground (run_forever, for CLI processes).
+    name = "worker"
+    interval_setting = None
+    delayed_start = False  # wait one interval before the first tick
+
+    def __init__(self, app):
+        self.app = app
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        raise NotImplementedError
+
+    def tick(self):
+        with self.app.app_context():
+            try:
+                return self.run_once()
+            except Exception:
+                db.session.rollback()
+                logger.exception("%s tick failed", self.name)
+                return {}
+
+    def run_forever(self):
+        if self.delayed_start:
+            self._stop.wait(self.app.config[self.interval_setting])
+        while not self._stop.is_set():
+            self.tick()
+            self._stop.wait(self.app.config[self.interval_setting])
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run_forever, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,253 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import and_, delete, func, or_, select
+
+from models import db, TokenBlocklist
+
+
+class BloomFilter:
+    # Compact "definitely not revoked" check for JTIs, sized for a 1% false positive rate
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class RevocationCache:
+    # Per-process cache in front of the token_blocklist table.
+    #  - revoked JTIs are kept (LRU, bounded) until the token expires
+    #  - "not revoked" answers are kept until min(exp, now + negative_ttl); the
+    #    TTL bounds how long a logout in another worker can go unnoticed here
+    #  - an optional Bloom filter of all blocklisted JTIs answers misses
+    #    without the database; it is rebuilt every bloom_refresh seconds, at
+    #    most negative_ttl, since its misses are "not revoked" answers too.
+    #    One request thread rebuilds it while the others keep the old filter.
+
+    def __init__(self, max_entries=10000, negative_ttl=30, bloom_refresh=None):
+        self._lock = threading.Lock()
+        self._revoked = OrderedDict()      # jti -> token exp
+        self._not_revoked = OrderedDict()  # jti -> cached until
+        self._bloom = None
+        self._bloom_loaded_at = 0.0
+        self._bloom_loading = False
+        self.configure(max_entries, negative_ttl, bloom_refresh)
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_entries, negative_ttl, bloom_refresh=None):
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        if bloom_refresh:
+            # No Bloom filter when "not revoked" may not be cached at all
+            bloom_refresh = min(bloom_refresh, negative_ttl) if negative_ttl > 0 else None
+        self.bloom_refresh = bloom_refresh
+        self.clear()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+            self._not_revoked.clear()
+            self._bloom = None
+
+    def _store(self, entries, jti, until):
+        entries[jti] = until
+        entries.move_to_end(jti)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def lookup(self, jti, now=None):
+        # True/False when the answer is cached, None when the database must be asked
+        if not self.enabled:
+            return None
+        now = now or time.time()
+        with self._lock:
+            for entries, answer in ((self._revoked, True), (self._not_revoked, False)):
+                until = entries.get(jti)
+                if until is None:
+                    continue
+                if until > now:
+                    entries.move_to_end(jti)
+                    self.hits += 1
+                    return answer
+                del entries[jti]
+
+            if self._bloom is not None and jti not in self._bloom:
+                self.hits += 1
+                return False
+
+            self.misses += 1
+            return None
+
+    def remember(self, jti, revoked, exp, now=None):
+        if not self.enabled:
+            return
+        now = now or time.time()
+        with self._lock:
+            if revoked:
+                self._store(self._revoked, jti, exp)
+            elif self.negative_ttl > 0:
+                self._store(self._not_revoked, jti, min(exp, now + self.negative_ttl))
+
+    def revoke(self, jti, exp):
+        # Called right after a logout commits so this process sees it immediately
+        with self._lock:
+            self._not_revoked.pop(jti, None)
+            if self._bloom is not None:
+                self._bloom.add(jti)
+        self.remember(jti, True, exp)
+
+    def bloom_is_stale(self, now=None):
+        if not self.enabled or not self.bloom_refresh:
+            return False
+        now = now or time.time()
+        return self._bloom is None or now - self._bloom_loaded_at > self.bloom_refresh
+
+    def begin_bloom_refresh(self, now=None):
+        # True for the one caller that should rebuild a stale filter
+        if not self.bloom_is_stale(now):
+            return False
+        with self._lock:
+            if self._bloom_loading:
+                return False
+            self._bloom_loading = True
+            return True
+
+    def end_bloom_refresh(self):
+        with self._lock:
+            self._bloom_loading = False
+
+    def load_bloom(self, jtis, count):
+        bloom = BloomFilter(count * 2 + 1000)
+        for jti in jtis:
+            bloom.add(jti)
+        with self._lock:
+            self._bloom = bloom
+            self._bloom_loaded_at = time.time()
+
+
+revocation_cache = RevocationCache()
+
+
+def init_revocation_cache(app):
+    config = app.config
+    bloom_refresh = config["TOKEN_BLOCKLIST_BLOOM_REFRESH"] if config["TOKEN_BLOCKLIST_BLOOM"] else None
+    revocation_cache.configure(
+        config["TOKEN_BLOCKLIST_CACHE_SIZE"],
+        config["TOKEN_BLOCKLIST_NEGATIVE_TTL"],
+        bloom_refresh,
+    )
+    # The Bloom filter loads on the first token check, not at boot
+
+
+def preload_bloom():
+    # Always the primary, like the lookups: a filter loaded from a lagging
+    # replica would answer "not revoked" for a fresh logout
+    count = db.session.query(TokenBlocklist.id).execution_options(use_primary=True).count()
+    jtis = db.session.execute(
+        db.select(TokenBlocklist.jti).execution_options(yield_per=5000, use_primary=True)
+    ).scalars()
+    revocation_cache.load_bloom(jtis, count)
+
+
+def is_token_revoked(jti, exp):
+    if revocation_cache.begin_bloom_refresh():
+        try:
+            preload_bloom()
+        finally:
+            revocation_cache.end_bloom_refresh()
+
+    cached = revocation_cache.lookup(jti)
+    if cached is not None:
+        return cached
+
+    # Always the primary: a lagging replica could miss a fresh logout
+    revoked = db.session.query(TokenBlocklist.id).filter_by(jti=jti).execution_options(
+        use_primary=True
+    ).first() is not None
+    revocation_cache.remember(jti, revoked, exp)
+    return revoked
+
+
+def revoke_token(jti, exp):
+    db.session.add(TokenBlocklist(jti=jti, expires_at=datetime.utcfromtimestamp(exp)))
+    db.session.commit()
+    revocation_cache.revoke(jti, exp)
+
+
+def _expired_filter(now):
+    # Rows written before expires_at existed fall back to the longest token lifetime
+    legacy_cutoff = now - current_app.config["JWT_REFRESH_TOKEN_EXPIRES"]
+    return or_(
+        TokenBlocklist.expires_at < now,
+        and_(TokenBlocklist.expires_at.is_(None), TokenBlocklist.created_at < legacy_cutoff),
+    )
+
+
+def _lookup_latency_ms(samples=20):
+    # Average time of the same indexed lookup check_if_token_in_blocklist does
+    started = time.perf_counter()
+    for i in range(samples):
+        db.session.query(TokenBlocklist.id).filter_by(jti=f"latency-probe-{i}").first()
+    return round((time.perf_counter() - started) * 1000 / samples, 3)
+
+
+def blocklist_stats(now=None):
+    now = now or datetime.utcnow()
+    return {
+        "rows": db.session.query(func.count(TokenBlocklist.id)).scalar(),
+        "expired_rows": db.session.query(func.count(TokenBlocklist.id)).filter(_expired_filter(now)).scalar(),
+        "lookup_ms": _lookup_latency_ms(),
+    }
+
+
+def compact_blocklist(batch_size=1000, now=None):
+    # Delete rows whose token can no longer be presented, one short transaction per batch
+    now = now or datetime.utcnow()
+    started = time.perf_counter()
+    deleted = 0
+    batches = 0
+    while True:
+        ids = db.session.execute(
+            select(TokenBlocklist.id).where(_expired_filter(now)).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        db.session.execute(delete(TokenBlocklist).where(TokenBlocklist.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
+        batches += 1
+        if len(ids) < batch_size:
+            break
+
+    stats = blocklist_stats(now)
+    stats.update({
+        "deleted": deleted,
+        "batches": batches,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    })
+    return stats
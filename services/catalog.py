@@ -0,0 +1,129 @@
+import hashlib
+import threading
+import time
+from itertools import chain
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, Reward, AvatarList
+from services.avatar_assets import avatar_urls, original_url
+from services.serialization import AVATAR, REWARD, dumps
+
+# Read-mostly catalogs served from memory as ready JSON bytes. Commits that
+# touch a catalog's tables (ORM objects or bulk statements) drop the cached copy
+# in this process; CATALOG_CACHE_TTL bounds staleness after changes made by
+# other workers.
+
+_catalogs = {}  # name -> (build function, model classes it is built from)
+
+
+def catalog(name, *models):
+    def register(build):
+        _catalogs[name] = (build, models)
+        return build
+    return register
+
+
+@catalog("rewards", Reward)
+def _rewards():
+    rows = db.session.execute(db.select(*REWARD.columns()).order_by(Reward.id))
+    return REWARD.dump_rows(rows)
+
+
+@catalog("avatars", AvatarList)
+def _avatars():
+    rows = db.session.execute(db.select(*AVATAR.columns()).order_by(AvatarList.avatar_id))
+    asset_dir = current_app.config["AVATAR_ASSET_DIR"]
+    avatars = AVATAR.dump_rows(rows)
+    for avatar in avatars:
+        urls = avatar_urls(asset_dir, avatar["filename"]) or {}
+        avatar["url"] = urls.get("full") or original_url(avatar["filename"])
+        avatar["thumbnail_url"] = urls.get("thumb") or original_url(avatar["filename"])
+    return avatars
+
+
+class CatalogCache:
+
+    def __init__(self, ttl=60):
+        self._lock = threading.Lock()
+        self._entries = {}      # name -> (body, etag, built_at, generation)
+        self._generations = {}  # bumped by invalidate(); entries from older generations are stale
+        self.ttl = ttl
+        self.hits = 0
+        self.builds = 0
+
+    def _fresh(self, name):
+        entry = self._entries.get(name)
+        if (entry and entry[3] == self._generations.get(name, 0)
+                and time.monotonic() - entry[2] < self.ttl):
+            return entry
+        return None
+
+    def get(self, name):
+        # (body bytes, etag); the etag is a hash of the body, so a rebuild that
+        # yields the same content keeps clients' copies valid
+        entry = self._fresh(name)
+        if entry:
+            self.hits += 1
+            return entry[0], entry[1]
+        with self._lock:
+            entry = self._fresh(name)  # another thread may have rebuilt it meanwhile
+            if entry:
+                return entry[0], entry[1]
+            generation = self._generations.get(name, 0)
+            build, _ = _catalogs[name]
+            body = dumps(build())
+            etag = hashlib.sha1(body).hexdigest()
+            self._entries[name] = (body, etag, time.monotonic(), generation)
+            self.builds += 1
+            return body, etag
+
+    def invalidate(self, names):
+        for name in names:
+            # Bumping the generation also discards a build that was running
+            # while the change committed
+            self._generations[name] = self._generations.get(name, 0) + 1
+
+    def stats(self):
+        return {"ttl": self.ttl, "hits": self.hits, "builds": self.builds, "cached": sorted(self._entries)}
+
+
+catalog_cache = CatalogCache()
+
+
+def init_catalog_cache(app):
+    catalog_cache.ttl = app.config["CATALOG_CACHE_TTL"]
+
+
+def _mark_changed(session, names):
+    if names:
+        session.info.setdefault("catalog_changes", set()).update(names)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session, flush_context):
+    # new/dirty/deleted still hold the pre-flush state here
+    objects = list(chain(session.new, session.dirty, session.deleted))
+    _mark_changed(session, {
+        name for name, (_, models) in _catalogs.items()
+        if any(isinstance(obj, models) for obj in objects)
+    })
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk(state):
+    if not (state.is_insert or state.is_update or state.is_delete) or state.bind_mapper is None:
+        return
+    target = state.bind_mapper.class_
+    _mark_changed(state.session, {
+        name for name, (_, models) in _catalogs.items() if issubclass(target, models)
+    })
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    # Changes that were rolled back stay marked until the next commit: at worst
+    # one needless rebuild
+    catalog_cache.invalidate(session.info.pop("catalog_changes", ()))
@@ -0,0 +1,288 @@
+from datetime import date
+
+from sqlalchemy import case, or_, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import db, User, Habit, HabitCompletion, UserStreak
+from services.progression import apply_level
+from services.leaderboard import XP, STREAKS, habit_board, record_score
+from services.profile import invalidate_profile, refresh_profile
+from services.streaks import record_day, user_today
+from services.weekly_progress import record_completion, record_completions
+from services.outbox import enqueue_many, notify, outbox_handler
+
+
+def _completed_values(habit, days, today):
+    # Streak, history bitmap and last day after completing `habit` on each of
+    # `days`; only a completion dated today marks it done today
+    bits, last_done, streak = habit.completion_bits, habit.last_done, habit.streak
+    longest = habit.longest_streak or 0
+    for day in sorted(days):
+        bits, last_done, streak = record_day(bits, last_done, streak, day)
+        longest = max(longest, streak)
+    return {
+        "streak": streak,
+        "longest_streak": longest,
+        "last_done": last_done,
+        "completion_bits": bits,
+        "done_today": bool(habit.done_today) or today in days,
+    }
+
+
+def _claim_habit(habit, today):
+    # Guarded write: only flips a habit that is not done yet, so two concurrent
+    # completions can't both count even where SELECT ... FOR UPDATE is a no-op (SQLite)
+    values = _completed_values(habit, [today], today)
+    result = db.session.execute(
+        update(Habit)
+        .where(Habit.id == habit.id, Habit.done_today.is_not(True))
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        return False
+
+    for key, value in values.items():
+        set_committed_value(habit, key, value)
+    return True
+
+
+def _apply_to_user(user, habit):
+    # XP logic
+    if habit.habit_type == "good":
+        user.xp = (user.xp or 0) + habit.xp_value
+    elif habit.habit_type == "bad":
+        user.xp = max((user.xp or 0) - habit.xp_value, 0)  # prevent negative XP
+
+    # mana / health system
+    cost = 10 if habit.habit_type == "good" else 15
+    if habit.habit_nature == "mental":
+        user.mana = max((user.mana or 0) - cost, 0)
+    else:
+        user.health = max((user.health or 0) - cost, 0)
+
+    # level update
+    apply_level(user)
+
+
+def _locked_user_streak(user_id):
+    streak = UserStreak.query.filter_by(user_id=user_id).with_for_update().first()
+    if streak is None:
+        streak = UserStreak(user_id=user_id, current_streak=0, longest_streak=0, last_completed=None)
+        db.session.add(streak)
+    return streak
+
+
+def _bump_user_streak(streak, completed_on):
+    # A day counts once however many habits were completed on it
+    streak.completion_bits, streak.last_completed, streak.current_streak = record_day(
+        streak.completion_bits, streak.last_completed, streak.current_streak, completed_on
+    )
+    streak.longest_streak = max(streak.longest_streak or 0, streak.current_streak)
+
+
+def _enqueue_followups(user_id, completions):
+    # The user streak row and leaderboard entry are derived data: they are
+    # applied by the outbox worker, once per completion id.
+    # completions: [(completion id, day)]
+    enqueue_many("completion_followup", [
+        (f"completion:{completion_id}", {"user_id": user_id, "completed_on": day.isoformat()})
+        for completion_id, day in completions
+    ])
+
+
+@outbox_handler("completion_followup")
+def _completion_followup(payload):
+    user = db.session.get(User, payload["user_id"], with_for_update=True, populate_existing=True)
+    if user is None:
+        return
+    streak = _locked_user_streak(user.user_id)
+    _bump_user_streak(streak, date.fromisoformat(payload["completed_on"]))
+    refresh_profile(user, streak)
+    record_score(STREAKS, user.user_id, streak.longest_streak)
+
+
+def _projected_streak(user_id, days):
+    # The user streak as it will be once the queued follow-ups for these
+    # completion days have run (a detached copy, never written)
+    streak = UserStreak.query.filter_by(user_id=user_id).first()
+    projected = UserStreak(
+        user_id=user_id,
+        current_streak=streak.current_streak if streak else 0,
+        longest_streak=(streak.longest_streak or 0) if streak else 0,
+        last_completed=streak.last_completed if streak else None,
+        completion_bits=streak.completion_bits if streak else 0,
+    )
+    for day in sorted(days):
+        _bump_user_streak(projected, day)
+    return projected
+
+
+def complete_habit(habit_id, today=None):
+    # The request commits the core change (habit, XP, mana/health, level), its
+    # completion event and follow-up job, and drops the profile snapshot, in
+    # one transaction with the habit and user rows locked. today defaults to
+    # the date in the user's timezone. Returns (response body, status code).
+    habit = db.session.get(Habit, habit_id, with_for_update=True)
+    if not habit:
+        db.session.rollback()
+        return {"error": "Habit not found"}, 404
+
+    today = today or user_today(habit.user_id)
+    if habit.done_today or not _claim_habit(habit, today):
+        db.session.rollback()
+        return {"message": "Habit already done today"}, 400
+
+    user = db.session.get(User, habit.user_id, with_for_update=True, populate_existing=True)
+    xp_before = user.xp or 0
+    _apply_to_user(user, habit)
+    completion = record_completion(user.user_id, habit, user.xp - xp_before, today)
+    db.session.flush()
+    _enqueue_followups(user.user_id, [(completion.id, today)])
+    streak = _projected_streak(user.user_id, [today])
+    invalidate_profile(user.user_id)  # the next read rebuilds it, the follow-up refreshes the streak
+    record_score(XP, user.user_id, user.xp)
+    record_score(habit_board(habit.name), habit.id, habit.longest_streak)
+
+    # Built before the commit, which expires user and habit (reading them
+    # afterwards would SELECT both again)
+    body = {
+        "message": "Habit completed",
+        "xp": user.xp,
+        "level": user.level,
+        "rank": user.level_name,
+        "mana": user.mana,
+        "health": user.health,
+        "habit_streak": habit.streak,
+        "habit_longest_streak": habit.longest_streak,
+        "user_streak": streak.current_streak or 0,
+        "user_longest_streak": streak.longest_streak,
+    }
+    db.session.commit()
+    notify()
+    return body, 200
+
+
+def _logged_days(habit_ids, days):
+    # (habit_id, day) pairs already in the completion log
+    if not habit_ids:
+        return set()
+    return set(db.session.execute(
+        select(HabitCompletion.habit_id, HabitCompletion.completed_on)
+        .where(HabitCompletion.habit_id.in_(habit_ids), HabitCompletion.completed_on.in_(days))
+    ).all())
+
+
+def complete_habits_batch(user_id, items, today=None):
+    # Offline sync: apply mark_done's rules to many habits of one user in a
+    # single transaction with a constant number of statements (completion
+    # events and follow-up jobs are one executemany INSERT each). items is a
+    # list of (habit_id, completion date or None for today); a habit may come
+    # once per day. Only today's completions set done_today, back-dated ones
+    # add to the history, streaks and XP. today defaults to the user's local
+    # date (user_today). Returns (response body, status code).
+    today = today or user_today(user_id)
+    items = [(habit_id, done_on or today) for habit_id, done_on in items]
+
+    ids = {habit_id for habit_id, _ in items}
+    habits = {
+        h.id: h
+        for h in Habit.query.filter(Habit.id.in_(ids), Habit.user_id == user_id)
+        .order_by(Habit.id)
+        .with_for_update()
+        .all()
+    }
+    back_dated = [(habit_id, done_on) for habit_id, done_on in items if done_on != today and habit_id in habits]
+    logged = _logged_days({habit_id for habit_id, _ in back_dated}, {done_on for _, done_on in back_dated})
+
+    results = []
+    completed = []  # (result, habit id, day)
+    pending = {}    # habit id -> days
+    for habit_id, done_on in items:
+        habit = habits.get(habit_id)
+        if habit is None:
+            results.append({"habit_id": habit_id, "status": "not_found"})
+            continue
+        if done_on == today:
+            already = habit.done_today
+        else:
+            already = (habit_id, done_on) in logged
+        if already or done_on in pending.get(habit_id, ()):
+            results.append({"habit_id": habit_id, "status": "already_done"})
+            continue
+        pending.setdefault(habit_id, []).append(done_on)
+        item = {"habit_id": habit_id, "status": "completed"}
+        if done_on != today:
+            item["done_on"] = done_on.isoformat()
+        results.append(item)
+        completed.append((item, habit_id, done_on))
+
+    user = db.session.get(User, user_id, with_for_update=True, populate_existing=True)
+    if user is None:
+        db.session.rollback()
+        return {"error": "User not found"}, 404
+
+    if pending:
+        # One guarded UPDATE for every habit in the batch, values keyed by id;
+        # the done_today guard only covers habits completed for today
+        claims = {habit_id: _completed_values(habits[habit_id], days, today) for habit_id, days in pending.items()}
+        done_today_ids = [habit_id for habit_id, days in pending.items() if today in days]
+        result = db.session.execute(
+            update(Habit)
+            .where(Habit.id.in_(pending), or_(Habit.done_today.is_not(True), Habit.id.not_in(done_today_ids)))
+            .values({
+                key: case({habit_id: values[key] for habit_id, values in claims.items()}, value=Habit.id)
+                for key in ("streak", "longest_streak", "last_done", "completion_bits", "done_today")
+            })
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(pending):
+            # Another request completed one of these habits meanwhile
+            db.session.rollback()
+            return {"error": "Habits changed concurrently, retry the batch"}, 409
+
+        for habit_id, values in claims.items():
+            for key, value in values.items():
+                set_committed_value(habits[habit_id], key, value)
+
+        rows = []
+        for item, habit_id, done_on in completed:
+            habit = habits[habit_id]
+            xp_before = user.xp or 0
+            _apply_to_user(user, habit)
+            rows.append({
+                "habit_id": habit_id, "user_id": user_id, "habit_type": habit.habit_type,
+                "xp_delta": user.xp - xp_before, "completed_on": done_on,
+            })
+            item.update({
+                "xp_delta": user.xp - xp_before,
+                "habit_streak": habit.streak,
+                "habit_longest_streak": habit.longest_streak,
+            })
+        for habit_id in pending:
+            record_score(habit_board(habits[habit_id].name), habit_id, habits[habit_id].longest_streak)
+        ids = record_completions(rows)
+        _enqueue_followups(user_id, [(ids[habit_id, day], day) for _, habit_id, day in completed])
+        record_score(XP, user_id, user.xp)
+
+    streak = _projected_streak(user_id, [day for _, _, day in completed])
+    if completed:
+        invalidate_profile(user_id)
+    # Built before the commit, which expires the user row
+    body = {
+        "message": "Batch processed",
+        "completed": len(completed),
+        "results": results,
+        "user": {
+            "xp": user.xp,
+            "level": user.level,
+            "rank": user.level_name,
+            "mana": user.mana,
+            "health": user.health,
+            "user_streak": streak.current_streak or 0,
+            "user_longest_streak": streak.longest_streak,
+        },
+    }
+    db.session.commit()
+    notify()
+    return body, 200
@@ -0,0 +1,183 @@
+import logging
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import case, func, select, update
+
+from models import db, User, Habit, UserStreak
+from services.leaderboard import leaderboards
+from services.profile import invalidate_profile_range, invalidate_profiles
+from services.streaks import local_dates
+
+logger = logging.getLogger(__name__)
+
+
+class DailyResetInterrupted(Exception):
+    # A chunk failed; resume holds the after_user_id / after_habit_id of the
+    # chunks committed so far, to pass back in
+    def __init__(self, resume):
+        super().__init__(f"Daily reset interrupted, resume with {resume}")
+        self.resume = resume
+
+
+# Daily energy refill: max mana/health grow by 10 per level above 1
+def _energy_for_level():
+    return 100 + (func.coalesce(User.level, 1) - 1) * 10
+
+
+def _next_upper_bound(pk, last_id, chunk_size, scope):
+    # Primary key of the last row in the next chunk (or None when done)
+    upper = db.session.execute(
+        select(pk).where(pk > last_id, *scope).order_by(pk).offset(chunk_size - 1).limit(1)
+    ).scalar()
+    if upper is None:
+        upper = db.session.execute(select(func.max(pk)).where(pk > last_id, *scope)).scalar()
+    return upper
+
+
+def _reset_in_chunks(pk, values, last_id, chunk_size, scope=(), follow_up=None, committed=None):
+    # committed(last id) is called after each chunk's commit
+    rows = 0
+    chunks = 0
+    while True:
+        upper = _next_upper_bound(pk, last_id, chunk_size, scope)
+        if upper is None:
+            break
+
+        result = db.session.execute(
+            update(pk.class_)
+            .where(pk > last_id, pk <= upper, *scope)
+            .values(values)
+            .execution_options(synchronize_session=False)
+        )
+        # Dependent writes for the same key range, e.g. stale profile snapshots
+        if follow_up is not None:
+            follow_up(last_id, upper)
+        # Commit every chunk so locks are short-lived and progress is durable
+        db.session.commit()
+        logger.info("Daily reset: %s committed up to id %s", pk.class_.__tablename__, upper)
+
+        rows += result.rowcount
+        chunks += 1
+        last_id = upper
+        if committed is not None:
+            committed(last_id)
+    return rows, chunks, last_id
+
+
+def _habit_reset_values(yesterday):
+    # Habits not done yesterday lose their streak (the bitmap keeps the history)
+    return {
+        Habit.done_today: False,
+        Habit.streak: case((Habit.last_done >= yesterday, Habit.streak), else_=0),
+    }
+
+
+def _energy_reset_values():
+    energy = _energy_for_level()
+    return {
+        User.max_mana: energy,
+        User.max_health: energy,
+        User.mana: energy,
+        User.health: energy,
+    }
+
+
+def _broken_user_streaks(yesterday):
+    # User streaks whose last completion is older than yesterday end here;
+    # only those rows are touched
+    return [UserStreak.last_completed < yesterday, UserStreak.current_streak != 0]
+
+
+def _summary(started, chunk_size, user_rows, habit_rows, streak_rows, chunks, **cursor):
+    # No ranked score changes here, but the new day is when this worker's boards
+    # pick up what other workers and bulk jobs changed (rebuilt in the background)
+    if user_rows or habit_rows:
+        leaderboards.expire()
+
+    elapsed = time.perf_counter() - started
+    total = user_rows + habit_rows
+    return {
+        "users_reset": user_rows,
+        "habits_reset": habit_rows,
+        "user_streaks_broken": streak_rows,
+        "chunks": chunks,
+        "chunk_size": chunk_size,
+        **cursor,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(total / elapsed, 1) if elapsed > 0 else total,
+    }
+
+
+def run_daily_reset(chunk_size=1000, after_user_id=0, after_habit_id=0, today=None):
+    # Set-based reset of every user: one UPDATE per chunk of primary keys,
+    # nothing loaded into the session. Pass after_user_id / after_habit_id
+    # from a previous summary, or from the DailyResetInterrupted a failed run
+    # raises, to resume it. Streaks break on
+    # each user's local yesterday (completions are dated in their timezone),
+    # or on the day before `today` when it is given.
+    started = time.perf_counter()
+    if today:
+        habit_yesterday = streak_yesterday = today - timedelta(days=1)
+    else:
+        habit_yesterday = local_dates(Habit.user_id, days_back=1)
+        streak_yesterday = local_dates(UserStreak.user_id, days_back=1)
+
+    resume = {"after_user_id": after_user_id, "after_habit_id": after_habit_id}
+    try:
+        habit_rows, habit_chunks, last_habit_id = _reset_in_chunks(
+            Habit.id, _habit_reset_values(habit_yesterday), after_habit_id, chunk_size,
+            committed=lambda last_id: resume.update(after_habit_id=last_id),
+        )
+        streak_rows, streak_chunks, _ = _reset_in_chunks(
+            UserStreak.streak_id, {UserStreak.current_streak: 0}, 0, chunk_size,
+            _broken_user_streaks(streak_yesterday),
+        )
+        # Users last: their pass drops the profile snapshots, which show the streaks
+        user_rows, user_chunks, last_user_id = _reset_in_chunks(
+            User.user_id, _energy_reset_values(), after_user_id, chunk_size,
+            follow_up=invalidate_profile_range,
+            committed=lambda last_id: resume.update(after_user_id=last_id),
+        )
+    except Exception as error:
+        db.session.rollback()
+        logger.exception("Daily reset failed, resume with %s", resume)
+        raise DailyResetInterrupted(resume) from error
+    return _summary(
+        started, chunk_size, user_rows, habit_rows, streak_rows, user_chunks + habit_chunks + streak_chunks,
+        last_user_id=last_user_id, last_habit_id=last_habit_id,
+    )
+
+
+def reset_users(user_chunks, chunk_size, today=None):
+    # Reset of one bucket of users, fed as lists of user ids (the caller pages
+    # them on an index and records its cursor). Every statement is scoped to
+    # one chunk by user id, so a bucket costs O(bucket size) whatever the
+    # table sizes; each chunk commits on its own.
+    started = time.perf_counter()
+    yesterday = (today or date.today()) - timedelta(days=1)
+    habit_values = _habit_reset_values(yesterday)
+    user_values = _energy_reset_values()
+
+    user_rows = habit_rows = streak_rows = chunks = 0
+    last_user_id = None
+    for user_ids in user_chunks:
+        habit_rows += db.session.execute(
+            update(Habit).where(Habit.user_id.in_(user_ids)).values(habit_values)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        streak_rows += db.session.execute(
+            update(UserStreak)
+            .where(UserStreak.user_id.in_(user_ids), *_broken_user_streaks(yesterday))
+            .values({UserStreak.current_streak: 0})
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        user_rows += db.session.execute(
+            update(User).where(User.user_id.in_(user_ids)).values(user_values)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        invalidate_profiles(user_ids)
+        db.session.commit()
+        chunks += 1
+        last_user_id = user_ids[-1]
+    return _summary(started, chunk_size, user_rows, habit_rows, streak_rows, chunks, last_user_id=last_user_id)
@@ -0,0 +1,117 @@
+import random
+import threading
+import time
+
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+# Replica routing for db.session. Views marked @read_only send their plain
+# SELECTs to a healthy replica bind; everything else (writes, FOR UPDATE,
+# statements with execution_options(use_primary=True), reads after the request
+# has written, clients that wrote a moment ago) stays on the primary.
+# Kept free of model imports: models.py builds db with RoutingSession.
+
+PIN_COOKIE = "db_primary_until"
+
+
+class ReplicaState:
+    # Replica bind keys, which of them are fit to serve reads, and the
+    # read-your-writes pins of users who wrote recently (per process; the
+    # PIN_COOKIE carries the pin to other workers)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.binds = ()
+        self.healthy = ()
+        self.pin_seconds = 0
+        self._pins = {}  # user id -> time.time() until which they read from the primary
+
+    def configure(self, binds, pin_seconds):
+        with self._lock:
+            self.binds = tuple(binds)
+            self.healthy = tuple(binds)
+            self.pin_seconds = pin_seconds
+            self._pins.clear()
+
+    def set_healthy(self, binds):
+        self.healthy = tuple(binds)
+
+    def pin(self, user_id, until):
+        with self._lock:
+            self._pins[user_id] = until
+            if len(self._pins) > 10000:
+                now = time.time()
+                self._pins = {key: value for key, value in self._pins.items() if value > now}
+
+    def is_pinned(self, user_id):
+        return self._pins.get(user_id, 0) > time.time()
+
+
+replica_state = ReplicaState()
+
+
+def read_only(view):
+    # Marks a view whose queries may be served by a replica
+    view.read_only = True
+    return view
+
+
+def current_user_id():
+    # JWT subject of the current request, if a token has been verified
+    from flask_jwt_extended import get_jwt
+    try:
+        return get_jwt().get("sub")
+    except RuntimeError:
+        return None
+
+
+def use_primary():
+    # Sends the rest of this request's reads to the primary; call it before
+    # reads whose results are about to be written back
+    if has_request_context():
+        g.db_wrote = True
+
+
+def _replica_allowed():
+    # Decided at the first routable SELECT of the request. A replica decision
+    # is only kept once the JWT identity is known: a read before
+    # @jwt_required has verified the token must not skip the user's
+    # read-your-writes pin for the rest of the request.
+    route = g.get("db_route")
+    if route is None:
+        route = "primary"
+        user_id = None
+        view = current_app.view_functions.get(request.endpoint)
+        if getattr(view, "read_only", False) and replica_state.healthy:
+            pinned_until = request.cookies.get(PIN_COOKIE, "")
+            user_id = current_user_id()
+            if not (pinned_until.replace(".", "", 1).isdigit() and float(pinned_until) > time.time()) \
+                    and not (user_id is not None and replica_state.is_pinned(user_id)):
+                route = "replica"
+        if route == "primary" or user_id is not None:
+            g.db_route = route
+    return route == "replica" and not g.get("db_wrote")
+
+
+def _is_write(session, clause):
+    # Flushes, DML, SELECT ... FOR UPDATE and raw SQL count as writes
+    if session._flushing:
+        return True
+    if isinstance(clause, sa.sql.Select):
+        return clause._for_update_arg is not None
+    return clause is not None
+
+
+class RoutingSession(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and replica_state.binds and has_request_context():
+            if _is_write(self, clause):
+                g.db_wrote = True  # later reads in this request see our own writes
+            elif (isinstance(clause, sa.sql.Select) and not clause.get_execution_options().get("use_primary")
+                    and _replica_allowed()):
+                healthy = replica_state.healthy
+                if healthy:
+                    return self._db.engines[random.choice(healthy)]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
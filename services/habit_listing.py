@@ -0,0 +1,83 @@
+from sqlalchemy import select
+
+from models import db, Habit
+from services.serialization import HABIT, dumps
+
+# Fields GET /habits/ can return; DEFAULT_FIELDS is the response it always had
+HABIT_FIELDS = HABIT.fields
+DEFAULT_FIELDS = (
+    "id", "user_id", "name", "habit_type", "habit_nature", "xp_value", "streak", "last_done", "done_today",
+)
+_FILTER_VALUES = {
+    "type": ("good", "bad"),
+    "nature": ("physical", "mental"),
+    "done": ("true", "false", "all"),
+}
+
+
+def parse_listing_args(args):
+    # -> (fields, filters, error message or None)
+    fields = DEFAULT_FIELDS
+    if args.get("fields"):
+        fields = tuple(dict.fromkeys(name.strip() for name in args["fields"].split(",") if name.strip()))
+        unknown = [name for name in fields if name not in HABIT_FIELDS]
+        if unknown or not fields:
+            return None, None, f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(HABIT_FIELDS)}"
+
+    filters = {"done": args.get("done", "false")}  # the list has always hidden habits done today
+    for name in ("type", "nature"):
+        if args.get(name):
+            filters[name] = args[name]
+    for name, value in filters.items():
+        if value not in _FILTER_VALUES[name]:
+            return None, None, f"{name} must be one of: {', '.join(_FILTER_VALUES[name])}"
+    return fields, filters, None
+
+
+def _columns(fields):
+    # The requested fields, then the id when it isn't one of them (for the cursor)
+    return HABIT.columns(fields) + ([] if "id" in fields else [Habit.id])
+
+
+def _query(user_id, fields, filters, after_id, limit):
+    # Keyset on id: each page is an index range scan, however deep the cursor
+    stmt = select(*_columns(fields)).where(Habit.user_id == user_id)
+    if filters["done"] != "all":
+        stmt = stmt.where(Habit.done_today == (filters["done"] == "true"))
+    if "type" in filters:
+        stmt = stmt.where(Habit.habit_type == filters["type"])
+    if "nature" in filters:
+        stmt = stmt.where(Habit.habit_nature == filters["nature"])
+    if after_id is not None:
+        stmt = stmt.where(Habit.id > after_id)
+    return stmt.order_by(Habit.id).limit(limit)
+
+
+def _row_id(fields):
+    return fields.index("id") if "id" in fields else len(fields)
+
+
+def habit_page(user_id, fields, filters, after_id=None, limit=100):
+    # -> (items in field order, cursor for the next page or None)
+    rows = db.session.execute(_query(user_id, fields, filters, after_id, limit + 1)).all()
+    next_cursor = str(rows[limit - 1][_row_id(fields)]) if len(rows) > limit else None
+    return HABIT.dump_rows(rows[:limit], fields), next_cursor
+
+
+def export_habits(user_id, fields, filters, page_size=500):
+    # Yields one JSON array in chunks, reading page_size rows at a time so a
+    # full export never holds every habit in memory
+    yield b"["
+    after_id = None
+    first = True
+    while True:
+        rows = db.session.execute(_query(user_id, fields, filters, after_id, page_size)).all()
+        if rows:
+            # One encoder call per page: the page's items without the brackets
+            page = dumps(HABIT.dump_rows(rows, fields))[1:-1]
+            yield page if first else b"," + page
+            first = False
+        if len(rows) < page_size:
+            break
+        after_id = rows[-1][_row_id(fields)]
+    yield b"]"
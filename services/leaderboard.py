@@ -0,0 +1,331 @@
+import logging
+import threading
+import time
+
+from sortedcontainers import SortedList
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from models import db, User, Habit, UserStreak
+from services.background import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+# XP and streak rankings kept in memory. Each board is a SortedList of
+# (-score, member), so updates, rank and top-N lookups are O(log n).
+# Commits in this process apply their score changes right away; changes made
+# by other workers (and rows the hooks don't see, e.g. bulk imports) arrive
+# with the next rebuild, which runs in a background thread once the boards are
+# older than LEADERBOARD_REFRESH_INTERVAL or after a daily reset.
+#
+# Boards: "xp" and "streaks" (User.xp, UserStreak.longest_streak, by user id)
+# and one "habit:<name>" board per habit name (Habit.longest_streak, by habit id).
+
+XP = "xp"
+STREAKS = "streaks"
+
+
+def habit_board(name):
+    return "habit:" + " ".join((name or "").lower().split())
+
+
+class Leaderboard:
+    __slots__ = ("_entries", "_scores")
+
+    def __init__(self, scores=None):
+        self._scores = dict(scores or {})  # member -> score
+        self._entries = SortedList((-score, member) for member, score in self._scores.items())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, member):
+        return member in self._scores
+
+    def set(self, member, score):
+        # score None removes the member
+        old = self._scores.get(member)
+        if old == score:
+            return
+        if old is not None:
+            self._entries.remove((-old, member))
+            del self._scores[member]
+        if score is not None:
+            self._scores[member] = score
+            self._entries.add((-score, member))
+
+    def rank(self, member):
+        # Competition ranking: 1 + members with a strictly higher score
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        return self._entries.bisect_left((-score,)) + 1
+
+    def page(self, start, count):
+        # [(rank, member, score)] for positions start .. start + count - 1
+        rows = []
+        for negative, member in self._entries.islice(start, start + count):
+            rows.append((self._entries.bisect_left((negative,)) + 1, member, -negative))
+        return rows
+
+    def around(self, member, k):
+        # The member and up to k neighbours on each side
+        score = self._scores.get(member)
+        if score is None:
+            return []
+        position = self._entries.bisect_left((-score, member))
+        start = max(position - k, 0)
+        return self.page(start, position - start + k + 1)
+
+
+def _load_boards(batch_size):
+    # One streaming pass over users, user streaks and habits
+    scores = {XP: {}, STREAKS: {}}
+    users = db.session.execute(
+        select(User.user_id, func.coalesce(User.xp, 0)).execution_options(yield_per=batch_size)
+    )
+    for user_id, xp in users:
+        scores[XP][user_id] = xp
+        scores[STREAKS][user_id] = 0
+    streaks = db.session.execute(
+        select(UserStreak.user_id, func.coalesce(UserStreak.longest_streak, 0))
+        .execution_options(yield_per=batch_size)
+    )
+    for user_id, longest in streaks:
+        if user_id in scores[STREAKS]:
+            scores[STREAKS][user_id] = max(scores[STREAKS][user_id], longest)
+    habits = db.session.execute(
+        select(Habit.id, Habit.name, func.coalesce(Habit.longest_streak, 0))
+        .execution_options(yield_per=batch_size)
+    )
+    for habit_id, name, longest in habits:
+        scores.setdefault(habit_board(name), {})[habit_id] = longest
+    return {name: Leaderboard(board) for name, board in scores.items()}
+
+
+class Leaderboards:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._boards = None     # name -> Leaderboard, None until the first build
+        self._replay = None     # changes applied while a rebuild reads the tables
+        self._stale = False
+        self._refreshing = False  # a background rebuild is running
+        self.app = None           # for the background rebuild's app context
+        self.batch_size = 5000
+        self.refresh_interval = 300
+        self.built_at = None
+        self.build_ms = 0.0
+        self.builds = 0
+
+    def rebuild(self):
+        with self._build_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        with self._lock:
+            self._replay = []
+        started = time.perf_counter()
+        try:
+            boards = _load_boards(self.batch_size)
+        finally:
+            with self._lock:
+                replay, self._replay = self._replay, None
+        with self._lock:
+            # Commits that landed during the read may be missing from it
+            for name, member, score in replay:
+                boards.setdefault(name, Leaderboard()).set(member, score)
+            self._boards = boards
+            self._stale = False
+            self.built_at = time.time()
+            self.build_ms = round((time.perf_counter() - started) * 1000, 2)
+            self.builds += 1
+
+    def expire(self):
+        # Rebuild from the database in the background; reads keep serving the
+        # current boards until it is done. Nothing to do before the first build.
+        self._stale = True
+        if self._boards is not None:
+            self._refresh_in_background()
+
+    def _ensure(self):
+        # The first read builds the boards; later reads only start a
+        # background rebuild when the boards are stale or too old
+        if self._boards is None:
+            with self._build_lock:
+                if self._boards is None:
+                    self._rebuild()
+        elif self._stale or time.time() - self.built_at > self.refresh_interval:
+            self._refresh_in_background()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or self.app is None:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_rebuild, name="leaderboard-rebuild", daemon=True).start()
+
+    def _background_rebuild(self):
+        try:
+            with self.app.app_context():
+                try:
+                    self.rebuild()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Leaderboard rebuild failed")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def apply(self, changes):
+        # changes: [(board name, member, score or None)]
+        with self._lock:
+            if self._replay is not None:
+                self._replay.extend(changes)
+            if self._boards is None:
+                return
+            for name, member, score in changes:
+                board = self._boards.get(name)
+                if board is None:
+                    board = self._boards[name] = Leaderboard()
+                board.set(member, score)
+
+    def top(self, name, start, count):
+        # (board size, [(rank, member, score)])
+        self._ensure()
+        with self._lock:
+            board = self._boards.get(name)
+            if board is None:
+                return 0, []
+            return len(board), board.page(start, count)
+
+    def around(self, name, member, k, load_score):
+        # (board size, rank, [(rank, member, score)]); a member the board has
+        # not seen yet (a new user or habit) is added with load_score()
+        self._ensure()
+        with self._lock:
+            board = self._boards.get(name)
+            known = board is not None and member in board
+        if not known:
+            score = load_score()
+            if score is None:
+                return 0, None, []
+            self.apply([(name, member, score)])
+        with self._lock:
+            board = self._boards[name]
+            return len(board), board.rank(member), board.around(member, k)
+
+    def stats(self):
+        with self._lock:
+            boards = self._boards or {}
+            return {
+                "boards": len(boards),
+                "members": sum(len(board) for board in boards.values()),
+                "builds": self.builds,
+                "build_ms": self.build_ms,
+                "age_seconds": round(time.time() - self.built_at, 1) if self.built_at else 0,
+            }
+
+
+leaderboards = Leaderboards()
+
+
+def _entries(name, rows):
+    # [(rank, member, score)] -> JSON rows with the owner's username
+    if name in (XP, STREAKS):
+        owners = {member: member for _, member, _ in rows}
+    else:
+        owners = dict(db.session.execute(
+            select(Habit.id, Habit.user_id).where(Habit.id.in_([member for _, member, _ in rows]))
+        ).all())
+    usernames = dict(db.session.execute(
+        select(User.user_id, User.username).where(User.user_id.in_(set(owners.values())))
+    ).all())
+    entries = []
+    for rank, member, score in rows:
+        entry = {"rank": rank, "user_id": owners.get(member), "username": usernames.get(owners.get(member)),
+                 "score": score}
+        if name not in (XP, STREAKS):
+            entry["habit_id"] = member
+        entries.append(entry)
+    return entries
+
+
+def board_page(name, start, count):
+    total, rows = leaderboards.top(name, start, count)
+    return {"board": name, "total": total, "entries": _entries(name, rows)}
+
+
+def _member_and_score(name, user_id):
+    # The user's member id on a board and a loader for its current score
+    if name == XP:
+        return user_id, lambda: db.session.execute(
+            select(func.coalesce(User.xp, 0)).where(User.user_id == user_id)
+        ).scalar()
+    if name == STREAKS:
+        def streak():
+            if db.session.get(User, user_id) is None:
+                return None
+            longest = db.session.execute(
+                select(func.max(UserStreak.longest_streak)).where(UserStreak.user_id == user_id)
+            ).scalar()
+            return longest or 0
+        return user_id, streak
+    # Habit boards: the user's first habit with that name
+    habits = db.session.execute(
+        select(Habit.id, Habit.name, func.coalesce(Habit.longest_streak, 0))
+        .where(Habit.user_id == user_id).order_by(Habit.id)
+    ).all()
+    for habit_id, habit_name, longest in habits:
+        if habit_board(habit_name) == name:
+            return habit_id, lambda: longest
+    return None, None
+
+
+def board_around(name, user_id, k):
+    # None when the user has no entry on this board
+    member, load_score = _member_and_score(name, user_id)
+    if member is None:
+        return None
+    total, rank, rows = leaderboards.around(name, member, k, load_score)
+    if rank is None:
+        return None
+    return {"board": name, "total": total, "rank": rank, "entries": _entries(name, rows)}
+
+
+def init_leaderboards(app):
+    leaderboards.app = app
+    leaderboards.batch_size = app.config["LEADERBOARD_BATCH_SIZE"]
+    leaderboards.refresh_interval = app.config["LEADERBOARD_REFRESH_INTERVAL"]
+
+
+def record_score(name, member, score):
+    # Applied to the boards once the current transaction commits
+    db.session.info.setdefault("leaderboard_changes", []).append((name, member, score))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    changes = session.info.pop("leaderboard_changes", None)
+    if changes:
+        leaderboards.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("leaderboard_changes", None)
+
+
+class LeaderboardRefresher(PeriodicWorker):
+    # Rebuilds this process's boards on a fixed schedule, whether or not they
+    # are read. Reads already start a background rebuild once the boards are
+    # older than the interval (Leaderboards._ensure); the first build is done by
+    # the first read, so the refresher waits an interval and booting reads nothing
+    name = "leaderboard-refresher"
+    interval_setting = "LEADERBOARD_REFRESH_INTERVAL"
+    delayed_start = True
+
+    def run_once(self):
+        leaderboards.rebuild()
+        return leaderboards.stats()
@@ -0,0 +1,135 @@
+import json
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, update
+
+from models import db, OutboxJob
+from services.background import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+_wakeup = threading.Event()
+_counters = {"processed": 0, "failed": 0, "last_lag_seconds": 0.0}
+_counters_lock = threading.Lock()
+
+
+def outbox_handler(kind):
+    # Registers the function that applies jobs of this kind. It runs inside the
+    # job's transaction, which also marks the job done, so effects apply once.
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def enqueue(kind, dedupe_key, payload):
+    # Add to the caller's transaction; the job exists only if that commits
+    db.session.add(OutboxJob(kind=kind, dedupe_key=dedupe_key, payload=json.dumps(payload)))
+
+
+def enqueue_many(kind, jobs):
+    # jobs: [(dedupe_key, payload)], added with one executemany INSERT
+    db.session.execute(insert(OutboxJob), [
+        {"kind": kind, "dedupe_key": dedupe_key, "payload": json.dumps(payload)}
+        for dedupe_key, payload in jobs
+    ])
+
+
+def notify():
+    # Wake this process's worker right away instead of at the next poll
+    _wakeup.set()
+
+
+def _count(key, lag=None):
+    with _counters_lock:
+        _counters[key] += 1
+        if lag is not None:
+            _counters["last_lag_seconds"] = lag
+
+
+def _run_job(job_id, max_attempts):
+    now = datetime.utcnow()
+    # Claim first: only one worker can move a job out of "pending"
+    claimed = db.session.execute(
+        update(OutboxJob)
+        .where(OutboxJob.id == job_id, OutboxJob.status == "pending")
+        .values(status="done", processed_at=now, attempts=OutboxJob.attempts + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return None
+
+    job = db.session.get(OutboxJob, job_id, populate_existing=True)
+    try:
+        _handlers[job.kind](json.loads(job.payload))
+        db.session.commit()
+    except Exception as exc:
+        db.session.rollback()
+        logger.exception("Outbox job %s (%s) failed", job_id, job.kind)
+        job = db.session.get(OutboxJob, job_id, populate_existing=True)
+        job.attempts += 1
+        job.last_error = repr(exc)[:1000]
+        job.status = "failed" if job.attempts >= max_attempts else "pending"
+        db.session.commit()
+        _count("failed")
+        return False
+
+    _count("processed", (now - job.created_at).total_seconds())
+    return True
+
+
+def process_pending(limit=100, max_attempts=5):
+    job_ids = db.session.execute(
+        select(OutboxJob.id).where(OutboxJob.status == "pending").order_by(OutboxJob.id).limit(limit)
+    ).scalars().all()
+    db.session.rollback()  # end the read transaction before the per-job ones
+
+    processed = failed = 0
+    for job_id in job_ids:
+        result = _run_job(job_id, max_attempts)
+        if result is True:
+            processed += 1
+        elif result is False:
+            failed += 1
+    return {"processed": processed, "failed": failed}
+
+
+def outbox_stats():
+    pending, oldest = db.session.execute(
+        select(func.count(OutboxJob.id), func.min(OutboxJob.created_at)).where(OutboxJob.status == "pending")
+    ).one()
+    failed = db.session.query(func.count(OutboxJob.id)).filter(OutboxJob.status == "failed").scalar()
+    with _counters_lock:
+        counters = dict(_counters)
+    return {
+        "depth": pending,
+        "failed_jobs": failed,
+        "lag_seconds": round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0.0,
+        "processed_here": counters["processed"],
+        "failed_here": counters["failed"],
+        "last_job_lag_seconds": round(counters["last_lag_seconds"], 3),
+    }
+
+
+class OutboxWorker(PeriodicWorker):
+    name = "outbox-worker"
+    interval_setting = "OUTBOX_POLL_INTERVAL"
+
+    def run_once(self):
+        config = self.app.config
+        return process_pending(config["OUTBOX_BATCH_SIZE"], config["OUTBOX_MAX_ATTEMPTS"])
+
+    def run_forever(self):
+        # Poll, but wake early when a request in this process enqueues work
+        while not self._stop.is_set():
+            _wakeup.clear()
+            self.tick()
+            _wakeup.wait(self.app.config[self.interval_setting])
+
+    def stop(self):
+        super().stop()
+        _wakeup.set()
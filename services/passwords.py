@@ -0,0 +1,216 @@
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+import bcrypt
+
+# Workers run in separate processes so a login storm burns their CPU instead of
+# holding the GIL in the web worker.
+
+
+class PasswordPoolBusy(Exception):
+    # No hashing slot freed up in time; the request should be retried later
+    pass
+
+
+def _hash(password, rounds):
+    started = time.perf_counter()
+    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+    return hashed, time.perf_counter() - started
+
+
+def _check(password_hash, password):
+    started = time.perf_counter()
+    try:
+        valid = bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+    except ValueError:  # malformed hash or password over bcrypt's 72 bytes
+        valid = False
+    return valid, time.perf_counter() - started
+
+
+def hash_cost(password_hash):
+    # "$2b$12$..." -> 12
+    try:
+        return int(password_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class HashMetrics:
+    # Per-operation timings: "run" is time inside bcrypt, "wait" the time spent
+    # queued for a free worker
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self._runs = {}
+        self._waits = {}
+        self.calls = {}
+        self.rejected = 0
+        self.timeouts = 0
+
+    def record(self, kind, run_seconds, wait_seconds):
+        with self._lock:
+            self._runs.setdefault(kind, deque(maxlen=self._window)).append(run_seconds)
+            self._waits.setdefault(kind, deque(maxlen=self._window)).append(wait_seconds)
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            runs = {kind: sorted(values) for kind, values in self._runs.items()}
+            waits = {kind: sorted(values) for kind, values in self._waits.items()}
+            stats = {"rejected": self.rejected, "timeouts": self.timeouts}
+
+        def percentile(values, p):
+            if not values:
+                return 0.0
+            return round(values[min(int(len(values) * p), len(values) - 1)] * 1000, 3)
+
+        for kind, values in runs.items():
+            stats[kind] = {
+                "calls": self.calls[kind],
+                "run_ms_p50": percentile(values, 0.50),
+                "run_ms_p95": percentile(values, 0.95),
+                "run_ms_max": percentile(values, 1.0),
+                "wait_ms_p95": percentile(waits[kind], 0.95),
+            }
+        return stats
+
+
+class PasswordHasher:
+    # bcrypt behind a bounded process pool. At most workers + queue_size calls
+    # are in flight; callers beyond that wait up to `wait` seconds for a slot
+    # and then get PasswordPoolBusy. workers=0 hashes inline (dev, CLI).
+
+    def __init__(self, rounds=12, workers=0, queue_size=0, wait=0.5, timeout=10.0):
+        self._lock = threading.Lock()
+        self._executor = None
+        self.metrics = HashMetrics()
+        self.configure(rounds, workers, queue_size, wait, timeout)
+
+    def configure(self, rounds, workers, queue_size, wait, timeout):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            self.rounds = rounds
+            self.workers = workers
+            self.queue_size = queue_size
+            self.wait = wait
+            self.timeout = timeout
+            self._slots = threading.BoundedSemaphore(max(workers + queue_size, 1))
+
+    def _pool(self):
+        # Created on first use so a preloading gunicorn master never owns it.
+        # By then the web worker runs background threads, so the processes come
+        # from a single-threaded fork server (spawned where there is none)
+        # rather than being forked from here with locks some thread held.
+        with self._lock:
+            if self._executor is None:
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context("forkserver")
+                    context.set_forkserver_preload([__name__])  # bcrypt, not the app
+                else:
+                    context = multiprocessing.get_context("spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+
+    def _submit(self, fn, *args, wait):
+        # Takes a slot (waiting up to `wait` seconds, None = as long as it takes)
+        # and holds it until the job really finishes, even if the caller stops waiting
+        if not self._slots.acquire(timeout=wait):
+            self.metrics.record_rejected()
+            raise PasswordPoolBusy()
+        try:
+            future = self._pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run(self, kind, fn, *args):
+        if not self.workers:
+            result, seconds = fn(*args)
+            self.metrics.record(kind, seconds, 0.0)
+            return result
+
+        started = time.perf_counter()
+        future = self._submit(fn, *args, wait=self.wait)
+        try:
+            result, seconds = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.metrics.record_timeout()
+            raise PasswordPoolBusy()
+        self.metrics.record(kind, seconds, max(time.perf_counter() - started - seconds, 0.0))
+        return result
+
+    def hash(self, password):
+        return self._run("hash", _hash, password, self.rounds)
+
+    def check(self, password_hash, password):
+        if not password_hash or not password:
+            return False
+        return self._run("check", _check, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return hash_cost(password_hash) != self.rounds
+
+    def hash_many(self, passwords):
+        # Bulk path (imports): waits for slots rather than raising
+        # PasswordPoolBusy, and holds at most `workers` of them at a time so
+        # logins keep the queue slots and are served between its jobs
+        passwords = list(passwords)
+        if not self.workers or len(passwords) < 2:
+            return [self.hash(password) for password in passwords]
+        hashed = []
+        in_flight = deque()
+
+        def collect():
+            result, seconds = in_flight.popleft().result()
+            self.metrics.record("hash", seconds, 0.0)
+            hashed.append(result)
+
+        for password in passwords:
+            if len(in_flight) >= self.workers:
+                collect()
+            in_flight.append(self._submit(_hash, password, self.rounds, wait=None))
+        while in_flight:
+            collect()
+        return hashed
+
+    def stats(self):
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            **self.metrics.snapshot(),
+        }
+
+
+password_hasher = PasswordHasher()
+
+
+def init_password_hasher(app):
+    config = app.config
+    password_hasher.configure(
+        config["BCRYPT_LOG_ROUNDS"],
+        config["PASSWORD_POOL_WORKERS"],
+        config["PASSWORD_POOL_QUEUE"],
+        config["PASSWORD_POOL_WAIT"],
+        config["PASSWORD_POOL_TIMEOUT"],
+    )
+
+
+def password_stats():
+    return password_hasher.stats()
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    # Checkout latency and usage for one worker process's pool
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)  # seconds, most recent checkouts
+        self.checkouts = 0
+        self.timeouts = 0
+        self.overflow_checkouts = 0
+        self.max_in_use = 0
+
+    def record(self, seconds, in_use, overflow):
+        with self._lock:
+            self._latencies.append(seconds)
+            self.checkouts += 1
+            self.max_in_use = max(self.max_in_use, in_use)
+            if overflow > 0:
+                self.overflow_checkouts += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 3)
+
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "overflow_checkouts": self.overflow_checkouts,
+            "max_in_use": self.max_in_use,
+            "checkout_ms_p50": percentile(0.50),
+            "checkout_ms_p95": percentile(0.95),
+            "checkout_ms_max": percentile(1.0),
+        }
+
+
+class InstrumentedQueuePool(QueuePool):
+    # QueuePool that times every checkout, including waits for a free connection
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record(time.perf_counter() - started, self.checkedout(), self.overflow())
+        return connection
+
+    def recreate(self):
+        # Keep counters across pool recreation (dispose, invalidation)
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {"pid": os.getpid(), "pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update(metrics.snapshot())
+    return stats
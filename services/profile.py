@@ -0,0 +1,124 @@
+import hashlib
+from datetime import datetime
+
+from flask import Response, request
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, Habit, UserStreak, UserProfile
+from services.db_routing import use_primary
+from services.serialization import USER_PROFILE, dumps
+from services.streaks import completion_rate, current_streak, zone_date
+
+
+def _encode(payload):
+    body = dumps(payload, sort_keys=True)
+    return body.decode("utf-8"), hashlib.sha1(body).hexdigest()
+
+
+def _snapshot_values(user, streak):
+    # Streaks as of the user's today: a run whose last day is before
+    # yesterday is over, even if the daily reset hasn't zeroed it yet
+    today = zone_date(user.timezone)
+    user_current = current_streak(streak.last_completed, streak.current_streak, today) if streak else 0
+    longest_streak = streak.longest_streak if streak else 0
+    habits = db.session.execute(
+        select(Habit.id, Habit.name, Habit.streak, Habit.longest_streak, Habit.last_done, Habit.completion_bits)
+        .where(Habit.user_id == user.user_id)
+        .order_by(Habit.id)
+    ).all()
+
+    me_json, me_etag = _encode({
+        **USER_PROFILE.dump(user),
+        "current_streak": user_current,
+        "longest_streak": longest_streak,
+    })
+    streaks_json, streaks_etag = _encode({
+        "user_streak": {
+            "current_streak": user_current,
+            "longest_streak": longest_streak,
+        },
+        "habit_streaks": [
+            {
+                "habit_id": habit_id,
+                "name": name,
+                "habit_streak": current_streak(last_done, habit_streak, today),
+                "habit_longest_streak": habit_longest_streak,
+                "completion_rate_7d": completion_rate(bits, last_done, today, 7),
+                "completion_rate_30d": completion_rate(bits, last_done, today, 30),
+            }
+            for habit_id, name, habit_streak, habit_longest_streak, last_done, bits in habits
+        ],
+    })
+    return {
+        "me_json": me_json,
+        "me_etag": me_etag,
+        "streaks_json": streaks_json,
+        "streaks_etag": streaks_etag,
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def refresh_profile(user, streak=None):
+    # Called by background writers (the completion follow-up) inside their own
+    # transaction with the rows they just changed. Only rewrites an existing
+    # snapshot; missing ones are built on read. Requests drop the snapshot
+    # with invalidate_profile instead, one keyed DELETE.
+    if streak is None:
+        streak = UserStreak.query.filter_by(user_id=user.user_id).first()
+    db.session.execute(
+        update(UserProfile)
+        .where(UserProfile.user_id == user.user_id)
+        .values(_snapshot_values(user, streak))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def invalidate_profile(user_id):
+    db.session.execute(delete(UserProfile).where(UserProfile.user_id == user_id))
+
+
+def invalidate_profiles(user_ids):
+    db.session.execute(delete(UserProfile).where(UserProfile.user_id.in_(user_ids)))
+
+
+def invalidate_profile_range(after_user_id, up_to_user_id):
+    # Set-based writers (daily reset) drop the snapshots of a user id range
+    db.session.execute(
+        delete(UserProfile).where(
+            UserProfile.user_id > after_user_id, UserProfile.user_id <= up_to_user_id
+        )
+    )
+
+
+def load_profile(user_id):
+    # One primary-key lookup on the hot path; builds the snapshot on first use
+    profile = db.session.get(UserProfile, user_id)
+    if profile is not None:
+        return profile
+
+    use_primary()  # the snapshot is stored, so build it from current data
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    streak = UserStreak.query.filter_by(user_id=user_id).first()
+    profile = UserProfile(user_id=user_id, **_snapshot_values(user, streak))
+    db.session.add(profile)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Built concurrently by another request, use theirs
+        db.session.rollback()
+        profile = db.session.get(UserProfile, user_id)
+    return profile
+
+
+def snapshot_response(body, etag, cache_control="private, no-cache"):
+    # Serve the stored JSON as-is; 304 when the client already has this version
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
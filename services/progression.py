@@ -0,0 +1,66 @@
+from bisect import bisect_right
+
+from sqlalchemy import case, func, select, update
+
+from config import Config
+from models import db, User
+
+# Curve and rank names are read once at import: XP needed to reach level
+# L + 1 is LEVEL_XP_BASE * L ** LEVEL_XP_EXPONENT (default 50 * L**2).
+XP_BASE = Config.LEVEL_XP_BASE
+XP_EXPONENT = Config.LEVEL_XP_EXPONENT
+MAX_LEVEL = Config.LEVEL_MAX
+LEVEL_NAMES = tuple(Config.LEVEL_NAMES)
+
+
+def build_thresholds(base, exponent, max_level):
+    # thresholds[i] = XP at which level i + 2 starts (level 1 needs nothing)
+    if float(exponent).is_integer():
+        exponent = int(exponent)
+    return [base * k ** exponent for k in range(1, max_level)]
+
+
+THRESHOLDS = build_thresholds(XP_BASE, XP_EXPONENT, MAX_LEVEL)
+
+
+def level_for_xp(xp):
+    # O(log n) over the table; same result as "while xp >= threshold: level += 1"
+    return bisect_right(THRESHOLDS, xp or 0) + 1
+
+
+def rank_for_level(level):
+    return LEVEL_NAMES[min(max(level, 1), len(LEVEL_NAMES)) - 1]
+
+
+def apply_level(user):
+    user.level = level_for_xp(user.xp)
+    user.level_name = rank_for_level(user.level)
+
+
+def _level_case(top_level):
+    # CASE xp >= threshold ... highest first, only as many branches as the data needs
+    return case(
+        *((User.xp >= THRESHOLDS[level - 2], level) for level in range(top_level, 1, -1)),
+        else_=1,
+    )
+
+
+def _rank_case():
+    whens = [
+        (User.xp >= THRESHOLDS[level - 2], LEVEL_NAMES[level - 1])
+        for level in range(min(len(LEVEL_NAMES), MAX_LEVEL), 1, -1)
+    ]
+    return case(*whens, else_=LEVEL_NAMES[0]) if whens else LEVEL_NAMES[0]
+
+
+def recompute_all_levels():
+    # Bulk variant for curve changes: one UPDATE over the whole users table
+    max_xp = db.session.execute(select(func.max(User.xp))).scalar() or 0
+    top_level = level_for_xp(max_xp)
+    result = db.session.execute(
+        update(User)
+        .values(level=_level_case(top_level), level_name=_rank_case())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return {"users_updated": result.rowcount, "max_level": top_level}
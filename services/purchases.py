@@ -0,0 +1,94 @@
+from datetime import datetime
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, Reward, UserReward, XpLedger
+from services.leaderboard import XP, record_score
+from services.profile import invalidate_profile
+
+
+def _receipt(purchase, balance, replayed=False):
+    body = {
+        "message": "Reward purchased successfully",
+        "purchase_id": purchase.id,
+        "reward_id": purchase.reward_id,
+        "cost": purchase.cost,
+        "remaining_xp": balance,
+    }
+    if replayed:
+        body["replayed"] = True
+    return body
+
+
+def _replay(user_id, reward_id, idempotency_key):
+    # Answer a retry with the original purchase's receipt instead of charging again
+    purchase = UserReward.query.filter_by(user_id=user_id, idempotency_key=idempotency_key).first()
+    if purchase is None:
+        return None
+    if purchase.reward_id != reward_id:
+        return {"error": "Idempotency-Key was already used for another reward"}, 422
+    balance = db.session.execute(
+        select(XpLedger.balance_after).where(
+            XpLedger.reason == "reward_purchase", XpLedger.ref_id == purchase.id
+        )
+    ).scalar()
+    return _receipt(purchase, balance, replayed=True), 200
+
+
+def purchase_reward(user_id, reward_id, idempotency_key=None):
+    # Returns (body, status). The XP check and the charge are one conditional
+    # UPDATE, so parallel purchases can't spend the same XP twice; the
+    # purchase row, the ledger entry and the charge commit together.
+    if idempotency_key:
+        replay = _replay(user_id, reward_id, idempotency_key)
+        if replay:
+            return replay
+
+    reward = db.session.get(Reward, reward_id)
+    if reward is None:
+        return {"error": "Invalid user or reward"}, 404
+
+    # Claim the idempotency key first: a concurrent retry blocks on (or fails
+    # against) the unique index before either request touches the balance
+    purchase = UserReward(
+        user_id=user_id, reward_id=reward_id, cost=reward.cost,
+        purchased_at=datetime.utcnow(), idempotency_key=idempotency_key,
+    )
+    db.session.add(purchase)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        if idempotency_key:
+            replay = _replay(user_id, reward_id, idempotency_key)
+            if replay:
+                return replay
+        return {"error": "Invalid user or reward"}, 404
+
+    charged = db.session.execute(
+        update(User)
+        .where(User.user_id == user_id, User.xp >= reward.cost)
+        .values(xp=User.xp - reward.cost)
+        .execution_options(synchronize_session=False)
+    )
+    if charged.rowcount == 0:
+        db.session.rollback()
+        if db.session.get(User, user_id) is None:
+            return {"error": "Invalid user or reward"}, 404
+        return {"error": "Not enough XP"}, 400
+
+    # Reload the balance our UPDATE produced (the row stays locked until commit)
+    user = db.session.execute(
+        select(User).where(User.user_id == user_id).execution_options(populate_existing=True)
+    ).scalar_one()
+    db.session.add(XpLedger(
+        user_id=user_id, delta=-reward.cost, balance_after=user.xp,
+        reason="reward_purchase", ref_id=purchase.id,
+    ))
+    invalidate_profile(user_id)
+    record_score(XP, user_id, user.xp)
+    receipt = _receipt(purchase, user.xp)  # before the commit expires purchase and user
+    db.session.commit()
+
+    return receipt, 200
@@ -0,0 +1,80 @@
+import logging
+import time
+from datetime import datetime
+
+from flask import g
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, ReplicaHeartbeat
+from services.background import PeriodicWorker
+from services.db_routing import PIN_COOKIE, current_user_id, replica_state
+
+logger = logging.getLogger(__name__)
+
+_lags = {}  # bind key -> seconds behind the primary (None: unreachable)
+
+
+def init_replicas(app):
+    config = app.config
+    replica_state.configure(config["REPLICA_BINDS"], config["REPLICA_PIN_SECONDS"])
+
+    @app.after_request
+    def _pin_writer(response):
+        # Read-your-writes: this client reads from the primary for a few
+        # seconds, in this worker (by user id) and in others (by cookie)
+        if g.get("db_wrote") and replica_state.binds and replica_state.pin_seconds:
+            until = time.time() + replica_state.pin_seconds
+            response.set_cookie(PIN_COOKIE, f"{until:.3f}", max_age=replica_state.pin_seconds,
+                                httponly=True, samesite="Lax")
+            user_id = current_user_id()
+            if user_id is not None:
+                replica_state.pin(user_id, until)
+        return response
+
+
+def check_replicas(max_lag):
+    # Bumps the heartbeat on the primary and compares each replica's copy
+    beat_at = datetime.utcnow()
+    heartbeat = db.session.get(ReplicaHeartbeat, 1)
+    if heartbeat is None:
+        db.session.add(ReplicaHeartbeat(id=1, beat_at=beat_at))
+    else:
+        heartbeat.beat_at = beat_at
+    db.session.commit()
+
+    healthy = []
+    for key in replica_state.binds:
+        try:
+            with db.engines[key].connect() as connection:
+                replica_beat = connection.execute(
+                    select(ReplicaHeartbeat.beat_at).where(ReplicaHeartbeat.id == 1)
+                ).scalar()
+        except SQLAlchemyError as exc:
+            logger.warning("Replica %s unreachable: %s", key, exc)
+            replica_beat = None
+        lag = (beat_at - replica_beat).total_seconds() if replica_beat else None
+        _lags[key] = lag
+        if lag is not None and lag <= max_lag:
+            healthy.append(key)
+    if set(healthy) != set(replica_state.healthy):
+        logger.warning("Replicas serving reads: %s", ", ".join(healthy) or "none (primary only)")
+    replica_state.set_healthy(healthy)
+    return {"healthy": healthy, "lag_seconds": dict(_lags)}
+
+
+def replica_stats():
+    return {
+        "replicas": len(replica_state.binds),
+        "healthy": len(replica_state.healthy),
+        "lag_seconds": {key: lag for key, lag in _lags.items() if lag is not None},
+    }
+
+
+class ReplicaMonitor(PeriodicWorker):
+    # Keeps replica_state.healthy to the replicas within REPLICA_MAX_LAG seconds
+    name = "replica-monitor"
+    interval_setting = "REPLICA_CHECK_INTERVAL"
+
+    def run_once(self):
+        return check_replicas(self.app.config["REPLICA_MAX_LAG"])
@@ -0,0 +1,264 @@
+import collections
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-request SQL and latency accounting. Engine events add each statement's
+# time to the request running on the same thread; after_request folds the
+# totals into per-endpoint aggregates, which /metrics renders as Prometheus text.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class EndpointStats:
+    __slots__ = ("requests", "errors", "seconds", "queries", "commits", "db_seconds",
+                 "max_queries", "slowest_seconds", "slowest_statement", "buckets")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.commits = 0
+        self.db_seconds = 0.0
+        self.max_queries = 0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = collections.defaultdict(EndpointStats)
+
+    def record(self, endpoint, status, seconds, sql):
+        with self._lock:
+            stats = self.endpoints[endpoint]
+            stats.requests += 1
+            stats.errors += status >= 500
+            stats.seconds += seconds
+            stats.queries += sql["queries"]
+            stats.commits += sql["commits"]
+            stats.db_seconds += sql["db_seconds"]
+            stats.max_queries = max(stats.max_queries, sql["queries"])
+            if sql["slowest_seconds"] > stats.slowest_seconds:
+                stats.slowest_seconds = sql["slowest_seconds"]
+                stats.slowest_statement = sql["slowest_statement"]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats.buckets[i] += 1
+                    break
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    "requests": stats.requests,
+                    "errors": stats.errors,
+                    "avg_ms": round(stats.seconds / stats.requests * 1000, 3),
+                    "queries_per_request": round(stats.queries / stats.requests, 2),
+                    "commits_per_request": round(stats.commits / stats.requests, 2),
+                    "db_ms_per_request": round(stats.db_seconds / stats.requests * 1000, 3),
+                    "max_queries": stats.max_queries,
+                    "slowest_query_ms": round(stats.slowest_seconds * 1000, 3),
+                    "slowest_query": stats.slowest_statement,
+                }
+                for endpoint, stats in sorted(self.endpoints.items())
+            }
+
+
+request_metrics = RequestMetrics()
+
+
+def _request_sql():
+    if not has_request_context():
+        return None  # background workers, CLI commands
+    return g.get("sql_stats")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's execution context, which is dropped whether or
+    # not the statement succeeds (after_cursor_execute only runs on success)
+    context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    sql = _request_sql()
+    if sql is None:
+        return
+    elapsed = time.perf_counter() - context._metrics_started
+    sql["queries"] += 1
+    sql["db_seconds"] += elapsed
+    if elapsed > sql["slowest_seconds"]:
+        sql["slowest_seconds"] = elapsed
+        sql["slowest_statement"] = " ".join(statement.split())[:500]
+
+
+@event.listens_for(Engine, "commit")
+def _on_commit(conn):
+    sql = _request_sql()
+    if sql is not None:
+        sql["commits"] += 1
+
+
+class SamplingProfiler:
+    # Samples the stacks of opted-in request threads every `interval` seconds
+    # from one background thread. Requests that end up slower than the
+    # threshold get their samples written as collapsed stacks (flamegraph.pl /
+    # speedscope input); faster ones are discarded.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}  # thread id -> Counter of collapsed stacks
+        self._thread = None
+        self.interval = 0.005
+
+    def start(self, thread_id):
+        with self._lock:
+            self._samples[thread_id] = collections.Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._samples.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._samples:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, counter in self._samples.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stack = traceback.extract_stack(frame)
+                        counter[";".join(f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
+                                         for entry in stack)] += 1
+
+
+profiler = SamplingProfiler()
+
+
+def _write_profile(directory, endpoint, seconds, samples):
+    os.makedirs(directory, exist_ok=True)
+    name = f"{datetime.utcnow():%Y%m%d-%H%M%S-%f}-{endpoint}-{int(seconds * 1000)}ms.folded"
+    path = os.path.join(directory, name)
+    with open(path, "w") as handle:
+        for stack, count in samples.most_common():
+            handle.write(f"{stack} {count}\n")
+    return path
+
+
+def init_request_metrics(app):
+    config = app.config
+    profiler.interval = config["PROFILE_INTERVAL_MS"] / 1000
+
+    @app.before_request
+    def _start_request():
+        g.request_started = time.perf_counter()
+        g.sql_stats = {"queries": 0, "commits": 0, "db_seconds": 0.0,
+                       "slowest_seconds": 0.0, "slowest_statement": None}
+        g.profiled = config["PROFILE_SAMPLE_RATE"] > 0 and random.random() < config["PROFILE_SAMPLE_RATE"]
+        if g.profiled:
+            profiler.start(threading.get_ident())
+
+    @app.after_request
+    def _finish_request(response):
+        started = g.pop("request_started", None)
+        if started is None:
+            return response
+        seconds = time.perf_counter() - started
+        sql = g.sql_stats
+        endpoint = request.endpoint or "unmatched"
+        request_metrics.record(endpoint, response.status_code, seconds, sql)
+
+        if g.pop("profiled", False):
+            samples = profiler.stop(threading.get_ident())
+            if samples and seconds * 1000 >= config["PROFILE_SLOW_MS"]:
+                path = _write_profile(config["PROFILE_DIR"], endpoint, seconds, samples)
+                app.logger.warning("Slow request %s %s took %.0f ms, profile: %s",
+                                   request.method, request.path, seconds * 1000, path)
+
+        if app.debug or config["SQL_DEBUG_HEADERS"]:
+            response.headers["X-DB-Queries"] = str(sql["queries"])
+            response.headers["X-DB-Commits"] = str(sql["commits"])
+            response.headers["X-DB-Time-ms"] = f"{sql['db_seconds'] * 1000:.2f}"
+            response.headers["X-DB-Slowest-ms"] = f"{sql['slowest_seconds'] * 1000:.2f}"
+            response.headers["X-Request-Time-ms"] = f"{seconds * 1000:.2f}"
+        return response
+
+    @app.teardown_request
+    def _stop_profiling(error):
+        # after_request is skipped when a view raises; don't leave the thread sampled
+        if g.pop("profiled", False):
+            profiler.stop(threading.get_ident())
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _flatten(values, prefix=""):
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}_")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def prometheus_text(gauges):
+    # gauges: {prefix: stats dict} from the other subsystems (pool, outbox, ...);
+    # numeric values become gauges named <prefix>_<key>, the rest is skipped
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    with request_metrics._lock:
+        endpoints = [(endpoint, stats.requests, stats.errors, stats.seconds, stats.queries, stats.commits,
+                      stats.db_seconds, stats.slowest_seconds, list(stats.buckets))
+                     for endpoint, stats in sorted(request_metrics.endpoints.items())]
+
+    family("habit_http_request_duration_seconds", "histogram", "Request latency by endpoint.")
+    for endpoint, requests, _, seconds, _, _, _, _, buckets in endpoints:
+        label = f'endpoint="{_escape(endpoint)}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, buckets):
+            cumulative += count
+            lines.append(f'habit_http_request_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f'habit_http_request_duration_seconds_bucket{{{label},le="+Inf"}} {requests}')
+        lines.append(f"habit_http_request_duration_seconds_sum{{{label}}} {seconds:.6f}")
+        lines.append(f"habit_http_request_duration_seconds_count{{{label}}} {requests}")
+
+    per_endpoint = (
+        ("habit_http_request_errors_total", "counter", "Responses with a 5xx status.", 2, "{}"),
+        ("habit_db_queries_total", "counter", "SQL statements run by requests.", 4, "{}"),
+        ("habit_db_commits_total", "counter", "Transactions committed by requests.", 5, "{}"),
+        ("habit_db_query_seconds_total", "counter", "Time requests spent in SQL.", 6, "{:.6f}"),
+        ("habit_db_slowest_query_seconds", "gauge", "Slowest single statement seen.", 7, "{:.6f}"),
+    )
+    for name, kind, help_text, index, fmt in per_endpoint:
+        family(name, kind, help_text)
+        for row in endpoints:
+            lines.append(f'{name}{{endpoint="{_escape(row[0])}"}} {fmt.format(row[index])}')
+
+    for name, value in sorted(_flatten(gauges)):
+        family(name, "gauge", name.replace("_", " ") + ".")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
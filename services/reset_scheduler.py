@@ -0,0 +1,144 @@
+import logging
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import and_, func, select
+
+from models import db, User, ResetWatermark, RESET_SLOTS
+from services.background import PeriodicWorker
+from services.daily_reset import reset_users
+from services.streaks import zone_date
+
+logger = logging.getLogger(__name__)
+
+
+def is_valid_timezone(name):
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return False
+    return True
+
+
+def _next_users(key, chunk_size, after_user_id):
+    # One page of a bucket on its (key, user_id) index, no sort
+    return db.session.execute(
+        select(User.user_id).where(key, User.user_id > after_user_id).order_by(User.user_id).limit(chunk_size)
+    ).scalars().all()
+
+
+def _zone_users(zone):
+    def chunks(watermark, chunk_size):
+        while user_ids := _next_users(User.timezone == zone, chunk_size, watermark.last_user_id):
+            watermark.last_user_id = user_ids[-1]  # committed with the chunk
+            watermark.updated_at = datetime.utcnow()
+            yield user_ids
+    return chunks
+
+
+def _slot_users(zone, first, stop):
+    # The zone's users in slots first .. stop - 1, one slot after the other
+    in_zone = User.timezone == zone
+
+    def chunks(watermark, chunk_size):
+        watermark.last_slot = max(watermark.last_slot, first)
+        while watermark.last_slot < stop:
+            user_ids = _next_users(
+                and_(in_zone, User.reset_slot == watermark.last_slot), chunk_size, watermark.last_user_id
+            )
+            if not user_ids:
+                # Skip to the zone's next slot that has users
+                next_slot = db.session.execute(
+                    select(func.min(User.reset_slot))
+                    .where(in_zone, User.reset_slot > watermark.last_slot, User.reset_slot < stop)
+                ).scalar()
+                watermark.last_slot = stop if next_slot is None else next_slot
+                watermark.last_user_id = 0
+                continue
+            watermark.last_user_id = user_ids[-1]
+            watermark.updated_at = datetime.utcnow()
+            yield user_ids
+    return chunks
+
+
+def _zone_dates(now):
+    # (zone, its local date) for every zone that has users. The date comes from
+    # zone_date, like the day complete_habit records, so a bucket is reset
+    # exactly when its users' completions move to the next day.
+    zones = db.session.execute(select(User.timezone).distinct()).scalars().all()
+    for zone in zones:
+        if not is_valid_timezone(zone):
+            logger.warning("Unknown timezone %r, resetting its users on UTC days", zone)
+        yield zone, zone_date(zone, now)
+
+
+def timezone_buckets(now):
+    # One bucket per zone that has users; it is due once the zone passes local midnight
+    for zone, local_date in _zone_dates(now):
+        yield f"tz:{zone}", local_date, _zone_users(zone)
+
+
+def shard_buckets(now, shards):
+    # Each zone's bucket split in `shards` ranges of the stored
+    # User.reset_slot values: smaller buckets, all due at the zone's midnight
+    for zone, local_date in _zone_dates(now):
+        for k in range(shards):
+            yield (f"shard:{k}:{zone}", local_date,
+                   _slot_users(zone, k * RESET_SLOTS // shards, (k + 1) * RESET_SLOTS // shards))
+
+
+def reset_bucket(bucket, local_date, user_chunks, chunk_size):
+    watermark = db.session.get(ResetWatermark, bucket)
+    if watermark is None:
+        # New bucket: start tracking it, its first reset happens at the next boundary
+        db.session.add(ResetWatermark(bucket=bucket, reset_date=local_date, completed=True))
+        db.session.commit()
+        return None
+
+    if watermark.reset_date == local_date and watermark.completed:
+        return None
+
+    if watermark.reset_date != local_date:
+        watermark.reset_date = local_date
+        watermark.last_user_id = 0
+        watermark.last_slot = 0
+        watermark.completed = False
+    # else: a previous run for this day crashed, carry on from its watermark
+
+    summary = reset_users(user_chunks(watermark, chunk_size), chunk_size, today=local_date)
+
+    watermark.completed = True
+    watermark.updated_at = datetime.utcnow()
+    db.session.commit()
+    return summary
+
+
+def run_due_buckets(mode="timezone", shards=24, chunk_size=1000, now=None):
+    now = now or datetime.now(timezone.utc)
+    if mode == "shard":
+        buckets = list(shard_buckets(now, shards))
+    else:
+        buckets = list(timezone_buckets(now))
+
+    results = {}
+    for bucket, local_date, user_chunks in buckets:
+        summary = reset_bucket(bucket, local_date, user_chunks, chunk_size)
+        if summary is not None:
+            logger.info("Reset bucket %s for %s: %s", bucket, local_date, summary)
+            results[bucket] = summary
+    return results
+
+
+class ResetScheduler(PeriodicWorker):
+    # Resets each bucket on its own tick. Run only one per deployment
+    # (e.g. `flask reset-scheduler`), not one per gunicorn worker.
+    name = "reset-scheduler"
+    interval_setting = "RESET_SCHEDULER_INTERVAL"
+
+    def run_once(self):
+        config = self.app.config
+        return run_due_buckets(
+            config["RESET_SCHEDULER_MODE"],
+            config["RESET_SCHEDULER_SHARDS"],
+            config["DAILY_RESET_CHUNK_SIZE"],
+        )
@@ -0,0 +1,14 @@
+from flask import current_app
+
+from extensions import MIGRATIONS_DIR, db
+
+
+def upgrade_schema(revision="head"):
+    # Apply the Alembic migrations in migrations/, as `flask db upgrade` does.
+    # Web workers only register Flask-Migrate under the flask command, so
+    # DB_CREATE_ON_STARTUP registers it here.
+    from flask_migrate import Migrate, upgrade
+
+    if "migrate" not in current_app.extensions:
+        Migrate(current_app, db, directory=MIGRATIONS_DIR)
+    upgrade(directory=MIGRATIONS_DIR, revision=revision)
@@ -0,0 +1,134 @@
+import json
+from datetime import date
+from functools import lru_cache
+from operator import attrgetter
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import Date
+
+from models import User, Habit, Reward, AvatarList
+
+try:  # optional: C JSON encoder, several times faster than the stdlib
+    import orjson
+except ImportError:
+    orjson = None
+
+# Response encoding shared by every endpoint. FastJSONProvider puts orjson
+# behind jsonify / app.json when it is installed; dumps() is for bodies built
+# outside a request (cached catalogs, profile snapshots, streamed exports).
+# Schemas declare which columns a model exposes and compile, once per field
+# set, a function turning result rows (or ORM objects) into dicts.
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)  # Decimal, UUID
+
+
+def dumps(obj, sort_keys=False):
+    # Compact JSON as bytes; dates as ISO strings
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(obj, separators=(",", ":"), sort_keys=sort_keys, default=_default).encode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    # Flask's provider (same output: sorted keys, HTTP dates, str() for
+    # Decimal/UUID) with orjson doing the work when available
+
+    def _options(self):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {"indent", "separators"}:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options())
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+class Schema:
+    # name -> mapped column, in output order; date columns are written as ISO
+    # strings so the JSON doesn't depend on the encoder
+
+    def __init__(self, **fields):
+        self.fields = fields
+
+    def columns(self, names=None):
+        return [self.fields[name] for name in (names or self.fields)]
+
+    @lru_cache(maxsize=None)
+    def _compiled(self, names, from_objects):
+        names = tuple(names)
+        dates = tuple(i for i, name in enumerate(names) if isinstance(self.fields[name].type, Date))
+        if from_objects:
+            getter = attrgetter(*(self.fields[name].key for name in names))
+            values = getter if len(names) > 1 else (lambda obj: (getter(obj),))
+        else:
+            values = tuple
+
+        if not dates:
+            return lambda row: dict(zip(names, values(row)))
+
+        def convert(row):
+            row = list(values(row))
+            for i in dates:
+                if row[i] is not None:
+                    row[i] = row[i].isoformat()
+            return dict(zip(names, row))
+        return convert
+
+    def serializer(self, names=None, from_objects=False):
+        # Row (selected with columns(names)) -> dict; cached per field set
+        return self._compiled(tuple(names or self.fields), from_objects)
+
+    def dump_rows(self, rows, names=None):
+        convert = self.serializer(names)
+        return [convert(row) for row in rows]
+
+    def dump(self, obj, names=None):
+        return self.serializer(names, from_objects=True)(obj)
+
+
+HABIT = Schema(
+    id=Habit.id,
+    user_id=Habit.user_id,
+    name=Habit.name,
+    habit_type=Habit.habit_type,
+    habit_nature=Habit.habit_nature,
+    xp_value=Habit.xp_value,
+    streak=Habit.streak,
+    longest_streak=Habit.longest_streak,
+    last_done=Habit.last_done,
+    done_today=Habit.done_today,
+    cover_photo=Habit.cover_photo,
+)
+USER_PROFILE = Schema(
+    user_id=User.user_id,
+    username=User.username,
+    email=User.email,
+    xp=User.xp,
+    level=User.level,
+    level_name=User.level_name,
+    mana=User.mana,
+    health=User.health,
+)
+REWARD = Schema(id=Reward.id, name=Reward.name, cost=Reward.cost)
+AVATAR = Schema(avatar_id=AvatarList.avatar_id, filename=AvatarList.filename)
@@ -0,0 +1,211 @@
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import bindparam, case, literal, select, update
+
+from models import db, User, Habit, HabitCompletion, UserStreak
+
+# Completion history as a bitmap: bit i set = completed on (last_done - i
+# days), for the last WINDOW days. Habit.completion_bits pairs with
+# Habit.last_done, UserStreak.completion_bits with UserStreak.last_completed.
+# The streak columns stay the running counters (they outlive the window);
+# the bitmap answers continuity, gaps and completion rates without reading
+# habit_completions.
+
+WINDOW = 63  # fits a signed BIGINT
+MASK = (1 << WINDOW) - 1
+
+
+def user_zone(name):
+    # User.timezone as a tzinfo; unknown names count as UTC, like the reset scheduler does
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return timezone.utc
+
+
+def zone_date(name, now=None):
+    # The calendar day in the user's zone: completions, streaks and resets
+    # all use it, whatever the server's own timezone is
+    return (now or datetime.now(timezone.utc)).astimezone(user_zone(name)).date()
+
+
+def user_today(user_id):
+    # Today in the user's timezone, without locking the user row
+    return zone_date(db.session.execute(select(User.timezone).where(User.user_id == user_id)).scalar())
+
+
+def local_dates(user_id, days_back=0, now=None):
+    # Per-row SQL expression: the user's local date `days_back` days ago, for
+    # the user of `user_id` (a column). One CASE over the zones in use, so
+    # set-based statements can compare dates against it.
+    now = now or datetime.now(timezone.utc)
+    zones = db.session.execute(select(User.timezone).distinct()).scalars().all()
+    days = {zone: zone_date(zone, now) - timedelta(days=days_back) for zone in zones}
+    default = zone_date("UTC", now) - timedelta(days=days_back)
+    value = case(days, value=User.timezone, else_=default) if days else literal(default)
+    return select(value).where(User.user_id == user_id).scalar_subquery()
+
+
+def trailing_ones(bits):
+    # Length of the run of completions ending at the anchor day
+    return ((bits ^ (bits + 1)) >> 1).bit_length()
+
+
+def record_day(bits, last_day, streak, day):
+    # -> (bits, last_day, streak) after a completion on `day`; a day already
+    # recorded changes nothing
+    bits = bits or 0
+    streak = streak or 0
+    if last_day is None:
+        return 1, day, 1
+    gap = (day - last_day).days
+    if gap > 0:
+        bits = ((bits << gap) | 1) & MASK if gap < WINDOW else 1
+        return bits, day, streak + 1 if gap == 1 else 1
+    if -gap >= WINDOW or bits >> -gap & 1:
+        return bits, last_day, streak
+    # Back-dated: may join the run ending at last_day with an older one
+    bits |= 1 << -gap
+    run = trailing_ones(bits)
+    return bits, last_day, run if run < WINDOW else max(streak, run)
+
+
+def current_streak(last_day, streak, today):
+    # A run counts until the end of the day after its last completion
+    if missed_yesterday(last_day, today):
+        return 0
+    return streak or 0
+
+
+def missed_yesterday(last_day, today):
+    return last_day is None or (today - last_day).days > 1
+
+
+def days_done(bits, last_day, today, days):
+    # Completions in the `days` days (at most WINDOW) ending today
+    if last_day is None:
+        return 0
+    gap = (today - last_day).days
+    if gap >= WINDOW:
+        return 0
+    aligned = (bits or 0) << gap if gap >= 0 else (bits or 0) >> -gap
+    return (aligned & ((1 << min(days, WINDOW)) - 1)).bit_count()
+
+
+def completion_rate(bits, last_day, today, days):
+    return round(days_done(bits, last_day, today, days) / days, 3)
+
+
+def history(days):
+    # (bits, last_day, current run, longest run) from a whole completion
+    # history, for the backfill
+    days = sorted(set(days))
+    if not days:
+        return 0, None, 0, 0
+    last_day = days[-1]
+    bits = 0
+    longest = run = 0
+    previous = None
+    for day in days:
+        run = run + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+        offset = (last_day - day).days
+        if offset < WINDOW:
+            bits |= 1 << offset
+    return bits, last_day, run, longest
+
+
+
+def _backfill(key, model, pk, last_column, current_column, batch_size, today, create_missing, zones_of):
+    # Keyset over the distinct keys of habit_completions; each batch reads
+    # its completion days in one query and writes with one executemany.
+    # Streaks are current as of each user's local today unless `today` is given.
+    table = model.__table__
+    statement = (
+        update(table)
+        .where(table.c[pk.key] == bindparam("b_key"))
+        .values({
+            "completion_bits": bindparam("b_bits"),
+            last_column: bindparam("b_last"),
+            current_column: bindparam("b_current"),
+            "longest_streak": bindparam("b_longest"),
+        })
+    )
+    now = datetime.now(timezone.utc)
+    local_today = {}  # zone -> date
+    rows = batches = 0
+    last_key = None
+    while True:
+        keys = select(key).distinct().order_by(key).limit(batch_size)
+        if last_key is not None:
+            keys = keys.where(key > last_key)
+        keys = db.session.execute(keys).scalars().all()
+        if not keys:
+            break
+        last_key = keys[-1]
+
+        longest = dict(db.session.execute(select(pk, model.longest_streak).where(pk.in_(keys))).all())
+        zones = {} if today else dict(db.session.execute(zones_of(keys)).all())
+        days = db.session.execute(
+            select(key, HabitCompletion.completed_on).where(key.in_(keys)).distinct().order_by(key)
+        )
+        params = []
+        for member, group in groupby(days, key=lambda row: row[0]):
+            if member not in longest and not create_missing:
+                continue  # deleted habit: its history stays in habit_completions
+            bits, last_day, run, longest_run = history(day for _, day in group)
+            if today:
+                member_today = today
+            else:
+                zone = zones.get(member)
+                if zone not in local_today:
+                    local_today[zone] = zone_date(zone, now)
+                member_today = local_today[zone]
+            params.append({
+                "b_key": member,
+                "b_bits": bits,
+                "b_last": last_day,
+                "b_current": current_streak(last_day, run, member_today),
+                "b_longest": max(longest.get(member) or 0, longest_run),
+            })
+        missing = [row for row in params if row["b_key"] not in longest]
+        if missing:
+            db.session.execute(table.insert(), [
+                {pk.key: row["b_key"], "completion_bits": row["b_bits"], last_column: row["b_last"],
+                 current_column: row["b_current"], "longest_streak": row["b_longest"]}
+                for row in missing
+            ])
+        present = [row for row in params if row["b_key"] in longest]
+        if present:
+            db.session.execute(statement, present)
+        db.session.commit()
+        rows += len(params)
+        batches += 1
+    return rows, batches
+
+
+def backfill_streaks(batch_size=1000, today=None):
+    # Rebuild completion bitmaps and streak counters of habits and users from
+    # the habit_completions log. Longest streaks never go down. Current
+    # streaks are evaluated on each user's local today, or on `today` if given.
+    started = time.perf_counter()
+    habits, habit_batches = _backfill(
+        HabitCompletion.habit_id, Habit, Habit.id, "last_done", "streak", batch_size, today, False,
+        lambda keys: select(Habit.id, User.timezone).join(User, User.user_id == Habit.user_id)
+        .where(Habit.id.in_(keys)),
+    )
+    users, user_batches = _backfill(
+        HabitCompletion.user_id, UserStreak, UserStreak.user_id, "last_completed", "current_streak",
+        batch_size, today, True,
+        lambda keys: select(User.user_id, User.timezone).where(User.user_id.in_(keys)),
+    )
+    return {
+        "habits": habits,
+        "users": users,
+        "batches": habit_batches + user_batches,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
@@ -0,0 +1,150 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, HabitCompletion, WeeklyProgress
+from services.background import PeriodicWorker
+from services.streaks import user_today
+
+
+BATCH_ATTEMPTS = 3  # a batch that keeps failing is not a lost insert race
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())  # Monday
+
+
+def record_completion(user_id, habit, xp_delta, completed_on):
+    # Event log entry, written in the completion's own transaction
+    completion = HabitCompletion(
+        habit_id=habit.id,
+        user_id=user_id,
+        habit_type=habit.habit_type,
+        xp_delta=xp_delta,
+        completed_on=completed_on,
+    )
+    db.session.add(completion)
+    return completion
+
+
+def record_completions(rows):
+    # Many events in one executemany INSERT (rows: dicts of HabitCompletion
+    # columns, at most one per habit and day); returns their ids by
+    # (habit_id, completed_on), read back in one indexed SELECT
+    db.session.execute(insert(HabitCompletion), rows)
+    keys = {(row["habit_id"], row["completed_on"]) for row in rows}
+    found = db.session.execute(
+        select(HabitCompletion.id, HabitCompletion.habit_id, HabitCompletion.completed_on)
+        .where(HabitCompletion.habit_id.in_({habit_id for habit_id, _ in keys}),
+               HabitCompletion.completed_on.in_({day for _, day in keys}))
+        .order_by(HabitCompletion.id)  # the newest row wins
+    )
+    return {
+        (habit_id, completed_on): completion_id
+        for completion_id, habit_id, completed_on in found
+        if (habit_id, completed_on) in keys
+    }
+
+
+def _fold(events):
+    totals = defaultdict(lambda: {"habits_completed": 0, "good_habits": 0, "bad_habits": 0, "xp_gained": 0})
+    for event in events:
+        row = totals[(event.user_id, week_start(event.completed_on))]
+        row["habits_completed"] += 1
+        row["good_habits" if event.habit_type == "good" else "bad_habits"] += 1
+        row["xp_gained"] += event.xp_delta
+    return totals
+
+
+def _upsert(totals):
+    existing = {
+        (row.user_id, row.week_start): row
+        for row in WeeklyProgress.query.filter(
+            tuple_(WeeklyProgress.user_id, WeeklyProgress.week_start).in_(list(totals))
+        )
+    }
+    for (user_id, start), delta in totals.items():
+        row = existing.get((user_id, start))
+        if row is None:
+            db.session.add(WeeklyProgress(user_id=user_id, week_start=start, **delta))
+            continue
+        for key, value in delta.items():
+            setattr(row, key, (getattr(row, key) or 0) + value)
+
+
+def aggregate_completions(batch_size=1000):
+    # Fold unaggregated events into weekly_progress, one transaction per batch.
+    # SKIP LOCKED lets several aggregators run without counting an event twice.
+    events_done = 0
+    batches = 0
+    attempts = 0
+    while True:
+        events = db.session.execute(
+            select(HabitCompletion)
+            .where(HabitCompletion.aggregated.is_(False))
+            .order_by(HabitCompletion.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not events:
+            break
+
+        try:
+            _upsert(_fold(events))
+            db.session.execute(
+                update(HabitCompletion)
+                .where(HabitCompletion.id.in_([event.id for event in events]))
+                .values(aggregated=True)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except IntegrityError:
+            # Another aggregator created one of the weekly rows first; redo the batch
+            db.session.rollback()
+            attempts += 1
+            if attempts >= BATCH_ATTEMPTS:
+                raise
+            continue
+
+        attempts = 0
+        events_done += len(events)
+        batches += 1
+        if len(events) < batch_size:
+            break
+    return {"events_aggregated": events_done, "batches": batches}
+
+
+def weekly_progress(user_id, weeks, today=None):
+    # Reads only pre-aggregated rows: cost depends on weeks, not on history.
+    # Weeks end on the user's local today, the day completions are dated with.
+    current = week_start(today or user_today(user_id))
+    first = current - timedelta(weeks=weeks - 1)
+    rows = {
+        row.week_start: row
+        for row in WeeklyProgress.query.filter(
+            WeeklyProgress.user_id == user_id, WeeklyProgress.week_start >= first
+        )
+    }
+
+    result = []
+    for offset in range(weeks):
+        start = current - timedelta(weeks=offset)
+        row = rows.get(start)
+        result.append({
+            "week_start": start.isoformat(),
+            "habits_completed": row.habits_completed if row else 0,
+            "good_habits": row.good_habits if row else 0,
+            "bad_habits": row.bad_habits if row else 0,
+            "xp_gained": row.xp_gained if row else 0,
+        })
+    return result
+
+
+class ProgressAggregator(PeriodicWorker):
+    name = "progress-aggregator"
+    interval_setting = "WEEKLY_PROGRESS_INTERVAL"
+
+    def run_once(self):
+        return aggregate_completions(self.app.config["WEEKLY_PROGRESS_BATCH_SIZE"])
@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+# `import app` builds the module-level app from the environment: give it a
+# throwaway database
+os.environ.setdefault("DATABASE_URI", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='habit-test-'), 'import.db')}")
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from models import db  # noqa: E402
+
+
+@pytest.fixture
+def app_overrides():
+    # Extra config for the `app` fixture; override it in a test module
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_overrides):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        SQLALCHEMY_BINDS = {}
+        REPLICA_BINDS = []
+        OUTBOX_WORKER_ENABLED = False
+        RESET_SCHEDULER_ENABLED = False
+        WEEKLY_PROGRESS_AGGREGATOR_ENABLED = False
+        LEADERBOARD_REFRESH_ENABLED = False
+        PASSWORD_POOL_WORKERS = 0
+        BCRYPT_LOG_ROUNDS = 4
+
+    for key, value in app_overrides.items():
+        setattr(TestConfig, key, value)
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Freezes the clock users' local dates come from: set clock.current to an
+    # aware datetime
+    from services import streaks
+
+    class Clock(datetime):
+        current = None
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current.astimezone(tz)
+
+    monkeypatch.setattr(streaks, "datetime", Clock)
+    return Clock
@@ -0,0 +1,54 @@
+import os
+import threading
+
+import pytest
+
+from services.avatar_assets import MANIFEST_NAME, build_avatar_assets
+
+Image = pytest.importorskip("PIL.Image")  # optional dependency
+
+VARIANTS = {"thumb": 16, "full": 32}
+
+
+def _source(path, color):
+    Image.new("RGB", (64, 64), color).save(path)
+
+
+def _assets(out_dir):
+    return {name for name in os.listdir(out_dir) if name != MANIFEST_NAME}
+
+
+def test_prune_keeps_the_replaced_generation(tmp_path):
+    source, out = tmp_path / "avatars", tmp_path / "assets"
+    source.mkdir()
+    generations = []
+    for color in ("red", "green", "blue"):
+        _source(source / "knight.png", color)
+        build_avatar_assets(source, out, VARIANTS, prune=True)
+        generations.append(_assets(out) - set().union(*generations))
+
+    assert _assets(out) == generations[1] | generations[2]
+
+
+def test_concurrent_builds_do_not_collide(tmp_path):
+    source, out = tmp_path / "avatars", tmp_path / "assets"
+    source.mkdir()
+    for i in range(6):
+        _source(source / f"avatar {i}.png", (40 * i, 0, 0))
+    errors = []
+
+    def build(prune):
+        try:
+            build_avatar_assets(source, out, VARIANTS, prune=prune)
+        except Exception as exc:  # noqa: BLE001
+            errors.append(exc)
+
+    threads = [threading.Thread(target=build, args=(i % 2 == 0,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(_assets(out)) == 12
+    assert not [name for name in os.listdir(out) if name.endswith(".tmp")]
@@ -0,0 +1,34 @@
+from services.blocklist import RevocationCache
+
+
+def test_bloom_refresh_is_capped_at_negative_ttl():
+    cache = RevocationCache(max_entries=100, negative_ttl=30, bloom_refresh=60)
+    assert cache.bloom_refresh == 30
+
+    cache.load_bloom([], 0)
+    assert cache.lookup("fresh-jti") is False  # Bloom miss
+    assert not cache.bloom_is_stale(now=cache._bloom_loaded_at + 29)
+    assert cache.bloom_is_stale(now=cache._bloom_loaded_at + 31)
+
+
+def test_no_bloom_without_negative_caching():
+    cache = RevocationCache(max_entries=100, negative_ttl=0, bloom_refresh=60)
+    assert cache.bloom_refresh is None
+    assert not cache.bloom_is_stale()
+
+
+def test_one_thread_rebuilds_a_stale_bloom():
+    cache = RevocationCache(max_entries=100, negative_ttl=30, bloom_refresh=30)
+    cache.load_bloom([], 0)
+    old = cache._bloom
+    later = cache._bloom_loaded_at + 31
+
+    assert cache.begin_bloom_refresh(now=later)
+    assert not cache.begin_bloom_refresh(now=later)  # another request meanwhile
+    assert cache.lookup("fresh-jti") is False        # still answered by the old filter
+    assert cache._bloom is old
+
+    cache.load_bloom([], 0)
+    cache.end_bloom_refresh()
+    assert not cache.begin_bloom_refresh()
+    assert cache.begin_bloom_refresh(now=cache._bloom_loaded_at + 31)
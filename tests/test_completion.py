@@ -0,0 +1,195 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from models import db, User, Habit, HabitCompletion, OutboxJob, UserProfile
+from services.completion import complete_habit, complete_habits_batch
+from services.outbox import process_pending
+from services.reset_scheduler import run_due_buckets
+
+TODAY = date(2025, 3, 12)
+YESTERDAY = TODAY - timedelta(days=1)
+
+
+def _user_with_habits(count, **user):
+    account = User(username="runner", email="runner@test.local", **user)
+    db.session.add(account)
+    db.session.flush()
+    habits = [
+        Habit(user_id=account.user_id, name=f"Habit {i}", habit_type="good", habit_nature="physical", xp_value=10)
+        for i in range(count)
+    ]
+    db.session.add_all(habits)
+    db.session.commit()
+    return account.user_id, [habit.id for habit in habits]
+
+
+def _statements_after_commit(run):
+    # Statements issued after the first COMMIT while run() executes
+    log = []
+    before_statement = lambda conn, cursor, statement, *args: log.append(statement)
+    on_commit = lambda conn: log.append("COMMIT")
+    event.listen(db.engine, "before_cursor_execute", before_statement)
+    event.listen(db.engine, "commit", on_commit)
+    try:
+        result = run()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_statement)
+        event.remove(db.engine, "commit", on_commit)
+    return result, log[log.index("COMMIT") + 1:]
+
+
+def _token(app, user_id):
+    with app.app_context():
+        return create_access_token(identity=str(user_id))
+
+
+def test_mixed_date_batch_only_marks_today_done(app):
+    with app.app_context():
+        user_id, (first, second) = _user_with_habits(2)
+        assert complete_habit(first, TODAY)[1] == 200
+
+        body, status = complete_habits_batch(user_id, [
+            (first, YESTERDAY),   # offline entry for a habit already done today
+            (second, YESTERDAY),
+            (second, None),       # today
+            (first, None),
+            (second, YESTERDAY),
+        ], TODAY)
+        assert status == 200
+        assert [item["status"] for item in body["results"]] == [
+            "completed", "completed", "completed", "already_done", "already_done",
+        ]
+        assert body["completed"] == 3
+        assert body["user"]["xp"] == 40
+
+        first_habit, second_habit = db.session.get(Habit, first), db.session.get(Habit, second)
+        assert first_habit.done_today and second_habit.done_today
+        assert (first_habit.streak, first_habit.last_done) == (2, TODAY)
+        assert (second_habit.streak, second_habit.last_done) == (2, TODAY)
+        assert HabitCompletion.query.filter_by(completed_on=YESTERDAY).count() == 2
+
+
+def test_back_dated_batch_leaves_today_open(app):
+    with app.app_context():
+        user_id, (habit_id,) = _user_with_habits(1)
+        body, status = complete_habits_batch(user_id, [(habit_id, YESTERDAY)], TODAY)
+        assert status == 200 and body["completed"] == 1
+
+        habit = db.session.get(Habit, habit_id)
+        assert not habit.done_today
+        assert (habit.streak, habit.last_done) == (1, YESTERDAY)
+
+        # Syncing the same entry again doesn't count twice, today still can
+        body, _ = complete_habits_batch(user_id, [(habit_id, YESTERDAY), (habit_id, None)], TODAY)
+        assert [item["status"] for item in body["results"]] == ["already_done", "completed"]
+        habit = db.session.get(Habit, habit_id)
+        assert habit.done_today and habit.streak == 2
+        assert complete_habit(habit_id, TODAY)[1] == 400
+
+
+def test_double_submits_award_xp_once(app):
+    with app.app_context():
+        user_id, habit_ids = _user_with_habits(10)
+
+    def complete(habit_id):
+        return app.test_client().post(f"/habits/{habit_id}/done").status_code
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(complete, habit_ids * 3))
+
+    assert statuses.count(200) == len(habit_ids)
+    assert statuses.count(400) == 2 * len(habit_ids)
+    with app.app_context():
+        assert db.session.get(User, user_id).xp == 10 * len(habit_ids)
+        assert HabitCompletion.query.filter_by(user_id=user_id).count() == len(habit_ids)
+
+
+def test_completion_reads_nothing_after_commit(app):
+    with app.app_context():
+        _, (habit_id,) = _user_with_habits(1)
+        (body, status), after = _statements_after_commit(lambda: complete_habit(habit_id, TODAY))
+    assert status == 200 and body["xp"] == 10
+    assert after == []
+
+
+def test_batch_statements_do_not_grow_with_the_batch(app):
+    with app.app_context():
+        user_id, habit_ids = _user_with_habits(5)
+
+        def statements(items):
+            log = []
+            record = lambda conn, cursor, statement, *args: log.append(statement)
+            event.listen(db.engine, "before_cursor_execute", record)
+            try:
+                body, status = complete_habits_batch(user_id, items, TODAY)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", record)
+            assert status == 200
+            return body, len(log)
+
+        small, small_count = statements([(habit_ids[0], None), (habit_ids[0], YESTERDAY)])
+        large, large_count = statements([(habit_id, day) for habit_id in habit_ids[1:] for day in (None, YESTERDAY)])
+        assert (small["completed"], large["completed"]) == (2, 8)
+        assert large_count == small_count
+        assert large["user"]["xp"] == 100
+        assert OutboxJob.query.count() == 10
+
+
+def test_profile_is_fresh_before_the_followup_runs(app, client):
+    with app.app_context():
+        user_id, (habit_id,) = _user_with_habits(1)
+    headers = {"Authorization": "Bearer " + _token(app, user_id)}
+    before = client.get("/auth/me", headers=headers)
+    assert before.get_json()["xp"] == 0
+
+    assert client.post(f"/habits/{habit_id}/done").status_code == 200  # outbox worker is off
+
+    assert client.get("/auth/me", headers={**headers, "If-None-Match": before.headers["ETag"]}).status_code == 200
+    assert client.get("/auth/me", headers=headers).get_json()["xp"] == 10
+    habit_streaks = client.get("/auth/streaks", headers=headers).get_json()["habit_streaks"]
+    assert habit_streaks[0]["habit_streak"] == 1
+
+    # The user streak row is the follow-up's, which refreshes the rebuilt snapshot
+    with app.app_context():
+        process_pending()
+    assert client.get("/auth/me", headers=headers).get_json()["current_streak"] == 1
+
+
+def test_timezone_change_drops_the_snapshot(app, client):
+    with app.app_context():
+        user_id, _ = _user_with_habits(1)
+    headers = {"Authorization": "Bearer " + _token(app, user_id)}
+    assert client.get("/auth/me", headers=headers).status_code == 200  # builds the snapshot
+    assert client.put("/auth/timezone", json={"timezone": "Asia/Tokyo"}, headers=headers).status_code == 200
+    with app.app_context():
+        assert db.session.get(UserProfile, user_id) is None
+
+
+def test_streak_follows_the_users_days_not_the_servers(app, client, clock):
+    # A Tokyo user checking in at 08:00 local (23:00 UTC the day before) on a
+    # UTC server; the reset for each Tokyo day runs at 00:30 local
+    with app.app_context():
+        user_id, (single, batched) = _user_with_habits(2, timezone="Asia/Tokyo")
+    headers = {"Authorization": f"Bearer {_token(app, user_id)}"}
+
+    with app.app_context():
+        run_due_buckets(now=datetime(2025, 2, 28, 14, 0, tzinfo=timezone.utc))  # records the bucket
+    for day in range(1, 4):
+        clock.current = datetime(2025, 2, 28, 23, 0, tzinfo=timezone.utc) + timedelta(days=day - 1)
+        with app.app_context():
+            assert complete_habit(single)[1] == 200
+        response = client.post("/habits/done/batch", json={"habits": [batched]}, headers=headers)
+        assert response.get_json()["completed"] == 1
+        with app.app_context():
+            assert run_due_buckets(now=clock.current + timedelta(hours=16, minutes=30))
+
+    with app.app_context():
+        for habit_id in (single, batched):
+            habit = db.session.get(Habit, habit_id)
+            assert (habit.streak, habit.last_done) == (3, date(2025, 3, 3))
+        assert {row.completed_on for row in HabitCompletion.query.filter_by(habit_id=single)} == {
+            date(2025, 3, 1), date(2025, 3, 2), date(2025, 3, 3),
+        }
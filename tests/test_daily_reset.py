@@ -0,0 +1,84 @@
+from datetime import date, datetime, timezone
+
+from models import db, User, Habit, UserStreak
+from services.completion import complete_habit
+from services.daily_reset import run_daily_reset
+from services.streaks import backfill_streaks
+from services.weekly_progress import weekly_progress
+
+
+def _user(name, zone):
+    user = User(username=name, email=f"{name}@test.local", timezone=zone)
+    db.session.add(user)
+    db.session.flush()
+    habit = Habit(user_id=user.user_id, name="Read", habit_type="good", habit_nature="mental", xp_value=10)
+    db.session.add(habit)
+    db.session.commit()
+    return user.user_id, habit.id
+
+
+def test_global_reset_breaks_streaks_on_local_days(app, clock):
+    with app.app_context():
+        west = _user("west", "America/Los_Angeles")  # UTC-8
+        utc = _user("utc", "UTC")
+
+        # 23:55 UTC Jan 1 is 15:55 on Jan 1 in Los Angeles
+        clock.current = datetime(2025, 1, 1, 23, 55, tzinfo=timezone.utc)
+        for user_id, habit_id in (west, utc):
+            assert complete_habit(habit_id)[1] == 200
+            db.session.add(UserStreak(user_id=user_id, current_streak=1, longest_streak=1,
+                                      last_completed=date(2025, 1, 1)))
+        db.session.commit()
+
+        # The server's Jan 3 reset runs while it is still Jan 2 in Los Angeles:
+        # the west user has until their midnight to keep the streak
+        clock.current = datetime(2025, 1, 3, 0, 5, tzinfo=timezone.utc)
+        run_daily_reset()
+        streaks = {user_id: current for user_id, current in db.session.execute(
+            db.select(UserStreak.user_id, UserStreak.current_streak))}
+        assert db.session.get(Habit, west[1]).streak == 1
+        assert streaks[west[0]] == 1
+        assert db.session.get(Habit, utc[1]).streak == 0
+        assert streaks[utc[0]] == 0
+
+        backfill_streaks()
+        assert db.session.get(Habit, west[1]).streak == 1
+        assert db.session.get(Habit, utc[1]).streak == 0
+
+
+def test_weekly_progress_weeks_end_on_the_local_day(app, clock):
+    with app.app_context():
+        west, _ = _user("west", "America/Los_Angeles")
+        # Monday Jan 6 in UTC, still Sunday Jan 5 in Los Angeles
+        clock.current = datetime(2025, 1, 6, 5, 0, tzinfo=timezone.utc)
+        assert weekly_progress(west, 1)[0]["week_start"] == "2024-12-30"
+
+
+def test_interrupted_reset_reports_where_to_resume(app, client, monkeypatch):
+    from services import daily_reset
+
+    with app.app_context():
+        for i in range(5):
+            _user(f"u{i}", "UTC")
+        db.session.execute(db.update(User).values(mana=0))
+        db.session.commit()
+
+    calls = []
+    invalidate = daily_reset.invalidate_profile_range
+
+    def flaky(after_user_id, up_to_user_id):
+        calls.append(up_to_user_id)
+        if len(calls) == 2:
+            raise RuntimeError("connection lost")
+        invalidate(after_user_id, up_to_user_id)
+
+    monkeypatch.setattr(daily_reset, "invalidate_profile_range", flaky)
+    failed = client.post("/habits/daily_reset", json={"chunk_size": 2})
+    assert failed.status_code == 500
+    resume = failed.get_json()
+    assert (resume["after_user_id"], resume["after_habit_id"]) == (2, 5)
+
+    done = client.post("/habits/daily_reset", json={"chunk_size": 2, **resume}).get_json()
+    assert (done["users_reset"], done["habits_reset"]) == (3, 0)
+    with app.app_context():
+        assert db.session.query(User).filter(User.mana == 0).count() == 0
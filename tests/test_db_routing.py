@@ -0,0 +1,47 @@
+import time
+
+import pytest
+from flask import g
+from flask_jwt_extended import create_access_token, decode_token
+
+from models import db, User
+from services import db_routing
+from services.blocklist import revoke_token
+
+
+@pytest.fixture
+def app_overrides(tmp_path):
+    # An empty replica: any read routed there fails with "no such table"
+    yield {
+        "SQLALCHEMY_BINDS": {"replica": f"sqlite:///{tmp_path / 'replica.db'}"},
+        "REPLICA_BINDS": ["replica"],
+        "REPLICA_MAX_LAG": 0,
+        "TOKEN_BLOCKLIST_BLOOM": True,
+    }
+    db.metadatas.pop("replica", None)  # db outlives the app; later apps have no such bind
+
+
+def test_blocklist_loads_from_the_primary(app, client):
+    with app.app_context():
+        user = User(username="leaver", email="leaver@test.local")
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=str(user.user_id))
+        claims = decode_token(token)
+        revoke_token(claims["jti"], claims["exp"])
+
+    response = client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+def test_route_is_not_cached_before_the_identity_is_known(app, monkeypatch):
+    identity = {}
+    monkeypatch.setattr(db_routing, "current_user_id", lambda: identity.get("sub"))
+    with app.test_request_context("/auth/me"):
+        assert db_routing._replica_allowed()  # e.g. a read before @jwt_required ran
+        assert "db_route" not in g
+
+        identity["sub"] = "7"
+        db_routing.replica_state.pin("7", time.time() + 5)
+        assert not db_routing._replica_allowed()
+        assert g.db_route == "primary"
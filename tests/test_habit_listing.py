@@ -0,0 +1,38 @@
+from flask_jwt_extended import create_access_token
+
+from models import db, User, Habit
+
+
+def _headers(app):
+    with app.app_context():
+        user = User(username="lister", email="lister@test.local")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all(
+            Habit(user_id=user.user_id, name=f"Habit {i}", habit_type="good", habit_nature="mental")
+            for i in range(3)
+        )
+        db.session.commit()
+        return {"Authorization": "Bearer " + create_access_token(identity=str(user.user_id))}
+
+
+def test_cursor_pages_by_id(app, client):
+    headers = _headers(app)
+    first = client.get("/habits/?limit=2", headers=headers)
+    assert len(first.get_json()) == 2
+    rest = client.get(f"/habits/?limit=2&cursor={first.headers['X-Next-Cursor']}", headers=headers)
+    assert [habit["name"] for habit in rest.get_json()] == ["Habit 2"]
+
+
+def test_cursor_header_is_exposed_to_browsers(app, client):
+    headers = _headers(app)
+    response = client.get("/habits/?limit=1", headers={**headers, "Origin": "https://app.example"})
+    assert response.headers["X-Next-Cursor"]
+    assert "X-Next-Cursor" in response.headers["Access-Control-Expose-Headers"]
+
+
+def test_invalid_cursor_is_a_client_error(app, client):
+    headers = _headers(app)
+    for cursor in ("²", "١٢", "-1", "abc", ""):
+        response = client.get("/habits/", query_string={"cursor": cursor}, headers=headers)
+        assert response.status_code == 400, cursor
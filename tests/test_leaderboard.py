@@ -0,0 +1,37 @@
+import threading
+import time
+
+from services.leaderboard import LeaderboardRefresher, leaderboards
+
+
+def test_refresher_does_not_read_at_startup(app, monkeypatch):
+    ticks = []
+    monkeypatch.setitem(app.config, "LEADERBOARD_REFRESH_INTERVAL", 0.2)
+    monkeypatch.setattr(leaderboards, "rebuild", lambda: ticks.append(time.monotonic()))
+    refresher = LeaderboardRefresher(app)
+    started = time.monotonic()
+    refresher.start()
+    time.sleep(0.1)
+    assert ticks == []
+    time.sleep(0.2)
+    refresher.stop()
+    assert ticks and ticks[0] - started >= 0.2
+
+
+def test_expire_rebuilds_in_the_background(app, monkeypatch):
+    with app.app_context():
+        leaderboards.rebuild()
+        builds = leaderboards.builds
+        release = threading.Event()
+        rebuild = leaderboards.rebuild
+        monkeypatch.setattr(leaderboards, "rebuild", lambda: (release.wait(5), rebuild()))
+        leaderboards.expire()
+        # Reads are served from the current boards while the rebuild waits
+        assert leaderboards.top("xp", 0, 10)[0] >= 0
+        assert leaderboards.builds == builds
+        release.set()
+        deadline = time.monotonic() + 5
+        while leaderboards.builds == builds and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert leaderboards.builds == builds + 1
+        assert not leaderboards._stale
@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from models import db, Reward, User, UserReward, XpLedger
+
+START_XP = 300
+COST = 30
+
+
+def _buyer(app):
+    with app.app_context():
+        user = User(username="buyer", email="buyer@test.local", xp=START_XP)
+        reward = Reward(name="Potion", cost=COST)
+        db.session.add_all([user, reward])
+        db.session.commit()
+        token = create_access_token(identity=str(user.user_id))
+        return user.user_id, reward.id, {"Authorization": f"Bearer {token}"}
+
+
+def test_parallel_purchases_charge_each_key_once(app):
+    user_id, reward_id, headers = _buyer(app)
+    keys = [f"key-{i}" for i in range(15)] * 2  # each key retried, interleaved
+
+    def buy(key):
+        response = app.test_client().post(
+            "/rewards/buy", json={"reward_id": reward_id}, headers={**headers, "Idempotency-Key": key},
+        )
+        return response.status_code, (response.get_json() or {}).get("replayed", False)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(buy, keys))
+
+    expected = START_XP // COST  # 10 of the 15 keys can be paid for
+    charged = [status for status, replayed in results if status == 200 and not replayed]
+    assert len(charged) == expected
+    assert all(status in (200, 400) for status, _ in results)
+    with app.app_context():
+        assert db.session.get(User, user_id).xp == START_XP - COST * expected
+        assert UserReward.query.filter_by(user_id=user_id).count() == expected
+        ledger = XpLedger.query.filter_by(user_id=user_id).all()
+        assert sum(entry.delta for entry in ledger) == -COST * expected
+        assert min(entry.balance_after for entry in ledger) >= 0
+
+
+def test_xp_reconciles_from_completions_and_ledger(app, client):
+    from services.completion import complete_habit
+    from models import Habit, HabitCompletion
+
+    user_id, reward_id, headers = _buyer(app)
+    with app.app_context():
+        habit = Habit(user_id=user_id, name="Read", habit_type="good", habit_nature="mental", xp_value=10)
+        db.session.add(habit)
+        db.session.commit()
+        assert complete_habit(habit.id)[1] == 200
+
+    assert client.post("/rewards/buy", json={"reward_id": reward_id}, headers=headers).status_code == 200
+    with app.app_context():
+        earned = sum(row.xp_delta for row in HabitCompletion.query.filter_by(user_id=user_id))
+        spent = sum(entry.delta for entry in XpLedger.query.filter_by(user_id=user_id))
+        assert db.session.get(User, user_id).xp == START_XP + earned + spent
+
+
+def test_receipt_is_built_before_commit(app):
+    from services.purchases import purchase_reward
+
+    user_id, reward_id, _ = _buyer(app)
+    with app.app_context():
+        log = []
+        record = lambda conn, cursor, statement, *args: log.append(statement)
+        on_commit = lambda conn: log.append("COMMIT")
+        event.listen(db.engine, "before_cursor_execute", record)
+        event.listen(db.engine, "commit", on_commit)
+        try:
+            body, status = purchase_reward(user_id, reward_id, "receipt-key")
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+            event.remove(db.engine, "commit", on_commit)
+    assert status == 200 and body["remaining_xp"] == START_XP - COST
+    assert log[-1] == "COMMIT"
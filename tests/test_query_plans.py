@@ -0,0 +1,7 @@
+from audit_query_plans import audit
+
+
+def test_endpoints_use_indexes(app):
+    audited, flagged = audit(app, users=300, habits_per_user=6)
+    assert audited
+    assert flagged == []
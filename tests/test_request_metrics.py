@@ -0,0 +1,21 @@
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import db
+
+
+def test_failed_statements_leave_no_timing_state(app):
+    with app.test_request_context():
+        g.sql_stats = {"queries": 0, "commits": 0, "db_seconds": 0.0,
+                       "slowest_seconds": 0.0, "slowest_statement": None}
+        with db.engine.connect() as conn:
+            info = repr(conn.info)
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    conn.execute(text("SELECT * FROM no_such_table"))
+            conn.execute(text("SELECT 1"))
+            assert repr(conn.info) == info
+        assert g.sql_stats["queries"] == 1
+        assert g.sql_stats["slowest_statement"] == "SELECT 1"
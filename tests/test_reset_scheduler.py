@@ -0,0 +1,97 @@
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import event
+
+from models import db, User, Habit, ResetWatermark, RESET_SLOTS
+from services.reset_scheduler import run_due_buckets
+
+
+def _add_users(zones):
+    db.session.execute(db.insert(User), [
+        {"username": f"u{i}", "email": f"u{i}@test.local", "timezone": zone, "mana": 0}
+        for i, zone in enumerate(zones)
+    ])
+    users = db.session.execute(db.select(User.user_id, User.timezone)).all()
+    db.session.execute(db.insert(Habit), [
+        {"user_id": user_id, "name": "Run", "habit_type": "good", "habit_nature": "physical", "done_today": True}
+        for user_id, _ in users
+    ])
+    db.session.commit()
+    return dict(users)
+
+
+def _plans(app, run):
+    # EXPLAIN QUERY PLAN of every filtered statement the scheduler runs
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if re.search(r"\bWHERE\b", statement) and statement.lstrip().split(None, 1)[0] in ("SELECT", "UPDATE", "DELETE"):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        result = run()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    with db.engine.connect() as connection:
+        plans = [
+            " | ".join(row[-1] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters))
+            for statement, parameters in statements
+        ]
+    return result, plans
+
+
+def test_timezone_bucket_resets_only_its_users_on_indexes(app):
+    with app.app_context():
+        users = _add_users(["Asia/Tokyo"] * 7 + ["America/New_York"] * 5)
+        run_due_buckets(now=datetime(2025, 1, 1, 14, 0, tzinfo=timezone.utc))  # only records the buckets
+
+        # 15:30 UTC is past midnight in Tokyo, not in New York
+        now = datetime(2025, 1, 1, 15, 30, tzinfo=timezone.utc)
+        results, plans = _plans(app, lambda: run_due_buckets(chunk_size=3, now=now))
+        assert list(results) == ["tz:Asia/Tokyo"]
+        assert results["tz:Asia/Tokyo"]["users_reset"] == 7
+        assert results["tz:Asia/Tokyo"]["chunks"] == 3
+
+        reset = {user.user_id for user in User.query.filter(User.mana > 0)}
+        assert reset == {user_id for user_id, zone in users.items() if zone == "Asia/Tokyo"}
+        assert db.session.get(ResetWatermark, "tz:Asia/Tokyo").reset_date == date(2025, 1, 2)
+        assert plans
+        for plan in plans:
+            assert "SCAN" not in plan, plan
+            assert "TEMP B-TREE" not in plan, plan
+
+
+def test_shard_buckets_cover_every_user_once(app):
+    with app.app_context():
+        _add_users(["UTC"] * 40)
+        assert all(0 <= user.reset_slot < RESET_SLOTS for user in User.query)
+        start = datetime(2025, 1, 1, 0, 0, tzinfo=timezone.utc)
+        run_due_buckets(mode="shard", shards=4, now=start)
+
+        results, plans = _plans(
+            app, lambda: run_due_buckets(mode="shard", shards=4, chunk_size=4, now=start.replace(day=3))
+        )
+        assert len(results) == 4
+        assert sum(summary["users_reset"] for summary in results.values()) == 40
+        assert Habit.query.filter(Habit.done_today.is_(True)).count() == 0
+        assert plans
+        for plan in plans:
+            assert "SCAN" not in plan, plan
+            assert "TEMP B-TREE" not in plan, plan
+
+
+def test_shard_buckets_reset_on_the_users_local_date(app):
+    with app.app_context():
+        users = _add_users(["Asia/Tokyo"] * 6 + ["America/New_York"] * 6)
+        run_due_buckets(mode="shard", shards=4, now=datetime(2025, 1, 1, 14, 0, tzinfo=timezone.utc))
+
+        # 15:30 UTC: Tokyo is on Jan 2, New York still on Jan 1, where its
+        # users' completions are still recorded
+        results = run_due_buckets(mode="shard", shards=4, chunk_size=2,
+                                  now=datetime(2025, 1, 1, 15, 30, tzinfo=timezone.utc))
+        assert {bucket.split(":", 2)[2] for bucket in results} == {"Asia/Tokyo"}
+        assert sum(summary["users_reset"] for summary in results.values()) == 6
+        reset = {user.user_id for user in User.query.filter(User.mana > 0)}
+        assert reset == {user_id for user_id, zone in users.items() if zone == "Asia/Tokyo"}
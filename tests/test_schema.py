@@ -0,0 +1,44 @@
+from datetime import date
+
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import inspect, text
+
+from models import db
+from services.schema import upgrade_schema
+
+
+def _weekly_progress_indexes():
+    return {index["name"] for index in inspect(db.engine).get_indexes("weekly_progress")}
+
+
+def test_migrations_build_the_models_schema(app):
+    with app.app_context():
+        db.drop_all()
+        upgrade_schema()
+        with db.engine.connect() as connection:
+            assert compare_metadata(MigrationContext.configure(connection), db.metadata) == []
+
+
+def test_duplicate_weekly_progress_is_merged_before_the_unique_index(app):
+    week = date(2025, 1, 6)
+    with app.app_context():
+        # A database from before the unique index, with split weekly rows
+        db.drop_all()
+        upgrade_schema("8b41d6e2a5c3")
+        with db.engine.begin() as connection:
+            connection.execute(text("INSERT INTO users (user_id, username, email) VALUES (1, 'dup', 'dup@test.local')"))
+            connection.execute(text(
+                "INSERT INTO weekly_progress (user_id, week_start, habits_completed, good_habits, bad_habits, xp_gained)"
+                " VALUES (1, :week, 2, 2, 0, 20), (1, :week, 3, 1, 2, 5)"
+            ), {"week": week})
+        assert "uq_weekly_progress_user_id_week_start" not in _weekly_progress_indexes()
+
+        upgrade_schema()
+        assert "uq_weekly_progress_user_id_week_start" in _weekly_progress_indexes()
+        rows = db.session.execute(text(
+            "SELECT habits_completed, good_habits, bad_habits, xp_gained FROM weekly_progress"
+        )).all()
+        assert [tuple(row) for row in rows] == [(5, 3, 2, 25)]
+        user = db.session.execute(text("SELECT timezone, reset_slot FROM users")).one()
+        assert tuple(user) == ("UTC", 1)
@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports app.py in a fresh interpreter, as a gunicorn worker would
+CHILD = """
+import json, sys
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+connections = []
+event.listen(Pool, "connect", lambda *args: connections.append(1))
+import app
+print(json.dumps({
+    "connections": len(connections),
+    "modules": [name for name in ("alembic", "flask_migrate", "PIL") if name in sys.modules],
+    "report": app.app.extensions["startup_report"],
+}))
+"""
+
+
+def test_import_does_no_database_or_heavy_work(tmp_path):
+    db_file = tmp_path / "boot.db"
+    env = {
+        **os.environ,
+        "DATABASE_URI": f"sqlite:///{db_file}",
+        "LOG_LEVEL": "WARNING",
+    }
+    result = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr[-2000:]
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert stats["connections"] == 0
+    assert not db_file.exists()  # SQLite creates the file on first connect
+    assert stats["modules"] == []  # Alembic (CLI only) and Pillow (avatar builds)
+    assert "total_ms" in stats["report"]
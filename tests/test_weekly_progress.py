@@ -0,0 +1,29 @@
+from datetime import date
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, HabitCompletion
+from services import weekly_progress
+
+
+def test_persistent_integrity_errors_are_not_retried_forever(app, monkeypatch):
+    with app.app_context():
+        user = User(username="agg", email="agg@test.local")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(HabitCompletion(habit_id=1, user_id=user.user_id, habit_type="good", xp_delta=10,
+                                       completed_on=date(2025, 3, 12)))
+        db.session.commit()
+
+        attempts = []
+
+        def broken_upsert(totals):
+            attempts.append(totals)
+            raise IntegrityError("INSERT INTO weekly_progress", {}, Exception("CHECK constraint failed"))
+
+        monkeypatch.setattr(weekly_progress, "_upsert", broken_upsert)
+        with pytest.raises(IntegrityError):
+            weekly_progress.aggregate_completions()
+        assert len(attempts) == weekly_progress.BATCH_ATTEMPTS
+        assert HabitCompletion.query.filter_by(aggregated=False).count() == 1